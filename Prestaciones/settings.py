@@ -33,6 +33,9 @@ MIDDLEWARE = [ # mis middlewares
 
 ROOT_URLCONF = 'Prestaciones.urls' # URL principal
 
+# Sin 'loaders' explícitos Django (>= 4.1) usa el cargador en caché (cached.Loader) también
+# con DEBUG=False: cada plantilla se compila una vez por proceso. No definir 'loaders' aquí
+# sin incluir django.template.loaders.cached.Loader.
 TEMPLATES = [ # mis plantillas
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -49,6 +52,17 @@ TEMPLATES = [ # mis plantillas
     },
 ]
 
+# Instrumentación por petición (fovisste.timing): cabecera Server-Timing con consultas,
+# tiempo en BD, render de plantillas y total. FOVISSTE_TIMING_SAMPLE_RATE (0..1) limita
+# qué fracción de peticiones se mide; las que pasan de FOVISSTE_SLOW_REQUEST_MS se
+# registran en el logger 'fovisste.timing' con sus consultas más lentas.
+FOVISSTE_SERVER_TIMING = os.getenv('FOVISSTE_SERVER_TIMING', 'False') == 'True'
+FOVISSTE_TIMING_SAMPLE_RATE = float(os.getenv('FOVISSTE_TIMING_SAMPLE_RATE', '1.0'))
+FOVISSTE_SLOW_REQUEST_MS = int(os.getenv('FOVISSTE_SLOW_REQUEST_MS', '1000'))
+if FOVISSTE_SERVER_TIMING:
+    MIDDLEWARE.insert(0, 'fovisste.timing.ServerTimingMiddleware')
+    TEMPLATES[0]['BACKEND'] = 'fovisste.timing.TimedDjangoTemplates'
+
 WSGI_APPLICATION = 'Prestaciones.wsgi.application'
 ASGI_APPLICATION = 'Prestaciones.asgi.application'
 
@@ -82,6 +96,66 @@ else:
         }
     }
 
+# Conexiones: cada proceso reutiliza su conexión durante DB_CONN_MAX_AGE segundos (0 = una
+# conexión por petición) y, con DB_CONN_HEALTH_CHECKS, la verifica antes de reutilizarla en
+# una petición nueva. Con Postgres y DB_POOL=True se usa el pool nativo de psycopg
+# (requiere psycopg[pool]; si no está instalado quedan las conexiones persistentes):
+# DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE conexiones por proceso y DB_POOL_TIMEOUT segundos de
+# espera por una libre; Django exige CONN_MAX_AGE=0 con pool. Bajo ASGI usar el pool o
+# DB_CONN_MAX_AGE=0. Scripts y comandos largos: fovisste.dbpool. Medición: bench_connections.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+DB_POOL = os.getenv('DB_POOL', 'True') == 'True'
+DATABASES['default']['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+DATABASES['default']['CONN_HEALTH_CHECKS'] = DB_CONN_HEALTH_CHECKS
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql' and DB_POOL:
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '5')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        }
+
+# Réplica de sólo lectura (opcional): si se define DB_REPLICA_HOST se agrega el alias
+# 'replica' con los mismos datos que 'default' salvo host/puerto/usuario/contraseña.
+# fovisste.routers manda ahí las vistas de consulta (consulta, resultados, reportes);
+# las escrituras y la ingesta siempre van a 'default'. Tras una escritura, la sesión lee
+# de 'default' durante FOVISSTE_REPLICA_PIN_SECONDS (retraso máximo esperado de la réplica).
+# Para probar en local basta apuntar DB_REPLICA_HOST a la misma BD; en tests es un espejo de 'default'.
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST', '')
+if DB_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'PORT': int(os.getenv('DB_REPLICA_PORT', str(DATABASES['default']['PORT']))),
+        'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.contrib.auth.middleware.AuthenticationMiddleware') + 1,
+                      'fovisste.routers.PinPrimaryMiddleware')
+DATABASE_ROUTERS = ['fovisste.routers.ReplicaRouter']
+FOVISSTE_REPLICA_PIN_SECONDS = float(os.getenv('FOVISSTE_REPLICA_PIN_SECONDS', '10'))
+
+# Cache: guarda el progreso de cargas que lee el stream SSE (api_progress) y los
+# contadores de /metrics. LocMemCache sólo es visible dentro de un proceso; con varios
+# workers usa un backend compartido que no sea la BD, p. ej.
+# DJANGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache y
+# DJANGO_CACHE_LOCATION=redis://127.0.0.1:6379/1. DatabaseCache no sirve: el progreso se
+# escribe dentro de la transacción de la carga (no se vería hasta el commit y se perdería
+# con el rollback); el check fovisste.E001 lo rechaza.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'prestaciones'),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator', 'OPTIONS': {'min_length': 8}},
@@ -101,6 +175,79 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Las pruebas corren con MEDIA_ROOT en un directorio temporal (reportes de errores,
+# subidas por partes, conciliaciones): no dejan archivos en media/
+TEST_RUNNER = 'fovisste.tests.runner.TempMediaRunner'
+
+# Subida por partes (api/chunked/...): tamaño de cada parte que envía el navegador.
+# Debe quedar por debajo del límite de cuerpo del proxy (p. ej. client_max_body_size en nginx).
+FOVISSTE_CHUNK_SIZE = int(os.getenv('FOVISSTE_CHUNK_SIZE', str(4 * 1024 * 1024)))
+
+# Consulta y resultados se envían en streaming (fovisste.streaming): filas por bloque
+# leídas con iterator(chunk_size=...) y renderizadas al vuelo.
+FOVISSTE_STREAM_CHUNK = int(os.getenv('FOVISSTE_STREAM_CHUNK', '500'))
+
+# Estado actual por RFC (fovisste.snapshot): consulta busca en RecordSnapshot salvo con
+# "Mostrar historial". La migración lo llena y se actualiza al terminar cada carga y al
+# revertir un lote. Desactivado, consulta usa Record; al volver a activarlo hay que correr
+# `python manage.py rebuild_snapshot`.
+FOVISSTE_SNAPSHOT = os.getenv('FOVISSTE_SNAPSHOT', 'True') == 'True'
+# Filas por bloque al aplicar/reconstruir el snapshot
+FOVISSTE_SNAPSHOT_CHUNK = int(os.getenv('FOVISSTE_SNAPSHOT_CHUNK', '1000'))
+
+# Validación de campos (RFC, QNA, tipo, importes) al generar el preview y en carga directa.
+# Sólo informa conteos por regla y muestras; no bloquea la carga.
+FOVISSTE_VALIDATION = os.getenv('FOVISSTE_VALIDATION', 'True') == 'True'
+
+# Errores de preview/carga: la respuesta y la sesión llevan sólo el conteo por tipo y una
+# muestra de FOVISSTE_ERROR_SAMPLE errores; la lista completa queda comprimida en
+# FOVISSTE_ERROR_REPORT_DIR (vacío = MEDIA_ROOT/errores/; descarga en api/errores/<id>/)
+# durante FOVISSTE_ERROR_REPORT_HOURS.
+FOVISSTE_ERROR_SAMPLE = int(os.getenv('FOVISSTE_ERROR_SAMPLE', '50'))
+FOVISSTE_ERROR_REPORT_HOURS = int(os.getenv('FOVISSTE_ERROR_REPORT_HOURS', '24'))
+FOVISSTE_ERROR_REPORT_DIR = os.getenv('FOVISSTE_ERROR_REPORT_DIR', '')
+
+# Control de admisión (fovisste.admission): previews, confirmaciones y cargas directas
+# simultáneas, en total y por usuario (0 = sin límite). Con todos los turnos ocupados la
+# petición recibe 429 con Retry-After de FOVISSTE_UPLOAD_RETRY_AFTER segundos. Un turno
+# que no se liberó (proceso caído) vence a los FOVISSTE_UPLOAD_SLOT_TIMEOUT segundos;
+# debe ser mayor que la carga más larga.
+FOVISSTE_UPLOAD_SLOTS = int(os.getenv('FOVISSTE_UPLOAD_SLOTS', '4'))
+FOVISSTE_UPLOAD_SLOTS_PER_USER = int(os.getenv('FOVISSTE_UPLOAD_SLOTS_PER_USER', '1'))
+FOVISSTE_UPLOAD_SLOT_TIMEOUT = int(os.getenv('FOVISSTE_UPLOAD_SLOT_TIMEOUT', '3600'))
+FOVISSTE_UPLOAD_RETRY_AFTER = int(os.getenv('FOVISSTE_UPLOAD_RETRY_AFTER', '15'))
+
+# Modo de inserción al confirmar/cargar: 'atomic' (todo o nada) o 'chunked' (bloques de
+# FOVISSTE_COMMIT_CHUNK_SIZE filas, cada uno en su transacción; las filas que fallan se reportan).
+FOVISSTE_COMMIT_MODE = os.getenv('FOVISSTE_COMMIT_MODE', 'atomic')
+FOVISSTE_COMMIT_CHUNK_SIZE = int(os.getenv('FOVISSTE_COMMIT_CHUNK_SIZE', '5000'))
+
+# Filas por INSERT (fovisste.batching): tamaño inicial y máximo. Con FOVISSTE_BULK_BATCH_ADAPTIVE
+# el tamaño se ajusta durante la carga según la latencia de cada lote, respetando
+# max_allowed_packet (MySQL) y el límite de parámetros del backend; en False es fijo.
+FOVISSTE_BULK_BATCH_SIZE = int(os.getenv('FOVISSTE_BULK_BATCH_SIZE', '1000'))
+FOVISSTE_BULK_BATCH_MAX = int(os.getenv('FOVISSTE_BULK_BATCH_MAX', '20000'))
+FOVISSTE_BULK_BATCH_ADAPTIVE = os.getenv('FOVISSTE_BULK_BATCH_ADAPTIVE', 'True') == 'True'
+
+# Reversión de cargas (admin y comando revert_load): filas borradas por transacción y
+# pausa en segundos entre bloques, para no bloquear Record en horario de operación.
+FOVISSTE_REVERT_CHUNK_SIZE = int(os.getenv('FOVISSTE_REVERT_CHUNK_SIZE', '5000'))
+FOVISSTE_REVERT_PAUSE = float(os.getenv('FOVISSTE_REVERT_PAUSE', '0.1'))
+
+# Candado por quincena/lote entre nodos (fovisste.locks: GET_LOCK en MySQL, bloqueo
+# consultivo en Postgres): segundos que confirmación, carga directa, reversión e ingest_dir
+# esperan a que otro proceso termine con el mismo lote antes de responder 409 / omitirlo.
+FOVISSTE_LOAD_LOCK_TIMEOUT = float(os.getenv('FOVISSTE_LOAD_LOCK_TIMEOUT', '10'))
+
+# Motor de parseo para ingest_dir: 'python' (por línea) o 'numpy' (columnar, requiere NumPy;
+# si no está instalado se usa 'python').
+FOVISSTE_PARSE_ENGINE = os.getenv('FOVISSTE_PARSE_ENGINE', 'python')
+
+# /metrics (fovisste.metrics): sólo staff; opcionalmente un token para el scraper de Prometheus
+# (cabecera Authorization: Bearer <token>). Los contadores viven en CACHES: con varios
+# procesos usar un cache compartido (Redis/Memcached).
+FOVISSTE_METRICS_TOKEN = os.getenv('FOVISSTE_METRICS_TOKEN', '')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = 'login'
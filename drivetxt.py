@@ -1,21 +1,20 @@
+import time
+
 import mysql.connector
 from mysql.connector import Error
 
+from fovisste import dbpool
+from fovisste.batching import BatchSizer
+
 
 def conectar_bd():
-    """Establece la conexión con la base de datos MySQL"""
+    """Toma una conexión del pool de MySQL (fovisste.dbpool); al cerrarla regresa al pool."""
+    params = dbpool.mysql_params()
     try:
         print("Intentando conectar a la base de datos...")
-        print(f"Host: localhost, Puerto: 3306, Usuario: root, Base de datos: webquery_db")
-       
-        conexion = mysql.connector.connect(
-            host='localhost',
-            port=3306,
-            user='root',
-            password='Host456my.sql',
-            database='desc64',
-            connection_timeout=5  # limitado en tiempo con timeout para no esperar demasiado
-        )
+        print(f"Host: {params['host']}, Puerto: {params['port']}, Usuario: {params['user']}, Base de datos: {params['database']}")
+
+        conexion = dbpool.checkout()  # verificada con ping antes de entregarse
         print("Conexión exitosa a la base de datos")
         return conexion
     except Error as e:
@@ -32,6 +31,34 @@ def conectar_bd():
         return None
 
 
+# Mapeo de campos del registro a las columnas de la tabla
+MAPEO_CAMPOS = {
+    'rfc': 'rfc',
+    'nombre': 'nombre',
+    'cadena1': 'cadena1',
+    'tipo': 'tipo',
+    'impor': 'impor',
+    'cpto': 'cpto',
+    'lote_actual': 'lote_actual',
+    'qna': 'qna',
+    'ptje': 'ptje',
+    'observacio': 'observacio',
+    'lote_anterior': 'lote_anterior',
+    'qna_ini': 'qna_ini'
+}
+
+
+def valores_registro(registro, campos):
+    """Valores de un registro en el orden de ``campos`` (numéricos vacíos como '0')."""
+    valores = []
+    for campo_bd in campos:
+        valor = registro.get(MAPEO_CAMPOS[campo_bd], '')
+        if campo_bd in ['impor', 'ptje'] and valor == '':
+            valor = '0'
+        valores.append(valor)
+    return valores
+
+
 def insertar_registro(conexion, registro):
     """Inserta un registro en la tabla cto64"""
     cursor = None
@@ -46,22 +73,8 @@ def insertar_registro(conexion, registro):
         # Construir dinámicamente la consulta SQL basada en las columnas existentes
         campos = []
         valores = []
-       
-        # Mapeo de campos del registro a las columnas de la tabla
-        mapeo_campos = {
-            'rfc': 'rfc',
-            'nombre': 'nombre',
-            'cadena1': 'cadena1',
-            'tipo': 'tipo',
-            'impor': 'impor',
-            'cpto': 'cpto',
-            'lote_actual': 'lote_actual',
-            'qna': 'qna',
-            'ptje': 'ptje',
-            'observacio': 'observacio',
-            'lote_anterior': 'lote_anterior',
-            'qna_ini': 'qna_ini'
-        }
+
+        mapeo_campos = MAPEO_CAMPOS
        
         # Filtra solo las columnas que existen en la tabla
         campos_disponibles = []
@@ -109,6 +122,54 @@ def insertar_registro(conexion, registro):
             cursor.close()
 
 
+def insertar_registros(conexion, registros):
+    """Inserta los registros en la tabla cto64 por lotes (executemany + commit por lote).
+
+    El tamaño de cada lote lo ajusta ``BatchSizer`` según lo que tarda cada uno,
+    sin pasar de ``max_allowed_packet``. Devuelve el número de filas insertadas.
+    """
+    cursor = None
+    insertados = 0
+    try:
+        cursor = conexion.cursor()
+        # Estructura de la tabla una sola vez (no por registro)
+        cursor.execute("SHOW COLUMNS FROM cto64")
+        columnas = {col[0] for col in cursor.fetchall()}
+        cursor.execute("SELECT @@max_allowed_packet")
+        max_packet = int(cursor.fetchone()[0])
+
+        campos = [campo for campo in MAPEO_CAMPOS if campo in columnas]
+        placeholders = ', '.join(['%s'] * len(campos))
+        campos_sql = ', '.join([f'`{campo}`' for campo in campos])
+        sql = f"INSERT INTO cto64 ({campos_sql}) VALUES ({placeholders})"
+
+        filas = [valores_registro(registro, campos) for registro in registros]
+        sizer = BatchSizer(max_packet=max_packet, name='cto64')
+        for fila in filas[:100]:
+            sizer.observe_row(fila)
+        for lote in sizer.split(filas):
+            inicio = time.perf_counter()
+            cursor.executemany(sql, lote)
+            conexion.commit()
+            sizer.record(len(lote), time.perf_counter() - inicio)
+            insertados += len(lote)
+        print(f"Lotes: {sizer.summary()}")
+        return insertados
+
+    except Error as e:
+        print("\n¡Error al insertar registros!")
+        print(f"Tipo de error: {type(e).__name__}")
+        print(f"Mensaje de error: {str(e)}")
+        print(f"Registros insertados antes del error: {insertados}")
+        if conexion:
+            conexion.rollback()
+        return insertados
+
+    finally:
+        if cursor:
+            cursor.close()
+
+
 def validar_archivo(nombre_archivo):
     """
     Valida que el archivo exista y tenga el formato correcto.
@@ -239,9 +300,7 @@ def main():
    
     if conexion:
         try:
-            registros_insertados = 0
-            for registro in registros:
-                registros_insertados += insertar_registro(conexion, registro)
+            registros_insertados = insertar_registros(conexion, registros)
            
             print(f"\nResumen de la carga a la base de datos:")
             print(f"- Total de registros procesados: {len(registros)}")
@@ -1,19 +1,178 @@
-from django.contrib import admin
-from .models import Record, Activity
+import re
+
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .models import Record, Activity, Carga, IngestCheckpoint
+from .revert import RevertError, revert_load
+from .validation import TIPOS_VALIDOS
 
 
 #aqui se configura el registro de las tablas del log de Django
 # (Record) y (Activity)
 
+COUNT_LIMIT = 10_000  # con filtros, se cuentan a lo más estas filas (las páginas llegan hasta ahí)
+
+
+def estimated_rows(model, using):
+    """Filas aproximadas de la tabla según las estadísticas de la BD (``None`` si no hay)."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Evita ``COUNT(*)`` completo en el changelist: sin filtros usa la estimación de la
+    BD; con filtros cuenta sobre ``LIMIT COUNT_LIMIT``."""
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if not qs.query.where:
+            estimate = estimated_rows(qs.model, qs.db)
+            if estimate is not None and estimate > COUNT_LIMIT:
+                return estimate
+        return qs.order_by()[:COUNT_LIMIT].count()
+
+
+class QuincenaFilter(admin.SimpleListFilter):
+    # Opciones tomadas de Carga (pocas filas), no de un DISTINCT sobre Record
+    title = 'quincena proceso'
+    parameter_name = 'qna_ini'
+
+    def lookups(self, request, model_admin):
+        qnas = (Carga.objects.exclude(qna_ini='').order_by('-qna_ini')
+                .values_list('qna_ini', flat=True).distinct()[:48])
+        return [(q, q) for q in qnas]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(qna_ini=self.value())
+        return queryset
+
+
+class LoteFilter(admin.SimpleListFilter):
+    # Sólo se muestra con una quincena elegida: los lotes de esa quincena según Carga
+    title = 'lote'
+    parameter_name = 'lote_anterior'
+
+    def lookups(self, request, model_admin):
+        qna_ini = request.GET.get(QuincenaFilter.parameter_name)
+        if not qna_ini:
+            return []
+        lotes = (Carga.objects.filter(qna_ini=qna_ini).order_by('lote_anterior')
+                 .values_list('lote_anterior', flat=True).distinct())
+        return [(lote, lote) for lote in lotes]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(lote_anterior=self.value())
+        return queryset
+
+
+class TipoFilter(admin.SimpleListFilter):
+    title = 'tipo'
+    parameter_name = 'tipo'
+
+    def lookups(self, request, model_admin):
+        return [(t, t) for t in sorted(TIPOS_VALIDOS)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(tipo=self.value())
+        return queryset
+
+
 # Configuración de la aplicación
 @admin.register(Record)
 class RecordAdmin(admin.ModelAdmin):
     list_display = ("rfc", "nombre", "cadena1", "tipo", "impor", "cpto", "lote_actual", "qna", "ptje", "responsable", "fecha_carga")
-    search_fields = ("rfc", "nombre", "cadena1", "qna", "observacio", "lote_anterior", "qna_ini")
+    list_select_related = ("responsable",)
+    list_filter = (QuincenaFilter, LoteFilter, TipoFilter, ("fecha_carga", admin.DateFieldListFilter))
+    # La búsqueda la resuelve get_search_results sobre columnas con índice
+    search_fields = ("rfc", "nombre", "qna_ini", "lote_anterior")
+    search_help_text = "RFC o nombre (inicio), quincena AAAAMM, o campo:valor con rfc, nombre, qna o lote."
+    sortable_by = ("rfc", "nombre", "qna", "fecha_carga")
+    raw_id_fields = ("responsable",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    SEARCH_LOOKUPS = {
+        'rfc': 'rfc__startswith',
+        'nombre': 'nombre__startswith',
+        'qna': 'qna_ini',
+        'lote': 'lote_anterior',
+    }
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        field, sep, value = term.partition(':')
+        if sep and field.strip().lower() in self.SEARCH_LOOKUPS:
+            lookup = self.SEARCH_LOOKUPS[field.strip().lower()]
+            return queryset.filter(**{lookup: value.strip().upper()}), False
+        term = term.upper()
+        if re.fullmatch(r'\d{6}', term):
+            return queryset.filter(qna_ini=term), False
+        # Dos rangos de índice (rfc y nombre) en lugar de icontains sobre siete columnas
+        return queryset.filter(Q(rfc__startswith=term) | Q(nombre__startswith=term)), False
 
 
 # Configuración de la aplicación
 @admin.register(Activity)
 class ActivityAdmin(admin.ModelAdmin): 
     list_display = ("user", "segmento", "actividad", "creado_en")
-    search_fields = ("user__username", "segmento", "actividad")
+    list_select_related = ("user",)
+    list_filter = (("creado_en", admin.DateFieldListFilter),)
+    search_fields = ("user__username__exact", "segmento__exact")
+    search_help_text = "Usuario o segmento exacto (p. ej. carga, consulta, reversion)."
+    sortable_by = ("creado_en",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+# Checkpoints del comando ingest_dir (borrar uno permite recargar ese archivo)
+@admin.register(IngestCheckpoint)
+class IngestCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("ruta", "qna_ini", "lote_anterior", "estado", "registros", "errores", "actualizado_en")
+    list_filter = ("estado",)
+    search_fields = ("ruta",)
+
+
+# Cargas hacia Record (confirmaciones, carga directa e ingest_dir)
+@admin.register(Carga)
+class CargaAdmin(admin.ModelAdmin):
+    list_display = ("qna_ini", "lote_anterior", "archivo", "modo", "estado", "creados", "fallidos", "revertidos", "responsable", "iniciado_en")
+    list_filter = ("estado", "modo")
+    search_fields = ("archivo", "qna_ini", "lote_anterior")
+    list_select_related = ("responsable",)
+    actions = ("revertir_cargas",)
+
+    def has_revert_permission(self, request):
+        return request.user.has_perm('fovisste.delete_record')
+
+    @admin.action(description="Revertir carga (borrar sus registros por bloques)", permissions=["revert"])
+    def revertir_cargas(self, request, queryset):
+        # Los registros se identifican por quincena + lote; varias cargas del mismo lote se revierten una vez
+        for qna_ini, lote in sorted(set(queryset.values_list("qna_ini", "lote_anterior"))):
+            try:
+                result = revert_load(qna_ini, lote, user=request.user)
+            except RevertError as e:
+                self.message_user(request, str(e), messages.ERROR)
+                continue
+            self.message_user(request, f"Lote {lote} de {qna_ini}: {result.deleted} registros borrados en {result.chunks} bloques.")
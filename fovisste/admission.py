@@ -0,0 +1,129 @@
+"""Control de admisión para preview, confirmación y carga directa.
+
+Parsear un archivo grande o insertar una carga completa ocupa un worker y la base
+de datos durante minutos; sin límite, varios usuarios subiendo a la vez dejan sin
+workers a ``consulta_view``. Cada petición pesada toma antes un turno:
+
+- ``FOVISSTE_UPLOAD_SLOTS`` turnos en total (0 = sin límite global);
+- ``FOVISSTE_UPLOAD_SLOTS_PER_USER`` turnos por usuario (0 = sin límite por usuario).
+
+Los turnos son filas de ``UploadSlot`` con número único (global y por usuario), así
+que el límite vale entre procesos y servidores: dos procesos que eligen el mismo
+número chocan con la restricción única y uno reintenta con el siguiente. Si el
+proceso muere sin liberar el turno, éste vence a los ``FOVISSTE_UPLOAD_SLOT_TIMEOUT``
+segundos. Sin turno libre la vista responde 429 con ``Retry-After`` de inmediato.
+"""
+import functools
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+
+from . import metrics
+from .models import UploadSlot
+
+GLOBAL_SLOTS = getattr(settings, 'FOVISSTE_UPLOAD_SLOTS', 4)
+USER_SLOTS = getattr(settings, 'FOVISSTE_UPLOAD_SLOTS_PER_USER', 1)
+SLOT_TIMEOUT = getattr(settings, 'FOVISSTE_UPLOAD_SLOT_TIMEOUT', 3600)
+RETRY_AFTER = getattr(settings, 'FOVISSTE_UPLOAD_RETRY_AFTER', 15)
+ATTEMPTS = 5  # reintentos cuando otro proceso toma el mismo número al mismo tiempo
+
+TIPO_PREVIEW = 'preview'
+TIPO_CARGA = 'carga'
+
+SCOPE_GLOBAL = 'global'
+SCOPE_USUARIO = 'usuario'
+
+
+class SlotsFull(Exception):
+    def __init__(self, scope, retry_after=None):
+        self.scope = scope
+        self.retry_after = RETRY_AFTER if retry_after is None else retry_after
+        super().__init__(scope)
+
+    @property
+    def message(self):
+        if self.scope == SCOPE_USUARIO:
+            return 'Ya tienes una carga en proceso. Espera a que termine para iniciar otra.'
+        return 'Hay demasiadas cargas en proceso. Intenta de nuevo en unos segundos.'
+
+
+def _first_free(taken, limit):
+    for numero in range(limit):
+        if numero not in taken:
+            return numero
+    return None
+
+
+def expire_stale():
+    """Borra los turnos vencidos (procesos que murieron sin liberarlos)."""
+    return UploadSlot.objects.filter(expira_en__lt=timezone.now()).delete()[0]
+
+
+def acquire(user, tipo, timeout=None) -> UploadSlot:
+    """Toma un turno para ``user`` o lanza ``SlotsFull``."""
+    timeout = SLOT_TIMEOUT if timeout is None else timeout
+    expire_stale()
+    for _ in range(ATTEMPTS):
+        numero = numero_usuario = None
+        if GLOBAL_SLOTS:
+            numero = _first_free(set(UploadSlot.objects.values_list('numero', flat=True)), GLOBAL_SLOTS)
+            if numero is None:
+                raise SlotsFull(SCOPE_GLOBAL)
+        if USER_SLOTS:
+            taken = set(UploadSlot.objects.filter(user=user).values_list('numero_usuario', flat=True))
+            numero_usuario = _first_free(taken, USER_SLOTS)
+            if numero_usuario is None:
+                raise SlotsFull(SCOPE_USUARIO)
+        try:
+            with transaction.atomic():
+                return UploadSlot.objects.create(
+                    numero=numero, user=user, numero_usuario=numero_usuario, tipo=tipo,
+                    expira_en=timezone.now() + timedelta(seconds=timeout),
+                )
+        except IntegrityError:
+            continue  # otro proceso ganó ese número: volver a leer los ocupados
+    raise SlotsFull(SCOPE_GLOBAL)
+
+
+def release(slot):
+    UploadSlot.objects.filter(pk=slot.pk).delete()
+
+
+@contextmanager
+def upload_slot(user, tipo):
+    slot = acquire(user, tipo)
+    try:
+        yield slot
+    finally:
+        release(slot)
+
+
+def limit_concurrency(tipo):
+    """Decorador de vista: 429 con ``Retry-After`` si no hay turno libre.
+
+    Sólo aplica a POST; las demás peticiones (405, etc.) pasan sin turno.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'POST':
+                return view(request, *args, **kwargs)
+            try:
+                slot = acquire(request.user, tipo)
+            except SlotsFull as exc:
+                metrics.UPLOADS.inc(path=tipo, result='throttled')
+                response = JsonResponse({
+                    'ok': False, 'error': exc.message, 'retry_after': exc.retry_after,
+                }, status=429)
+                response['Retry-After'] = str(exc.retry_after)
+                return response
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                release(slot)
+        return wrapper
+    return decorator
@@ -9,3 +9,5 @@ class FovissteConfig(AppConfig):
     def ready(self):
         # Importa señales para crear roles/permisos tras migraciones
         from . import signals  # noqa: F401
+        # Registra los checks del sistema (cache del progreso)
+        from . import checks  # noqa: F401
@@ -0,0 +1,130 @@
+"""Tamaño de lote adaptativo para inserciones masivas (sin dependencias de Django).
+
+``BatchSizer`` mide cada lote insertado (filas y segundos) y ajusta el tamaño del
+siguiente con un ascenso de colina sobre el rendimiento (filas/s): mientras el
+rendimiento mejora sigue creciendo (o reduciendo) en la misma dirección; si
+empeora, invierte la dirección. Un lote que tarda más de ``max_seconds`` se
+reduce de inmediato para no retener bloqueos mucho tiempo.
+
+El tamaño nunca sale de ``[minimum, limit]``, donde ``limit`` respeta:
+
+- el tamaño máximo de paquete/sentencia (``max_allowed_packet`` en MySQL) según
+  el ancho estimado de una fila;
+- el máximo de parámetros por sentencia del backend (p. ej. 999 en SQLite
+  antiguo, 65535 en el protocolo de Postgres).
+
+Lo usan ``fovisste.loading`` (vía ``sizer_for``) y ``drivetxt.py``.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INITIAL = 1000
+DEFAULT_MINIMUM = 50
+DEFAULT_MAXIMUM = 20_000
+DEFAULT_MAX_SECONDS = 2.0  # lote más lento que esto se reduce aunque rinda más
+GROWTH = 1.5
+PACKET_SAFETY = 0.5  # fracción del paquete máximo que se permite llenar
+ROW_OVERHEAD = 16  # bytes por valor: comillas, comas y escape en el SQL
+
+
+def estimate_row_bytes(values) -> int:
+    """Bytes aproximados de una fila en el INSERT, a partir de sus valores."""
+    total = 0
+    for value in values:
+        total += ROW_OVERHEAD + (len(str(value).encode('utf-8')) if value is not None else 4)
+    return total
+
+
+class BatchSizer:
+    def __init__(self, initial=DEFAULT_INITIAL, minimum=DEFAULT_MINIMUM, maximum=DEFAULT_MAXIMUM,
+                 row_bytes=None, max_packet=None, params_per_row=None, max_params=None,
+                 max_seconds=DEFAULT_MAX_SECONDS, name=''):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.row_bytes = row_bytes
+        self.max_packet = max_packet
+        self.params_per_row = params_per_row
+        self.max_params = max_params
+        self.max_seconds = max_seconds
+        self.name = name
+        self.size = self._clamp(initial)
+        self.direction = 1
+        self.last_rate = None
+        self.batches = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.sizes = set()
+
+    @property
+    def limit(self) -> int:
+        """Tope duro por paquete y por número de parámetros."""
+        limit = self.maximum
+        if self.row_bytes and self.max_packet:
+            limit = min(limit, int(self.max_packet * PACKET_SAFETY) // self.row_bytes)
+        if self.params_per_row and self.max_params:
+            limit = min(limit, self.max_params // self.params_per_row)
+        return max(1, limit)  # el tope de paquete/parámetros manda sobre ``minimum``
+
+    def _clamp(self, size) -> int:
+        limit = self.limit
+        return max(min(self.minimum, limit), min(int(size), limit))
+
+    def observe_row(self, values):
+        """Ajusta el ancho estimado de fila (máximo visto) con los valores de una fila."""
+        row_bytes = estimate_row_bytes(values)
+        if self.row_bytes is None or row_bytes > self.row_bytes:
+            self.row_bytes = row_bytes
+            self.size = self._clamp(self.size)
+
+    def split(self, items):
+        """Parte una lista en lotes del tamaño actual (el tamaño puede cambiar entre lotes)."""
+        start = 0
+        while start < len(items):
+            end = start + self.size
+            yield items[start:end]
+            start = end
+
+    def record(self, rows, seconds):
+        """Registra un lote insertado y decide el tamaño del siguiente."""
+        self.batches += 1
+        self.rows += rows
+        self.seconds += seconds
+        self.sizes.add(self.size)
+        if rows < self.size or seconds <= 0:
+            return self.size  # lote incompleto (el último): no dice nada del tamaño
+        rate = rows / seconds
+        previous = self.size
+        if seconds > self.max_seconds:
+            self.direction = -1
+            self.size = self._clamp(self.size / GROWTH)
+        else:
+            if self.last_rate is not None and rate < self.last_rate * 0.95:
+                self.direction = -self.direction
+            factor = GROWTH if self.direction > 0 else 1 / GROWTH
+            self.size = self._clamp(self.size * factor)
+            if self.size == previous:
+                self.direction = -self.direction  # en un tope: probar hacia el otro lado
+        self.last_rate = rate
+        if self.size != previous:
+            logger.debug('%s: lote %d -> %d (%.0f filas/s, %.3fs)', self.name, previous, self.size, rate, seconds)
+        return self.size
+
+    def summary(self) -> dict:
+        return {
+            'size': self.size,
+            'limit': self.limit,
+            'batches': self.batches,
+            'rows': self.rows,
+            'rows_per_second': round(self.rows / self.seconds) if self.seconds else None,
+            'min_size': min(self.sizes) if self.sizes else self.size,
+            'max_size': max(self.sizes) if self.sizes else self.size,
+        }
+
+    def log_summary(self):
+        data = self.summary()
+        logger.info(
+            '%s: %d filas en %d lotes, tamaño final %d (rango %d-%d, tope %d), %s filas/s',
+            self.name, data['rows'], data['batches'], data['size'], data['min_size'], data['max_size'],
+            data['limit'], data['rows_per_second'],
+        )
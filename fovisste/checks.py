@@ -0,0 +1,24 @@
+"""Checks de ``manage.py check`` (y de ``runserver``/``migrate``) propios de fovisste."""
+from django.conf import settings
+from django.core.checks import Error, register
+
+DATABASE_CACHE = 'django.core.cache.backends.db.DatabaseCache'
+
+
+@register()
+def progress_cache_check(app_configs, **kwargs):
+    """El cache por omisión no puede ser la BD.
+
+    ``ProgressTracker.update`` y los contadores de ``metrics`` escriben dentro de la
+    transacción de la carga: con DatabaseCache el avance no se ve hasta el commit y
+    un rollback lo borra junto con los registros.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend != DATABASE_CACHE:
+        return []
+    return [Error(
+        'CACHES["default"] no puede ser DatabaseCache: el progreso y las métricas se escriben dentro '
+        'de la transacción de la carga.',
+        hint='Usa Redis o Memcached (DJANGO_CACHE_BACKEND) con varios workers, o LocMemCache con uno.',
+        id='fovisste.E001',
+    )]
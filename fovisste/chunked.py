@@ -0,0 +1,101 @@
+"""Almacenamiento de subidas por partes (protocolo start / chunk N / finish).
+
+Cada parte se recibe primero en un archivo temporal propio, sin candados: leer el
+cuerpo depende del cliente y puede tardar. Sólo después, con la fila de
+``ChunkedUpload`` bloqueada, se revisa el orden y la parte se renombra a
+``MEDIA_ROOT/chunked/<id>.<parte>.chunk`` (``commit_part``). Un reintento de una
+parte que se cortó a medias no deja bytes: su temporal nunca se renombra.
+``assemble`` concatena las partes en ``<id>.part`` al finalizar.
+"""
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ChunkedUpload
+
+# Tamaño de parte que usa el cliente y máximo aceptado por petición
+CHUNK_SIZE = getattr(settings, 'FOVISSTE_CHUNK_SIZE', 4 * 1024 * 1024)
+MAX_CHUNK_BYTES = getattr(settings, 'FOVISSTE_MAX_CHUNK_BYTES', 2 * CHUNK_SIZE)
+# Subidas sin actividad por más de este tiempo se descartan
+STALE_AFTER = timedelta(hours=getattr(settings, 'FOVISSTE_CHUNKED_STALE_HOURS', 24))
+READ_BLOCK = 64 * 1024
+
+
+class ChunkTooLarge(Exception):
+    pass
+
+
+def upload_dir() -> Path:
+    path = Path(settings.MEDIA_ROOT) / 'chunked'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def upload_path(upload: ChunkedUpload) -> Path:
+    return upload_dir() / f'{upload.pk}.part'
+
+
+def part_path(upload: ChunkedUpload, index: int) -> Path:
+    return upload_dir() / f'{upload.pk}.{index:06d}.chunk'
+
+
+def receive_part(upload: ChunkedUpload, stream) -> tuple:
+    """Escribe el cuerpo de la petición en un temporal; devuelve ``(ruta, bytes escritos)``.
+
+    Lee en bloques para no cargar la parte completa en memoria.
+    """
+    fd, tmp = tempfile.mkstemp(dir=upload_dir(), prefix=f'{upload.pk}.', suffix='.tmp')
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            while True:
+                block = stream.read(READ_BLOCK)
+                if not block:
+                    break
+                written += len(block)
+                if written > MAX_CHUNK_BYTES:
+                    raise ChunkTooLarge(f'La parte excede {MAX_CHUNK_BYTES} bytes')
+                fh.write(block)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return Path(tmp), written
+
+
+def commit_part(upload: ChunkedUpload, index: int, tmp: Path):
+    """Confirma la parte recibida (con la fila de la subida bloqueada)."""
+    os.replace(tmp, part_path(upload, index))
+
+
+def assemble(upload: ChunkedUpload) -> Path:
+    """Concatena las partes confirmadas en ``<id>.part`` y las borra."""
+    path = upload_path(upload)
+    with open(path, 'wb') as out:
+        for index in range(upload.siguiente_parte):
+            part = part_path(upload, index)
+            with open(part, 'rb') as fh:
+                shutil.copyfileobj(fh, out, READ_BLOCK)
+            os.remove(part)
+    return path
+
+
+def discard(upload: ChunkedUpload):
+    # Archivo ensamblado, partes confirmadas y temporales que quedaron de una petición cortada
+    for path in upload_dir().glob(f'{upload.pk}.*'):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    upload.delete()
+
+
+def cleanup_stale_uploads():
+    """Borra subidas abandonadas (y sus archivos temporales)."""
+    limit = timezone.now() - STALE_AFTER
+    for upload in ChunkedUpload.objects.filter(actualizado_en__lt=limit):
+        discard(upload)
@@ -0,0 +1,21 @@
+"""Orden y comparación binaria de RFC en la base de datos.
+
+La collation por omisión de MySQL (``utf8mb4_0900_ai_ci`` / ``utf8mb4_general_ci``)
+ignora acentos y mayúsculas: 'Ñ' se ordena y compara igual que 'N', y ``RFC_RE``
+acepta Ñ. Quien recorre RFC por llave y los compara en Python (conciliación,
+snapshot) ordena con ``binary('rfc')``: el mismo orden que ``str`` de Python
+(por código de carácter) en los tres backends.
+"""
+from django.db import connection as default_connection
+from django.db.models import F
+from django.db.models.functions import Collate
+
+# utf8mb4_bin / "C" / BINARY comparan por código de carácter (UTF-8 conserva ese orden)
+BINARY_COLLATIONS = {'mysql': 'utf8mb4_bin', 'postgresql': 'C', 'sqlite': 'BINARY'}
+
+
+def binary(field, connection=None):
+    """``field`` con collation binaria del backend (para ``order_by`` y filtros ``gt``/``exact``)."""
+    vendor = (connection or default_connection).vendor
+    collation = BINARY_COLLATIONS.get(vendor)
+    return Collate(field, collation) if collation else F(field)
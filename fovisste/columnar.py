@@ -0,0 +1,220 @@
+"""Motor de parseo columnar para archivos de ancho fijo (opcional, requiere NumPy).
+
+En lugar de cortar cada línea campo por campo (``parse_line``), un bloque del
+archivo se lee como un arreglo de bytes con ``numpy.frombuffer`` y cada campo se
+obtiene como una columna completa. Las líneas de longitud mixta (94, 100, 157)
+se rellenan con espacios a la rejilla de 157 columnas (igual que
+``parse_line``, que completa a 100) y el fallback de PTJE se aplica por columna.
+
+Las líneas cortas, en blanco o con bytes no ASCII (UTF-8 multibyte, latin-1)
+se pasan al parser por línea de ``fovisste.parsing``: el resultado es idéntico
+a ``iter_records`` / ``parse_file``. No usa Django, así se puede usar desde el
+pool de procesos de ``ingest_dir``.
+
+Sólo acelera el parseo (del orden de 2x con las filas ya convertidas a tuplas);
+la validación y la inserción siguen trabajando fila por fila.
+"""
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import as_strided
+except ImportError:  # NumPy es opcional: sin él se usa el parser por línea
+    np = None
+
+from .parsing import (
+    DEFAULT_ENCODINGS, FIELDS, FIELD_NAMES, REQUIRED_MIN_LEN,
+    open_upload, parse_raw_line,
+)
+
+AVAILABLE = np is not None
+BLOCK_BYTES = 16 * 1024 * 1024  # bytes por bloque; acota la memoria por archivo
+GRID_WIDTH = 157
+SPACE = 0x20
+BOM = b'\xef\xbb\xbf'
+_FIELD_SLICES = {name: (start, end) for name, start, end in FIELDS}
+
+
+class ColumnBlock:
+    """Registros de un bloque del archivo como columnas (``campo -> ndarray de str``)."""
+
+    def __init__(self, columns, lines, errors):
+        self.columns = columns
+        self.lines = lines  # número de línea (sin contar líneas en blanco) de cada registro
+        self.errors = errors
+
+    def __len__(self):
+        return len(self.lines)
+
+    def rows(self):
+        """Tuplas en el orden de ``FIELD_NAMES`` (mismo formato que ``parse_file``)."""
+        return zip(*(self.columns[name].tolist() for name in FIELD_NAMES))
+
+
+def _read_blocks(stream, block_bytes):
+    """Bloques de bytes que terminan en salto de línea (salvo quizá el último)."""
+    if not hasattr(stream, 'read'):  # iterador de líneas (gzip/zip vía open_upload)
+        parts, size = [], 0
+        for raw in stream:
+            parts.append(raw)
+            size += len(raw)
+            if size >= block_bytes:
+                yield b''.join(parts)
+                parts, size = [], 0
+        if parts:
+            yield b''.join(parts)
+        return
+    pending = b''
+    while True:
+        chunk = stream.read(block_bytes)
+        if not chunk:
+            if pending:
+                yield pending
+            return
+        data = pending + chunk
+        if len(chunk) < block_bytes:  # fin del archivo
+            yield data
+            return
+        cut = data.rfind(b'\n')
+        if cut < 0:
+            pending = data
+            continue
+        yield data[:cut + 1]
+        pending = data[cut + 1:]
+
+
+def _decode_column(col):
+    """Matriz de bytes ASCII -> arreglo de str sin espacios a los lados. Los bytes ASCII
+    coinciden con su código Unicode, así que basta ensanchar a uint32 y verlo como UCS-4."""
+    width = col.shape[1]
+    wide = np.ascontiguousarray(col, dtype='<u4').view(f'<U{width}').ravel()
+    return np.char.strip(wide)
+
+
+def _line_bounds(buf):
+    newlines = np.flatnonzero(buf == 0x0A)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(buf)]))
+    if starts[-1] >= len(buf):  # el bloque termina en salto de línea
+        starts, ends = starts[:-1], ends[:-1]
+    has_cr = (ends > starts) & (buf[np.maximum(ends - 1, 0)] == 0x0D)
+    return starts, ends - has_cr
+
+
+def _any_in_lines(mask, starts):
+    """Por línea, si algún byte cumple ``mask``. Cada tramo de ``reduceat`` incluye el
+    salto de línea, que no cumple ninguna de las máscaras usadas (bytes > 0x20)."""
+    if not len(starts):
+        return np.zeros(0, dtype=bool)
+    return np.logical_or.reduceat(mask, starts)
+
+
+def _grid_columns(buf, starts, lengths):
+    """Función ``column(inicio, fin)`` que devuelve los bytes de un campo como matriz
+    (filas x ancho), rellena con espacios donde la línea es más corta que la rejilla."""
+    n = len(starts)
+    length = int(lengths[0]) if n else 0
+    stride = int(starts[1] - starts[0]) if n > 1 else length
+    if n and bool(np.all(lengths == length)) and (n == 1 or bool(np.all(np.diff(starts) == stride))):
+        # Caso común (archivo validado): todas las líneas iguales -> una vista sin copias
+        width = min(length, GRID_WIDTH)
+        grid = as_strided(buf[int(starts[0]):], shape=(n, width), strides=(stride, 1), writeable=False)
+
+        def column(start, end):
+            if end <= width:
+                return grid[:, start:end]
+            out = np.full((n, end - start), SPACE, np.uint8)
+            if start < width:
+                out[:, :width - start] = grid[:, start:width]
+            return out
+        return column
+
+    last = max(len(buf) - 1, 0)
+
+    def column(start, end):
+        offsets = np.arange(start, end)
+        positions = np.minimum(starts[:, None] + offsets, last)
+        return np.where(offsets < lengths[:, None], buf[positions], SPACE).astype(np.uint8)
+    return column
+
+
+# Estado de cada línea del bloque
+_BLANK, _FAST, _SLOW, _ERROR = 0, 1, 2, 3
+
+
+def _parse_block(data, last_idx, name, encodings):
+    buf = np.frombuffer(data, dtype=np.uint8)
+    starts, ends = _line_bounds(buf)
+    lengths = ends - starts
+    high = buf >= 0x80
+    non_ascii = _any_in_lines(high, starts) if high.any() else np.zeros(len(starts), dtype=bool)
+    non_space = _any_in_lines(buf > SPACE, starts)
+    status = np.where((lengths >= REQUIRED_MIN_LEN) & ~non_ascii & non_space, _FAST, _BLANK).astype(np.int8)
+
+    # Líneas que no entran al camino vectorizado (en blanco, cortas o no ASCII): parser por línea
+    slow = {}
+    for i in np.flatnonzero(status != _FAST).tolist():
+        raw = data[starts[i]:ends[i]]
+        if not raw.strip():
+            continue
+        length, parsed = parse_raw_line(raw, encodings)
+        if parsed is None:
+            status[i] = _ERROR
+            slow[i] = length
+        else:
+            status[i] = _SLOW
+            slow[i] = parsed
+
+    numbers = last_idx + np.cumsum(status != _BLANK)
+    errors = [
+        {'file': name, 'line': int(numbers[i]), 'error': f'Longitud {slow[i]} < {REQUIRED_MIN_LEN}'}
+        for i in np.flatnonzero(status == _ERROR).tolist()
+    ]
+    records = np.flatnonzero((status == _FAST) | (status == _SLOW))
+    is_fast = status[records] == _FAST
+    fast_rows = records[is_fast]
+    column = _grid_columns(buf, starts[fast_rows], lengths[fast_rows])
+
+    columns = {}
+    for field, (start, end) in _FIELD_SLICES.items():
+        col = column(start, end)
+        if field == 'ptje':
+            col = np.array(col)
+            blank = np.all(col == SPACE, axis=1)
+            if blank.any():  # fallback de PTJE, igual que parse_line
+                col[blank] = column(155, 157)[blank]
+        values = _decode_column(col)
+        if slow:
+            merged = np.empty(len(records), dtype=f'U{end - start}')
+            merged[is_fast] = values
+            for j in np.flatnonzero(~is_fast).tolist():
+                merged[j] = slow[int(records[j])][field]
+            values = merged
+        columns[field] = values
+    last = int(numbers[-1]) if len(numbers) else last_idx
+    return ColumnBlock(columns, numbers[records], errors), last
+
+
+def iter_column_blocks(stream, name='', encodings=DEFAULT_ENCODINGS, block_bytes=BLOCK_BYTES):
+    """Itera ``ColumnBlock`` de un archivo binario (o iterador de líneas) por bloques."""
+    if not AVAILABLE:
+        raise RuntimeError('El motor de parseo columnar requiere NumPy (pip install numpy)')
+    idx = 0
+    first = True
+    for data in _read_blocks(stream, block_bytes):
+        if first:
+            first = False
+            if data.startswith(BOM):
+                data = data[len(BOM):]
+        block, idx = _parse_block(data, idx, name, encodings)
+        yield block
+
+
+def parse_file_columnar(path, encodings=DEFAULT_ENCODINGS):
+    """Igual que ``parsing.parse_file`` pero con el motor columnar."""
+    rows = []
+    errors = []
+    with open(path, 'rb') as stream:
+        for name, lines in open_upload(str(path), stream):
+            for block in iter_column_blocks(lines, name, encodings):
+                rows.extend(block.rows())
+                errors.extend(block.errors)
+    return rows, errors
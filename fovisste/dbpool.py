@@ -0,0 +1,80 @@
+"""Conexiones reutilizables fuera del ciclo petición/respuesta.
+
+Las vistas usan las conexiones persistentes (o el pool de psycopg) que configura
+``DATABASES`` en settings: Django las revisa al inicio y al final de cada
+petición. Los procesos largos y los scripts no pasan por ese ciclo:
+
+- ``recycle_connections()`` hace lo mismo que Django entre peticiones: cierra las
+  conexiones vencidas (``CONN_MAX_AGE``) o con errores y rearma la verificación
+  de ``CONN_HEALTH_CHECKS`` para el siguiente uso. ``ingest_dir`` la llama antes
+  de cada archivo y de cada vuelta de ``--watch``, así una conexión que el servidor
+  cortó (``wait_timeout``) no tumba el proceso.
+- ``checkout()`` / ``pooled_connection()`` dan conexiones de ``mysql.connector``
+  desde un pool por proceso, verificadas con ``ping`` antes de entregarse. Las usa
+  ``drivetxt.py`` (sin Django), con las mismas variables ``MYSQL_*`` que settings.
+
+No importa Django a nivel de módulo para que ``drivetxt.py`` lo pueda usar solo.
+"""
+import os
+from contextlib import contextmanager
+
+POOL_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '5'))
+MYSQL_POOL_LIMIT = 32  # máximo de mysql.connector.pooling (CNX_POOL_MAXSIZE)
+
+_pools = {}
+
+
+def recycle_connections():
+    """Cierra conexiones de Django vencidas o rotas; nunca dentro de una transacción."""
+    from django.db import connections
+    for conn in connections.all(initialized_only=True):
+        if not conn.in_atomic_block:
+            conn.close_if_unusable_or_obsolete()
+
+
+def mysql_params() -> dict:
+    return {
+        'host': os.getenv('MYSQL_HOST', 'localhost'),
+        'port': int(os.getenv('MYSQL_PORT', '3306')),
+        'user': os.getenv('MYSQL_USER', 'root'),
+        'password': os.getenv('MYSQL_PASSWORD', 'Host456my.sql'),
+        'database': os.getenv('MYSQL_DATABASE', 'desc64'),
+        'connection_timeout': 5,
+    }
+
+
+def mysql_pool(size=None):
+    """Pool de ``mysql.connector`` del proceso actual (uno por PID: tras un fork no se comparten sockets)."""
+    from mysql.connector import pooling
+
+    pid = os.getpid()
+    pool = _pools.get(pid)
+    if pool is None:
+        pool = pooling.MySQLConnectionPool(
+            pool_name=f'fovisste-{pid}',
+            pool_size=max(1, min(size or POOL_SIZE, MYSQL_POOL_LIMIT)),
+            pool_reset_session=True,
+            **mysql_params(),
+        )
+        _pools[pid] = pool
+    return pool
+
+
+def checkout(size=None):
+    """Conexión del pool, verificada; ``close()`` la regresa al pool."""
+    conexion = mysql_pool(size).get_connection()
+    try:
+        conexion.ping(reconnect=True, attempts=2, delay=1)
+    except Exception:
+        conexion.close()
+        raise
+    return conexion
+
+
+@contextmanager
+def pooled_connection(size=None):
+    conexion = checkout(size)
+    try:
+        yield conexion
+    finally:
+        conexion.close()
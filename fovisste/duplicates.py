@@ -0,0 +1,57 @@
+"""Detección de duplicados en el preview de una carga.
+
+- Dentro del archivo: la misma combinación RFC + cpto aparece más de una vez.
+- Contra la BD: el RFC ya tiene registros cargados para la misma ``qna_ini``.
+
+Las llaves se comparan con sets/dicts (hash) y la consulta a BD se hace con
+pocos ``rfc IN (...)`` por bloques, nunca una consulta por fila.
+
+``DuplicateMarker`` marca los duplicados dentro del archivo mientras las filas pasan
+hacia ``PreviewRow`` (sólo guarda las llaves); la marca contra la BD se aplica
+después sobre las filas ya guardadas (``preview.flag_loaded``).
+"""
+from django.conf import settings
+
+from .models import Record
+
+DUP_ARCHIVO = 'archivo'
+DUP_BD = 'bd'
+QUERY_CHUNK = getattr(settings, 'FOVISSTE_DUP_QUERY_CHUNK', 1000)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def existing_rfcs(rfcs, qna_ini, chunk_size=None):
+    """RFCs de ``rfcs`` que ya tienen registros en ``Record`` para ``qna_ini``."""
+    chunk_size = chunk_size or QUERY_CHUNK
+    found = set()
+    for chunk in _chunks(sorted(rfcs), chunk_size):
+        found.update(
+            Record.objects.filter(qna_ini=qna_ini, rfc__in=chunk)
+            .order_by()  # sin el '-fecha_carga' de Meta: entraría al DISTINCT
+            .values_list('rfc', flat=True)
+            .distinct()
+        )
+    return found
+
+
+class DuplicateMarker:
+    """Marca ``duplicado = 'archivo'`` desde la segunda aparición de cada RFC + cpto."""
+
+    def __init__(self):
+        self.seen = set()
+        self.in_file = 0
+
+    def mark(self, row):
+        key = (row.get('rfc'), row.get('cpto'))
+        if key in self.seen:
+            row['duplicado'] = DUP_ARCHIVO
+            self.in_file += 1
+        else:
+            self.seen.add(key)
+
+    def rfcs(self) -> set:
+        return {rfc for rfc, _cpto in self.seen if rfc}
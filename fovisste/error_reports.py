@@ -0,0 +1,166 @@
+"""Reportes de errores de carga acotados: resumen por tipo + muestra + archivo completo.
+
+Antes cada línea mala se agregaba a una lista que viajaba completa en la respuesta
+JSON y en la sesión. Ahora ``ErrorReport`` cuenta los errores por tipo, guarda
+sólo los primeros ``FOVISSTE_ERROR_SAMPLE`` como muestra y escribe la lista
+completa, una línea JSON por error, en ``<FOVISSTE_ERROR_REPORT_DIR>/<usuario>/<id>.ndjson.gz``
+(por omisión ``MEDIA_ROOT/errores``). ``api/errores/<id>/`` la descarga como NDJSON o CSV
+en streaming.
+
+El archivo se crea hasta que hay algo que escribir: los errores se juntan en bloques
+de ``FLUSH_LINES`` y cada bloque se anexa como un miembro gzip en un ``with``, así
+no queda ningún archivo abierto si la petición termina con una excepción.
+
+Los reportes se borran después de ``FOVISSTE_ERROR_REPORT_HOURS``.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+SAMPLE_LIMIT = getattr(settings, 'FOVISSTE_ERROR_SAMPLE', 50)
+KEEP_HOURS = getattr(settings, 'FOVISSTE_ERROR_REPORT_HOURS', 24)
+CSV_FIELDS = ['tipo', 'file', 'line', 'error']
+STREAM_LINES = 1000  # líneas por bloque al descargar
+FLUSH_LINES = 500  # errores en memoria antes de anexarlos al archivo
+
+TIPO_LONGITUD = 'longitud'
+TIPO_ARCHIVO = 'archivo'
+TIPO_INSERCION = 'insercion'
+
+_REPORT_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def error_type(error) -> str:
+    """Tipo de un error: el que trae explícito, o deducido de su mensaje/forma."""
+    if error.get('tipo'):
+        return error['tipo']
+    if str(error.get('error', '')).startswith('Longitud'):
+        return TIPO_LONGITUD
+    if error.get('line') is None:
+        return TIPO_ARCHIVO
+    return 'otro'
+
+
+def reports_dir() -> Path:
+    return Path(getattr(settings, 'FOVISSTE_ERROR_REPORT_DIR', '') or Path(settings.MEDIA_ROOT) / 'errores')
+
+
+def user_dir(user_id) -> Path:
+    return reports_dir() / str(user_id)
+
+
+def report_path(user_id, report_id):
+    """Ruta del reporte, o ``None`` si el id no es válido."""
+    if not _REPORT_ID_RE.match(str(report_id)):
+        return None
+    return user_dir(user_id) / f'{report_id}.ndjson.gz'
+
+
+def cleanup_stale_reports(user_id):
+    limit = time.time() - KEEP_HOURS * 3600
+    directory = user_dir(user_id)
+    if not directory.is_dir():
+        return
+    for path in directory.glob('*.ndjson.gz'):
+        try:
+            if path.stat().st_mtime < limit:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class ErrorReport:
+    """Acumula errores sin guardarlos en memoria: conteo por tipo, muestra y archivo gzip."""
+
+    def __init__(self, user_id, sample_limit=None):
+        self.user_id = user_id
+        self.sample_limit = SAMPLE_LIMIT if sample_limit is None else sample_limit
+        self.report_id = uuid.uuid4().hex
+        self.total = 0
+        self.by_type = {}
+        self.sample = []
+        self._pending = []
+        self._created = False
+
+    def __len__(self):
+        return self.total
+
+    @property
+    def path(self):
+        return report_path(self.user_id, self.report_id)
+
+    def add(self, error, tipo=None):
+        tipo = tipo or error_type(error)
+        self.total += 1
+        self.by_type[tipo] = self.by_type.get(tipo, 0) + 1
+        if len(self.sample) < self.sample_limit:
+            self.sample.append(error)
+        self._pending.append(json.dumps({'tipo': tipo, **error}, ensure_ascii=False) + '\n')
+        if len(self._pending) >= FLUSH_LINES:
+            self.flush()
+
+    def extend(self, errors, tipo=None):
+        for error in errors:
+            self.add(error, tipo)
+
+    def flush(self):
+        """Anexa los errores pendientes al archivo (lo crea con el primer bloque)."""
+        if not self._pending:
+            return
+        if not self._created:
+            cleanup_stale_reports(self.user_id)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Un miembro gzip por bloque: gzip.open lee los miembros concatenados como un solo texto
+        with gzip.open(self.path, 'at' if self._created else 'wt', encoding='utf-8') as fh:
+            fh.writelines(self._pending)
+        self._created = True
+        self._pending = []
+
+    def summary(self) -> dict:
+        """Resumen chico para la respuesta JSON y la sesión (sin la lista completa)."""
+        self.flush()
+        return {
+            'total': self.total,
+            'por_tipo': dict(sorted(self.by_type.items())),
+            'muestra': len(self.sample),
+            'truncado': self.total > len(self.sample),
+            'reporte': self.report_id if self.total else None,
+        }
+
+
+def iter_report(path, fmt='ndjson'):
+    """Contenido del reporte en bloques de texto, como NDJSON o CSV."""
+    with gzip.open(path, 'rt', encoding='utf-8') as fh:
+        if fmt == 'ndjson':
+            while True:
+                lines = fh.readlines(STREAM_LINES * 100)
+                if not lines:
+                    return
+                yield ''.join(lines)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for n, line in enumerate(fh, start=1):
+            writer.writerow(json.loads(line))
+            if n % STREAM_LINES == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+
+def remove(user_id, report_id):
+    path = report_path(user_id, report_id)
+    if path is not None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,259 @@
+"""Inserción de registros en ``Record`` para confirmación, carga directa e ingesta.
+
+Dos modos (``FOVISSTE_COMMIT_MODE`` o el parámetro ``commit_mode`` de api_upload):
+
+- ``atomic``: toda la carga en una transacción; cualquier error la revierte completa.
+- ``chunked``: bloques de ``FOVISSTE_COMMIT_CHUNK_SIZE`` filas, cada uno en su propia
+  transacción. Si un bloque falla se reintenta fila por fila para aislar las filas
+  malas (se reportan con archivo y línea) y el resto del bloque se guarda. Los
+  bloqueos sobre ``Record`` duran sólo lo que tarda un bloque.
+
+En ambos casos se registra una ``Carga``; sólo queda ``completa`` cuando todos los
+bloques terminaron sin filas fallidas. Al terminar (también si quedó incompleta o
+falló a medias en modo ``chunked``) se actualiza ``RecordSnapshot`` con lo insertado,
+ya confirmado: si quien llama envuelve la carga en su propia transacción
+(``ingest_dir``), la actualización espera a su commit.
+
+Cada ``INSERT`` lleva un lote de tamaño adaptativo (``fovisste.batching``): empieza
+en ``FOVISSTE_BULK_BATCH_SIZE`` (o en el último tamaño aprendido por el proceso) y se
+ajusta según la latencia de cada lote, sin pasar del paquete máximo de MySQL ni del
+límite de parámetros del backend.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.utils import timezone
+
+from . import locks, metrics, snapshot
+from .batching import DEFAULT_MAXIMUM, BatchSizer
+from .models import Carga, Record
+
+COMMIT_MODE = getattr(settings, 'FOVISSTE_COMMIT_MODE', Carga.MODO_ATOMICO)
+COMMIT_CHUNK_SIZE = getattr(settings, 'FOVISSTE_COMMIT_CHUNK_SIZE', 5000)
+BULK_BATCH_SIZE = getattr(settings, 'FOVISSTE_BULK_BATCH_SIZE', 1000)
+BULK_BATCH_MAX = getattr(settings, 'FOVISSTE_BULK_BATCH_MAX', DEFAULT_MAXIMUM)
+BULK_BATCH_ADAPTIVE = getattr(settings, 'FOVISSTE_BULK_BATCH_ADAPTIVE', True)
+POSTGRES_MAX_PARAMS = 65535  # parámetros por sentencia en el protocolo de Postgres
+MAX_STORED_ERRORS = 200  # filas fallidas que se guardan en Carga.errores
+COMMIT_MODES = {mode for mode, _ in Carga.MODOS}
+
+logger = logging.getLogger(__name__)
+
+
+def record_from_data(data, user, qna_ini=None, lote_anterior=None) -> Record:
+    """Construye un ``Record`` desde un dict parseado; ``qna_ini`` / ``lote_anterior``
+    (valores de la sesión o del comando) tienen prioridad sobre los del archivo."""
+    return Record(
+        rfc=(data.get('rfc') or '')[:13],
+        nombre=(data.get('nombre') or '')[:30],
+        cadena1=((data.get('cadena1') or '')[:37] or None),
+        tipo=(data.get('tipo') or '')[:1],
+        impor=(data.get('impor') or '')[:8],
+        cpto=(data.get('cpto') or '')[:2],
+        lote_actual=(data.get('lote_actual') or '')[:1],
+        qna=(data.get('qna') or '')[:6],
+        ptje=(data.get('ptje') or '')[:2],
+        observacio=((data.get('observacio') or '')[:47] or None),
+        lote_anterior=(lote_anterior or data.get('lote_anterior') or '')[:5],
+        qna_ini=(qna_ini or data.get('qna_ini') or '')[:6],
+        responsable=user,
+    )
+
+
+class LoadResult:
+    def __init__(self, carga):
+        self.carga = carga
+        self.created = 0
+        self.failed = []  # [{'file', 'line', 'error'}]
+        self.started = time.perf_counter()
+
+    def as_dict(self) -> dict:
+        return {
+            'carga': self.carga.pk,
+            'estado': self.carga.estado,
+            'created': self.created,
+            'failed': len(self.failed),
+        }
+
+
+_INSERT_FIELDS = [f for f in Record._meta.concrete_fields if not f.primary_key]
+_packet_sizes = {}  # alias -> max_allowed_packet (MySQL)
+_learned_sizes = {}  # alias -> último tamaño de lote al que llegó este proceso
+
+
+def _max_packet(connection):
+    if connection.vendor != 'mysql':
+        return None
+    if connection.alias not in _packet_sizes:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT @@max_allowed_packet')
+            _packet_sizes[connection.alias] = int(cursor.fetchone()[0])
+    return _packet_sizes[connection.alias]
+
+
+def sizer_for(maximum=None, using=DEFAULT_DB_ALIAS) -> BatchSizer:
+    """``BatchSizer`` para insertar ``Record`` con los límites del backend de ``using``."""
+    connection = connections[using]
+    maximum = min(maximum or BULK_BATCH_MAX, BULK_BATCH_MAX)
+    # Filas por sentencia que admite el backend (SQLite: límite de variables)
+    maximum = max(1, min(maximum, connection.ops.bulk_batch_size(_INSERT_FIELDS, range(maximum))))
+    initial = _learned_sizes.get(using, BULK_BATCH_SIZE)
+    if not BULK_BATCH_ADAPTIVE:
+        return BatchSizer(initial=BULK_BATCH_SIZE, minimum=BULK_BATCH_SIZE, maximum=min(BULK_BATCH_SIZE, maximum))
+    return BatchSizer(
+        initial=initial, maximum=maximum, max_packet=_max_packet(connection),
+        params_per_row=len(_INSERT_FIELDS),
+        max_params=POSTGRES_MAX_PARAMS if connection.vendor == 'postgresql' else None,
+        name=f'Record@{using}',
+    )
+
+
+def _row_values(rec):
+    return [getattr(rec, f.attname) for f in _INSERT_FIELDS]
+
+
+def _bulk_insert(records):
+    # El tamaño del lote ya lo decidió el BatchSizer; bulk_create sólo lo recorta al límite del backend
+    Record.objects.bulk_create(records)
+
+
+def _timed_insert(records, sizer):
+    started = time.perf_counter()
+    _bulk_insert(records)
+    sizer.record(len(records), time.perf_counter() - started)
+
+
+def _finish_sizer(sizer):
+    if sizer.batches:
+        sizer.log_summary()
+        _learned_sizes[DEFAULT_DB_ALIAS] = sizer.size
+
+
+def _commit_chunk(chunk, result, sizer):
+    """Guarda un bloque en su propia transacción; si falla, aísla las filas malas."""
+    records = [rec for rec, _file, _line in chunk]
+    sizer.observe_row(_row_values(records[0]))
+    try:
+        with transaction.atomic():
+            for batch in sizer.split(records):
+                _timed_insert(batch, sizer)
+        result.created += len(records)
+        return
+    except DatabaseError:
+        pass
+    for rec, file, line in chunk:
+        try:
+            with transaction.atomic():
+                _bulk_insert([rec])
+            result.created += 1
+        except DatabaseError as e:
+            result.failed.append({'file': file, 'line': line, 'error': str(e)})
+
+
+def _finish(carga, result, estado):
+    metrics.ROWS_INSERTED.inc(result.created, qna_ini=carga.qna_ini)
+    metrics.ROWS_FAILED.inc(len(result.failed), qna_ini=carga.qna_ini)
+    metrics.INSERT_SECONDS.observe(time.perf_counter() - result.started, qna_ini=carga.qna_ini)
+    carga.creados = result.created
+    carga.fallidos = len(result.failed)
+    carga.errores = result.failed[:MAX_STORED_ERRORS]
+    carga.estado = estado
+    carga.terminado_en = timezone.now()
+    carga.save()
+
+
+def _apply_snapshot(first_pk):
+    try:
+        snapshot.apply_since(first_pk)
+    except locks.LockTimeout:
+        # Los registros ya están confirmados; el snapshot se repara con rebuild_snapshot
+        logger.warning('Snapshot sin actualizar desde el id %s: candado ocupado (correr rebuild_snapshot)', first_pk)
+
+
+def _update_snapshot(first_pk):
+    if first_pk is not None:
+        # Fuera de una transacción corre de inmediato; dentro, sólo si se confirma
+        transaction.on_commit(lambda: _apply_snapshot(first_pk))
+
+
+def load_records(items, carga, mode=None, chunk_size=None, on_progress=None) -> LoadResult:
+    """Inserta ``items`` (iterable de ``(Record, archivo, linea)``) y actualiza ``carga``.
+
+    ``items`` se consume en streaming: nunca se materializa la carga completa.
+    ``on_progress(creados)`` se llama tras cada bloque guardado. En modo atómico
+    un error se propaga después de marcar la carga como fallida.
+    """
+    mode = mode or COMMIT_MODE
+    chunk_size = chunk_size or COMMIT_CHUNK_SIZE
+    carga.modo = mode
+    result = LoadResult(carga)
+    first_pk = snapshot.last_pk() if snapshot.ENABLED else None
+
+    if mode == Carga.MODO_ATOMICO:
+        sizer = sizer_for()
+        try:
+            with transaction.atomic():
+                batch = []
+                for rec, _file, _line in items:
+                    carga.filas += 1
+                    if not batch:
+                        sizer.observe_row(_row_values(rec))
+                    batch.append(rec)
+                    if len(batch) >= sizer.size:
+                        _timed_insert(batch, sizer)
+                        result.created += len(batch)
+                        batch = []
+                        if on_progress:
+                            on_progress(result.created)
+                if batch:
+                    _timed_insert(batch, sizer)
+                    result.created += len(batch)
+        except Exception:
+            result.created = 0
+            _finish(carga, result, Carga.FALLIDA)
+            raise
+        finally:
+            _finish_sizer(sizer)
+        carga.bloques_total = carga.bloques_ok = 1
+        _finish(carga, result, Carga.COMPLETA)
+        _update_snapshot(first_pk)
+        return result
+
+    # Un lote nunca es mayor que el bloque de la transacción
+    sizer = sizer_for(maximum=chunk_size)
+    try:
+        chunk = []
+        for item in items:
+            carga.filas += 1
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                failed = len(result.failed)
+                _commit_chunk(chunk, result, sizer)
+                chunk = []
+                _chunk_done(carga, result, on_progress, ok=len(result.failed) == failed)
+        if chunk:
+            failed = len(result.failed)
+            _commit_chunk(chunk, result, sizer)
+            _chunk_done(carga, result, on_progress, ok=len(result.failed) == failed)
+    except Exception:
+        _finish(carga, result, Carga.FALLIDA)
+        _update_snapshot(first_pk)  # los bloques ya confirmados se quedan
+        raise
+    finally:
+        _finish_sizer(sizer)
+    _finish(carga, result, Carga.INCOMPLETA if result.failed else Carga.COMPLETA)
+    _update_snapshot(first_pk)
+    return result
+
+
+def _chunk_done(carga, result, on_progress, ok):
+    # Un bloque con filas fallidas se guardó sólo en parte: no cuenta como ok
+    carga.bloques_total += 1
+    carga.bloques_ok += int(ok)
+    carga.creados = result.created
+    carga.fallidos = len(result.failed)
+    carga.save(update_fields=['filas', 'bloques_total', 'bloques_ok', 'creados', 'fallidos'])
+    if on_progress:
+        on_progress(result.created)
@@ -0,0 +1,130 @@
+"""Candado por quincena/lote compartido entre nodos (bloqueos consultivos de la BD).
+
+Revisar "¿ya hay registros de este lote?" y luego insertar no basta con varios
+servidores: dos nodos pueden pasar la revisión a la vez y cargar el mismo lote.
+Preview, confirmación/carga directa, reversión e ``ingest_dir`` toman antes
+``load_lock(qna_ini, lote)`` y repiten la revisión ya con el candado tomado.
+
+- MySQL: ``GET_LOCK(nombre, timeout)`` / ``RELEASE_LOCK(nombre)``.
+- Postgres: ``pg_try_advisory_lock(llave)`` cada ``POLL_SECONDS`` hasta el
+  timeout / ``pg_advisory_unlock(llave)``; la llave es un hash de 64 bits del nombre.
+- Otros backends (SQLite en desarrollo y pruebas): candado del proceso. SQLite no
+  se usa con varios nodos, así que no hay nada más que coordinar.
+
+Los candados son de sesión (no de transacción): se toman fuera de
+``transaction.atomic`` y se liberan después del commit, así quien espera ve los
+registros ya confirmados. Son reentrantes en el mismo hilo/conexión. La espera se
+mide en ``fovisste_lock_wait_seconds`` y los timeouts en ``fovisste_lock_timeouts_total``.
+
+``snapshot_lock()`` es un candado único (no por lote) que serializa a quienes
+escriben ``RecordSnapshot`` (``fovisste.snapshot``): cargas de lotes distintos que
+comparten RFC sí corren a la vez.
+"""
+import hashlib
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+LOCK_TIMEOUT = getattr(settings, 'FOVISSTE_LOAD_LOCK_TIMEOUT', 10)
+POLL_SECONDS = 0.1
+
+OP_PREVIEW = 'preview'
+OP_CARGA = 'carga'
+OP_REVERSION = 'reversion'
+OP_INGEST = 'ingest'
+OP_SNAPSHOT = 'snapshot'
+
+SNAPSHOT_LOCK_NAME = 'fovisste:snapshot'
+
+_local_locks = {}
+_local_guard = threading.Lock()
+
+
+class LockTimeout(Exception):
+    def __init__(self, qna_ini=None, lote_anterior=None, message=None):
+        self.qna_ini = qna_ini
+        self.lote_anterior = lote_anterior
+        super().__init__(message or (
+            f'El lote {lote_anterior} de la quincena {qna_ini} se está cargando o revirtiendo en otro proceso. '
+            'Intenta de nuevo en unos minutos.'
+        ))
+
+
+def lock_name(qna_ini, lote_anterior) -> str:
+    return f'fovisste:carga:{qna_ini}:{lote_anterior}'  # GET_LOCK admite hasta 64 caracteres
+
+
+def lock_key(name) -> int:
+    """Llave bigint (con signo) para los bloqueos consultivos de Postgres."""
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+def _local_lock(name):
+    with _local_guard:
+        return _local_locks.setdefault(name, threading.RLock())
+
+
+def acquire(connection, name, timeout) -> bool:
+    if connection.vendor == 'mysql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT GET_LOCK(%s, %s)', [name, math.ceil(timeout)])
+            return cursor.fetchone()[0] == 1
+    if connection.vendor == 'postgresql':
+        deadline = time.monotonic() + timeout
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute('SELECT pg_try_advisory_lock(%s)', [lock_key(name)])
+                if cursor.fetchone()[0]:
+                    return True
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(POLL_SECONDS)
+    return _local_lock(name).acquire(timeout=timeout) if timeout > 0 else _local_lock(name).acquire(blocking=False)
+
+
+def release(connection, name):
+    if connection.vendor == 'mysql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT RELEASE_LOCK(%s)', [name])
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [lock_key(name)])
+    else:
+        _local_lock(name).release()
+
+
+@contextmanager
+def _held(name, operacion, timeout, using, error):
+    timeout = LOCK_TIMEOUT if timeout is None else timeout
+    connection = connections[using]
+    started = time.perf_counter()
+    acquired = acquire(connection, name, timeout)
+    metrics.LOCK_WAIT_SECONDS.observe(time.perf_counter() - started, operacion=operacion)
+    if not acquired:
+        metrics.LOCK_TIMEOUTS.inc(operacion=operacion)
+        raise error()
+    try:
+        yield
+    finally:
+        release(connection, name)
+
+
+def load_lock(qna_ini, lote_anterior, operacion='', timeout=None, using='default'):
+    """Toma el candado de ``qna_ini``/``lote_anterior`` o lanza ``LockTimeout``.
+
+    ``timeout`` en segundos (0 = no esperar); por omisión ``FOVISSTE_LOAD_LOCK_TIMEOUT``.
+    """
+    return _held(lock_name(qna_ini, lote_anterior), operacion, timeout, using,
+                 lambda: LockTimeout(qna_ini, lote_anterior))
+
+
+def snapshot_lock(timeout=None, using='default'):
+    """Candado único de escritura de ``RecordSnapshot``; lanza ``LockTimeout`` si no se obtiene."""
+    return _held(SNAPSHOT_LOCK_NAME, OP_SNAPSHOT, timeout, using,
+                 lambda: LockTimeout(message='El estado actual por RFC se está actualizando en otro proceso.'))
@@ -0,0 +1,92 @@
+"""Mide el costo de conexión por petición: conexión nueva vs. la configuración actual.
+
+Ejemplo::
+
+    python manage.py bench_connections --requests 500
+
+Simula ``--requests`` peticiones sobre el alias ``--database`` con el mismo ciclo
+que Django aplica a cada petición (revisar conexiones al inicio, una consulta
+corta y revisar al final) en dos modos, cada uno con su propia conexión:
+
+- ``por_peticion``: ``CONN_MAX_AGE=0`` y sin pool (lo que había antes);
+- ``configurada``: ``CONN_MAX_AGE`` / ``CONN_HEALTH_CHECKS`` / pool de settings.
+
+Imprime conexiones abiertas, milisegundos por petición (p50 y promedio) y el
+ahorro de la configuración actual.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from fovisste.management.commands.loadtest import percentile
+
+MODE_DIRECT = 'por_peticion'
+MODE_CONFIGURED = 'configurada'
+
+
+def _wrapper(alias, mode):
+    base = connections[alias]
+    settings_dict = {**base.settings_dict, 'OPTIONS': dict(base.settings_dict.get('OPTIONS', {}))}
+    if mode == MODE_DIRECT:
+        settings_dict['CONN_MAX_AGE'] = 0
+        settings_dict['CONN_HEALTH_CHECKS'] = False
+        settings_dict['OPTIONS'].pop('pool', None)
+    return type(base)(settings_dict, alias=f'bench_{mode}')
+
+
+def run_mode(alias, mode, requests, query='SELECT 1'):
+    """Ejecuta ``requests`` peticiones simuladas; devuelve ``(conexiones, segundos_por_peticion)``."""
+    conn = _wrapper(alias, mode)
+    opened = []
+
+    def count(sender, connection, **kwargs):
+        if connection is conn:
+            opened.append(1)
+    connection_created.connect(count)
+    timings = []
+    try:
+        for _ in range(requests):
+            started = time.perf_counter()
+            conn.close_if_unusable_or_obsolete()  # request_started
+            with conn.cursor() as cursor:
+                cursor.execute(query)
+                cursor.fetchone()
+            conn.close_if_unusable_or_obsolete()  # request_finished
+            timings.append(time.perf_counter() - started)
+    finally:
+        connection_created.disconnect(count)
+        conn.close()
+        if hasattr(conn, 'close_pool'):
+            conn.close_pool()
+    return len(opened), timings
+
+
+class Command(BaseCommand):
+    help = 'Compara el costo por petición con conexión nueva vs. conexiones persistentes/pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Peticiones simuladas por modo (default: 200)')
+        parser.add_argument('--database', default='default', help='Alias de BD (default: default)')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        requests = max(1, options['requests'])
+        settings_dict = connections[alias].settings_dict
+        self.stdout.write(
+            f"{alias} ({settings_dict['ENGINE'].rsplit('.', 1)[-1]}): CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']} "
+            f"CONN_HEALTH_CHECKS={settings_dict['CONN_HEALTH_CHECKS']} "
+            f"pool={'sí' if settings_dict.get('OPTIONS', {}).get('pool') else 'no'}"
+        )
+        results = {}
+        for mode in (MODE_DIRECT, MODE_CONFIGURED):
+            opened, timings = run_mode(alias, mode, requests)
+            mean = sum(timings) / len(timings)
+            results[mode] = mean
+            self.stdout.write(
+                f'{mode:13} {requests} peticiones, {opened} conexiones abiertas, '
+                f'p50 {percentile(sorted(timings), 50) * 1000:.3f} ms, promedio {mean * 1000:.3f} ms'
+            )
+        saved = results[MODE_DIRECT] - results[MODE_CONFIGURED]
+        self.stdout.write(self.style.SUCCESS(f'Ahorro por petición: {saved * 1000:.3f} ms'))
@@ -0,0 +1,252 @@
+"""Carga masiva de un directorio de archivos de lote hacia ``Record``.
+
+Ejemplos::
+
+    python manage.py ingest_dir /datos/lotes --qna-ini 202510 --user admin
+    python manage.py ingest_dir /datos/entrada --watch --interval 60
+
+Cada archivo se parsea en un pool de procesos y se inserta con ``bulk_create``
+dentro de una transacción junto con su ``IngestCheckpoint``; si la corrida se
+interrumpe, al reanudar se omiten los archivos ya cargados.
+
+La quincena (``qna_ini``) y el lote se toman de ``--qna-ini`` / ``--lote`` o, si
+no se indican, del nombre del archivo: el primer grupo de 6 dígitos es la
+quincena y el primer grupo de 4 dígitos el lote (p. ej. ``202510_0001.txt``).
+
+Si un archivo falla al insertarse, su transacción se revierte, queda con
+checkpoint en error y la corrida (o ``--watch``) sigue con los demás.
+"""
+import logging
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from fovisste import columnar, dbpool, locks, metrics
+from fovisste.loading import load_records, record_from_data
+from fovisste.models import Carga, IngestCheckpoint, Record
+from fovisste.parsing import DEFAULT_ENCODINGS, ENGINE_NUMPY, ENGINE_PYTHON, ENGINES, FIELD_NAMES, parse_file
+from fovisste.views import add_activity
+
+QNA_RE = re.compile(r'(?<!\d)(\d{6})(?!\d)')
+LOTE_RE = re.compile(r'(?<!\d)(\d{4})(?!\d)')
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Carga todos los archivos de lote de un directorio en Record, con checkpoints por archivo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directorio', help='Directorio con archivos de lote')
+        parser.add_argument('--pattern', default='*.txt', help='Patrón de archivos (default: *.txt)')
+        parser.add_argument('--qna-ini', help='Quincena proceso (AAAAMM) para todos los archivos')
+        parser.add_argument('--lote', help='Lote (4 dígitos) para todos los archivos')
+        parser.add_argument('--user', help='Usuario registrado como responsable de la carga')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Procesos para parsear en paralelo (default: núm. de CPUs; 1 = sin pool)')
+        parser.add_argument('--watch', action='store_true', help='Seguir revisando el directorio por archivos nuevos')
+        parser.add_argument('--interval', type=float, default=30.0, help='Segundos entre revisiones en modo --watch')
+        parser.add_argument('--settle', type=float, default=5.0,
+                            help='Ignorar archivos modificados hace menos de N segundos (aún se están copiando)')
+        parser.add_argument('--retry-errors', action='store_true', help='Reintentar archivos con checkpoint en error')
+        parser.add_argument('--engine', choices=ENGINES, default=getattr(settings, 'FOVISSTE_PARSE_ENGINE', ENGINE_PYTHON),
+                            help='Motor de parseo: python (por línea) o numpy (columnar)')
+
+    def handle(self, *args, **options):
+        directory = Path(options['directorio']).resolve()
+        if not directory.is_dir():
+            raise CommandError(f'No existe el directorio {directory}')
+        if options['qna_ini'] and not re.fullmatch(r'\d{6}', options['qna_ini']):
+            raise CommandError('--qna-ini debe tener 6 dígitos (AAAAMM).')
+        if options['lote'] and not re.fullmatch(r'\d{4}', options['lote']):
+            raise CommandError('--lote debe tener 4 dígitos.')
+        self.user = None
+        if options['user']:
+            try:
+                self.user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'No existe el usuario {options["user"]}')
+        if options['engine'] == ENGINE_NUMPY and not columnar.AVAILABLE:
+            self.stderr.write('NumPy no está instalado; se usa el motor de parseo por línea.')
+            options['engine'] = ENGINE_PYTHON
+        self.options = options
+
+        while True:
+            loaded = self.run_once(directory)
+            if not options['watch']:
+                break
+            if loaded:
+                self.stdout.write(f'{loaded} archivo(s) cargados; esperando nuevos archivos...')
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                self.stdout.write('Detenido.')
+                break
+
+    def pending_files(self, directory):
+        """Archivos que aún no tienen checkpoint exitoso para su versión actual."""
+        done = {
+            c.ruta: c for c in IngestCheckpoint.objects.filter(ruta__startswith=str(directory))
+        }
+        now = time.time()
+        pending = []
+        for path in sorted(directory.glob(self.options['pattern'])):
+            if not path.is_file():
+                continue
+            stat = path.stat()
+            if now - stat.st_mtime < self.options['settle']:
+                continue
+            checkpoint = done.get(str(path))
+            if checkpoint is not None:
+                if checkpoint.estado == IngestCheckpoint.ESTADO_OK:
+                    if (checkpoint.tamano, checkpoint.modificado_ns) != (stat.st_size, stat.st_mtime_ns):
+                        self.stderr.write(f'{path.name}: cambió después de cargarse; se omite (borra su checkpoint para recargar).')
+                    continue
+                if not self.options['retry_errors'] and checkpoint.modificado_ns == stat.st_mtime_ns:
+                    continue
+            pending.append((path, stat))
+        return pending
+
+    def target_for(self, path):
+        qna_ini = self.options['qna_ini']
+        lote = self.options['lote']
+        stem = path.stem
+        if not qna_ini:
+            match = QNA_RE.search(stem)
+            qna_ini = match.group(1) if match else None
+        if not lote:
+            match = LOTE_RE.search(stem.replace(qna_ini or '', ' ', 1))
+            lote = match.group(1) if match else None
+        return qna_ini, lote
+
+    def run_once(self, directory):
+        dbpool.recycle_connections()  # con --watch la conexión pudo vencer durante la espera
+        pending = self.pending_files(directory)
+        if not pending:
+            return 0
+        self.stdout.write(f'{len(pending)} archivo(s) por cargar en {directory}')
+        loaded = 0
+        for path, stat, result, error in self.parse_all(pending):
+            if error is not None:
+                self.save_checkpoint(path, stat, None, None, IngestCheckpoint.ESTADO_ERROR, mensaje=str(error))
+                self.stderr.write(f'{path.name}: error al parsear: {error}')
+                continue
+            rows, errors = result
+            dbpool.recycle_connections()
+            if self.load_file(path, stat, rows, errors):
+                loaded += 1
+        return loaded
+
+    def parse_all(self, pending):
+        """Itera ``(path, stat, (filas, errores), error)`` conforme terminan de parsearse."""
+        workers = self.options['workers']
+        engine = self.options['engine']
+        if workers <= 1:
+            # Sin pool: útil para depurar o en equipos con un solo núcleo
+            for path, stat in pending:
+                try:
+                    yield path, stat, parse_file(str(path), DEFAULT_ENCODINGS, engine), None
+                except Exception as e:
+                    yield path, stat, None, e
+            return
+        # Las conexiones abiertas no deben heredarse a los procesos hijos
+        connections.close_all()
+        queue = iter(pending)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # A lo más ``workers`` archivos en vuelo: el resultado de cada uno son todas sus
+            # filas y la carga (un archivo a la vez) es más lenta que el parseo, así que
+            # enviarlos todos de golpe acumularía resultados sin límite en este proceso
+            futures = {}
+
+            def submit_next():
+                item = next(queue, None)
+                if item is not None:
+                    futures[pool.submit(parse_file, str(item[0]), DEFAULT_ENCODINGS, engine)] = item
+            for _ in range(workers):
+                submit_next()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, stat = futures.pop(future)
+                    submit_next()
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        yield path, stat, None, e
+                    else:
+                        yield path, stat, result, None
+
+    def load_file(self, path, stat, rows, errors):
+        qna_ini, lote = self.target_for(path)
+        if not (qna_ini and lote):
+            self.save_checkpoint(path, stat, qna_ini, lote, IngestCheckpoint.ESTADO_ERROR,
+                                 mensaje='No se pudo determinar quincena/lote (usa --qna-ini/--lote o nómbralo AAAAMM_LOTE)')
+            self.stderr.write(f'{path.name}: sin quincena/lote; se omite.')
+            return False
+        # Con el candado del lote ningún otro nodo (vista o ingest_dir) lo carga a la vez
+        try:
+            with locks.load_lock(qna_ini, lote, locks.OP_INGEST):
+                return self.load_file_locked(path, stat, rows, errors, qna_ini, lote)
+        except locks.LockTimeout as e:
+            # Sin checkpoint: es temporal y el archivo se intenta de nuevo en la siguiente corrida
+            self.stderr.write(f'{path.name}: {e}')
+            return False
+
+    def load_file_locked(self, path, stat, rows, errors, qna_ini, lote):
+        # Misma regla que qnaproceso_view: un lote no se carga dos veces para la misma quincena
+        if Record.objects.filter(lote_anterior=lote, qna_ini=qna_ini).exists():
+            self.save_checkpoint(path, stat, qna_ini, lote, IngestCheckpoint.ESTADO_ERROR,
+                                 mensaje=f'El lote {lote} de la quincena {qna_ini} ya tiene registros cargados')
+            self.stderr.write(f'{path.name}: el lote {lote}/{qna_ini} ya tiene registros; se omite.')
+            return False
+
+        started = time.monotonic()
+        items = (
+            (record_from_data(dict(zip(FIELD_NAMES, row)), self.user, qna_ini, lote), str(path), None)
+            for row in rows
+        )
+        try:
+            with transaction.atomic():
+                # Registros y checkpoint en la misma transacción: o quedan ambos o ninguno
+                carga = Carga.objects.create(responsable=self.user, qna_ini=qna_ini, lote_anterior=lote, archivo=path.name[:255])
+                load_records(items, carga, Carga.MODO_ATOMICO)
+                self.save_checkpoint(path, stat, qna_ini, lote, IngestCheckpoint.ESTADO_OK,
+                                     registros=len(rows), errores=len(errors))
+        except Exception as e:
+            # La transacción ya se revirtió: el checkpoint de error se guarda fuera de ella
+            logger.exception('ingest_dir: falló la carga de %s', path)
+            self.save_checkpoint(path, stat, qna_ini, lote, IngestCheckpoint.ESTADO_ERROR,
+                                 errores=len(errors), mensaje=f'Error al insertar registros: {e}')
+            self.stderr.write(f'{path.name}: error al insertar registros: {e}')
+            return False
+        add_activity(self.user, 'carga', f'{path.name}: creados {len(rows)} registros (ingest_dir)')
+        metrics.LINES_PARSED.inc(len(rows) + len(errors), path='ingest')
+        metrics.PARSE_ERRORS.inc(len(errors), path='ingest')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{path.name}: {len(rows)} registros, {len(errors)} errores, qna {qna_ini} lote {lote} ({elapsed:.1f}s)'
+        ))
+        return True
+
+    def save_checkpoint(self, path, stat, qna_ini, lote, estado, registros=0, errores=0, mensaje=''):
+        IngestCheckpoint.objects.update_or_create(
+            ruta_hash=IngestCheckpoint.hash_ruta(str(path)),
+            defaults={
+                'ruta': str(path),
+                'tamano': stat.st_size,
+                'modificado_ns': stat.st_mtime_ns,
+                'qna_ini': qna_ini or '',
+                'lote_anterior': lote or '',
+                'estado': estado,
+                'registros': registros,
+                'errores': errores,
+                'mensaje': mensaje[:255],
+            },
+        )
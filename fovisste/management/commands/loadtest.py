@@ -0,0 +1,270 @@
+"""Prueba de carga con usuarios concurrentes contra un servidor local.
+
+Ejemplo (con la BD sembrada por ``seed_loadtest`` y ``runserver``/gunicorn/uvicorn arriba)::
+
+    python manage.py seed_loadtest --users 20 --records 200000
+    python manage.py loadtest --url http://127.0.0.1:8000 --stages 1,5,10,20 --stage-seconds 60
+
+Cada usuario virtual inicia sesión y repite sesiones realistas:
+
+- capturista (``--uploader-ratio``): qnaproceso -> preview de un archivo de
+  ``--preview-lines`` líneas -> confirmación;
+- consulta: búsquedas en consulta por prefijo de RFC -> resultados.
+
+La concurrencia sube por etapas; al final de cada etapa se imprimen, por endpoint,
+peticiones, errores, tasa de error, peticiones por segundo y latencias p50/p90/p95/p99/max.
+Sólo usa la biblioteca estándar (urllib) para no agregar dependencias.
+"""
+import itertools
+import json
+import random
+import string
+import threading
+import time
+import uuid
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fovisste.management.commands.seed_loadtest import LOADTEST_QNA_PREFIX
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Stats:
+    """Latencias y errores por endpoint, compartidos entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        result = {}
+        with self._lock:
+            for endpoint, values in sorted(self.latencies.items()):
+                values = sorted(values)
+                errors = self.errors.get(endpoint, 0)
+                row = {
+                    'requests': len(values),
+                    'errors': errors,
+                    'error_rate': errors / len(values),
+                    'rps': len(values) / elapsed if elapsed > 0 else 0.0,
+                    'max_ms': values[-1] * 1000,
+                }
+                for pct in PERCENTILES:
+                    row[f'p{pct}_ms'] = percentile(values, pct) * 1000
+                result[endpoint] = row
+        return result
+
+
+class Session:
+    """Cliente HTTP con cookies (sesión de Django + csrftoken)."""
+
+    def __init__(self, base_url, stats, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+
+    def csrf_token(self) -> str:
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, endpoint, path, data=None, body=None, content_type=None, headers=None):
+        """Devuelve ``(status, cuerpo)``; cualquier status >= 400 o error de red cuenta como error."""
+        headers = dict(headers or {})
+        if data is not None:
+            body = urlencode(data, doseq=True).encode()
+            content_type = 'application/x-www-form-urlencoded'
+        if body is not None:
+            headers['X-CSRFToken'] = self.csrf_token()
+            headers['Referer'] = self.base_url + path
+            headers['Content-Type'] = content_type
+        req = Request(self.base_url + path, data=body, headers=headers, method='POST' if body is not None else 'GET')
+        start = time.perf_counter()
+        status, content = 0, b''
+        try:
+            with self.opener.open(req, timeout=self.timeout) as resp:
+                status, content = resp.status, resp.read()
+        except HTTPError as e:
+            status, content = e.code, e.read()
+        except (URLError, OSError):
+            status = 0
+        ok = 200 <= status < 400
+        self.stats.record(endpoint, time.perf_counter() - start, ok)
+        return status, content
+
+    def post_file(self, endpoint, path, field, filename, content, extra=None):
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in (extra or {}).items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: text/plain\r\n\r\n'.encode() + content + b'\r\n'
+        )
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return self.request(endpoint, path, body=b''.join(parts), content_type=f'multipart/form-data; boundary={boundary}')
+
+    def login(self, username, password) -> bool:
+        self.request('login_form', '/login/')
+        status, content = self.request('login', '/login/', data={'username': username, 'password': password})
+        # Un login fallido vuelve a mostrar el formulario con status 200; basta revisar la cookie de sesión
+        return any(cookie.name == 'sessionid' for cookie in self.cookies)
+
+
+def make_line(rng, n):
+    rfc = ''.join(rng.choice(string.ascii_uppercase) for _ in range(4)) + f'{rng.randint(50, 99)}0101{n % 1000:03d}'
+    return (
+        f"{rfc[:13].ljust(13)}{f'EMPLEADO CARGA {n}'[:30].ljust(30)}{''.ljust(37)}{rng.choice('ABM')}"
+        f"{rng.randint(0, 99_999_999):08d}{rng.randint(1, 99):02d}1202510{rng.randint(0, 99):02d}"
+    ).ljust(157)
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, command, username, stats, stop_event, rng):
+        super().__init__(daemon=True)
+        self.command = command
+        self.username = username
+        self.stats = stats
+        self.stop_event = stop_event
+        self.rng = rng
+        self.options = command.options
+
+    def run(self):
+        session = Session(self.options['url'], self.stats, self.options['timeout'])
+        if not session.login(self.username, self.options['password']):
+            self.command.login_failures += 1
+            return
+        while not self.stop_event.is_set():
+            if self.rng.random() < self.options['uploader_ratio']:
+                self.upload_session(session)
+            else:
+                self.search_session(session)
+            self.stop_event.wait(self.rng.uniform(0, self.options['think']))
+
+    def upload_session(self, session):
+        lote = f'{next(self.command.lotes) % 10000:04d}'
+        status, _ = session.request('qnaproceso', '/foviste/qnaproceso/',
+                                    data={'qna_proceso': self.options['qna_ini'], 'lote': lote})
+        if status != 200:
+            return
+        lines = [make_line(self.rng, n) for n in range(self.options['preview_lines'])]
+        status, content = session.post_file(
+            'preview', '/api/preview/', 'files', f'{self.options["qna_ini"]}_{lote}.txt',
+            '\r\n'.join(lines).encode('latin-1'),
+        )
+        if status != 200 or self.stop_event.is_set():
+            return
+        session.request('confirm', '/api/upload/', data={'confirm': '1'})
+
+    def search_session(self, session):
+        for _ in range(self.rng.randint(1, 3)):
+            prefix = ''.join(self.rng.choice(string.ascii_uppercase) for _ in range(2))
+            session.request('consulta', '/foviste/consulta/?' + urlencode({'q': prefix}))
+        session.request('resultados', '/foviste/resultados/')
+
+
+class Command(BaseCommand):
+    help = 'Prueba de carga con usuarios concurrentes (capturistas y consultas) contra un servidor local.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='URL base del servidor')
+        parser.add_argument('--stages', default='1,5,10', help='Usuarios concurrentes por etapa (default: 1,5,10)')
+        parser.add_argument('--stage-seconds', type=float, default=30.0, help='Duración de cada etapa')
+        parser.add_argument('--users', type=int, default=10,
+                            help='Usuarios sembrados disponibles (seed_loadtest --users); al menos la etapa mayor')
+        parser.add_argument('--username-prefix', default='loadtest')
+        parser.add_argument('--password', default='loadtest-pass')
+        parser.add_argument('--uploader-ratio', type=float, default=0.2, help='Fracción de sesiones que cargan archivos')
+        parser.add_argument('--preview-lines', type=int, default=500, help='Líneas por archivo de preview')
+        parser.add_argument('--qna-ini', default=f'{LOADTEST_QNA_PREFIX}101', help='Quincena de las cargas de prueba')
+        parser.add_argument('--think', type=float, default=1.0, help='Pausa máxima (s) entre sesiones de un usuario')
+        parser.add_argument('--timeout', type=float, default=120.0, help='Timeout por petición (s)')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--json', dest='json_path', help='Guardar los resultados por etapa en este archivo')
+
+    def handle(self, *args, **options):
+        try:
+            stages = [int(s) for s in options['stages'].split(',') if s.strip()]
+        except ValueError:
+            raise CommandError('--stages debe ser una lista de enteros, p. ej. 1,5,10')
+        if not stages or min(stages) < 1:
+            raise CommandError('--stages debe tener al menos una etapa con 1 o más usuarios.')
+        if max(stages) > options['users']:
+            # Dos hilos con el mismo usuario compartirían turnos y preview: la carga no sería realista
+            raise CommandError(f'--users ({options["users"]}) debe ser al menos la etapa mayor ({max(stages)}); '
+                               f'siembra más con seed_loadtest --users {max(stages)}.')
+        if not options['qna_ini'].startswith(LOADTEST_QNA_PREFIX):
+            raise CommandError(f'--qna-ini debe empezar con {LOADTEST_QNA_PREFIX} (quincenas de prueba).')
+        self.options = options
+        rng = random.Random(options['seed'])
+        self.lotes = itertools.count(rng.randint(0, 9999))
+        self.login_failures = 0
+        usernames = [f"{options['username_prefix']}{n:02d}" for n in range(1, options['users'] + 1)]
+
+        results = []
+        for concurrency in stages:
+            self.stdout.write(f'Etapa: {concurrency} usuarios durante {options["stage_seconds"]:.0f}s...')
+            stats = Stats()
+            stop = threading.Event()
+            threads = [
+                VirtualUser(self, usernames[i], stats, stop, random.Random(rng.random()))
+                for i in range(concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            time.sleep(options['stage_seconds'])
+            stop.set()
+            for thread in threads:
+                thread.join(options['timeout'])
+            stats.stop()
+            summary = stats.summary()
+            results.append({'concurrency': concurrency, 'endpoints': summary})
+            self.print_stage(concurrency, summary)
+
+        if self.login_failures:
+            self.stderr.write(f'{self.login_failures} usuarios no pudieron iniciar sesión (¿se corrió seed_loadtest?).')
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f'Resultados guardados en {options["json_path"]}')
+
+    def print_stage(self, concurrency, summary):
+        header = f"{'endpoint':<12} {'req':>6} {'err':>5} {'err%':>6} {'rps':>7}" + ''.join(
+            f" {f'p{p}':>8}" for p in PERCENTILES) + f" {'max':>8}"
+        self.stdout.write(f'-- {concurrency} usuarios (latencias en ms) --')
+        self.stdout.write(header)
+        for endpoint, row in summary.items():
+            self.stdout.write(
+                f"{endpoint:<12} {row['requests']:>6} {row['errors']:>5} {row['error_rate'] * 100:>5.1f}% {row['rps']:>7.2f}"
+                + ''.join(f" {row[f'p{p}_ms']:>8.1f}" for p in PERCENTILES)
+                + f" {row['max_ms']:>8.1f}"
+            )
@@ -0,0 +1,38 @@
+"""Reconstruye ``RecordSnapshot`` (estado actual por RFC) desde ``Record`` (ver ``fovisste.snapshot``).
+
+Ejemplos::
+
+    python manage.py rebuild_snapshot
+    python manage.py rebuild_snapshot --chunk-size 5000
+
+La migración ya lo llena; correrlo si el snapshot quedó desfasado
+(``FOVISSTE_SNAPSHOT`` desactivado un tiempo, candado ocupado al terminar una
+carga). No vacía la tabla: consulta sigue respondiendo mientras corre.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fovisste import snapshot
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla de estado actual por RFC (RecordSnapshot) desde el historial de Record.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=snapshot.CHUNK_SIZE,
+                            help=f'Filas leídas y RFC escritos por bloque (default: {snapshot.CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size debe ser mayor que 0.')
+        started = time.perf_counter()
+
+        def on_chunk(written):
+            self.stdout.write(f'  {written} RFC escritos')
+
+        result = snapshot.rebuild(chunk_size=options['chunk_size'], on_chunk=on_chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot reconstruido: {result['rfcs']} RFC, {result['removed']} eliminados "
+            f"({time.perf_counter() - started:.1f}s)"
+        ))
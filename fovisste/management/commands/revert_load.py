@@ -0,0 +1,78 @@
+"""Revierte una carga borrando sus registros por bloques de id (ver ``fovisste.revert``).
+
+Ejemplos::
+
+    python manage.py revert_load --qna-ini 202510 --lote 0001 --dry-run
+    python manage.py revert_load --qna-ini 202510 --lote 0001 --user admin --chunk-size 2000 --pause 0.5
+
+Cada bloque se borra en su propia transacción corta; si se interrumpe, volver a
+correr el comando termina de borrar lo que falta.
+"""
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from fovisste.models import Carga
+from fovisste.revert import REVERT_CHUNK_SIZE, REVERT_PAUSE, RevertError, records_for, revert_load
+
+
+class Command(BaseCommand):
+    help = 'Borra los registros de una carga (quincena + lote) en bloques pequeños, con pausas entre bloques.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--qna-ini', help='Quincena proceso (AAAAMM) de la carga')
+        parser.add_argument('--lote', help='Lote (4 dígitos) de la carga')
+        parser.add_argument('--carga', type=int, help='Id de la Carga (en lugar de --qna-ini/--lote)')
+        parser.add_argument('--user', help='Usuario registrado como responsable de la reversión')
+        parser.add_argument('--chunk-size', type=int, default=REVERT_CHUNK_SIZE,
+                            help=f'Registros borrados por transacción (default: {REVERT_CHUNK_SIZE})')
+        parser.add_argument('--pause', type=float, default=REVERT_PAUSE,
+                            help=f'Segundos de pausa entre bloques (default: {REVERT_PAUSE})')
+        parser.add_argument('--dry-run', action='store_true', help='Sólo contar los registros que se borrarían')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='No pedir confirmación')
+
+    def handle(self, *args, **options):
+        qna_ini, lote = options['qna_ini'], options['lote']
+        if options['carga']:
+            try:
+                carga = Carga.objects.get(pk=options['carga'])
+            except Carga.DoesNotExist:
+                raise CommandError(f'No existe la carga {options["carga"]}')
+            qna_ini, lote = carga.qna_ini, carga.lote_anterior
+        if not (qna_ini and re.fullmatch(r'\d{6}', qna_ini)):
+            raise CommandError('Indica --qna-ini (AAAAMM) y --lote, o --carga.')
+        if not lote:
+            raise CommandError('Indica --lote.')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size debe ser mayor que 0.')
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'No existe el usuario {options["user"]}')
+
+        total = records_for(qna_ini, lote).count()
+        self.stdout.write(f'{total} registros en el lote {lote} de la quincena {qna_ini}.')
+        if options['dry_run']:
+            return
+        if total and options['interactive']:
+            answer = input('Escribe "si" para borrarlos: ')
+            if answer.strip().lower() not in ('si', 'sí'):
+                raise CommandError('Reversión cancelada.')
+
+        def on_chunk(deleted):
+            self.stdout.write(f'  {deleted}/{total} borrados')
+
+        try:
+            result = revert_load(qna_ini, lote, user=user, chunk_size=options['chunk_size'],
+                                 pause=options['pause'], on_chunk=on_chunk)
+        except RevertError as e:
+            raise CommandError(str(e))
+        data = result.as_dict()
+        self.stdout.write(self.style.SUCCESS(
+            f"Lote {lote} de {qna_ini} revertido: {data['deleted']} registros en {data['chunks']} bloques, "
+            f"{data['cargas']} carga(s) marcadas ({data['seconds']:.1f}s)"
+        ))
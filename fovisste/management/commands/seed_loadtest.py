@@ -0,0 +1,86 @@
+"""Prepara una BD local para ``loadtest``: usuarios de prueba y registros de relleno.
+
+Ejemplo::
+
+    python manage.py seed_loadtest --users 20 --records 200000 --qnas 209001,209002
+
+Los usuarios ``<prefijo>NN`` quedan en el grupo uploader (ver y agregar Record).
+Los registros se crean en quincenas ficticias (2090xx por omisión) para no
+mezclarse con datos reales; ``--purge`` las borra antes de volver a sembrar.
+El snapshot de consulta (``fovisste.snapshot``) se actualiza después de borrar y
+de sembrar, como en una carga o reversión real.
+"""
+import random
+import string
+
+from django.contrib.auth.models import Group, Permission, User
+from django.core.management.base import BaseCommand, CommandError
+
+from fovisste import snapshot
+from fovisste.models import Record
+from fovisste.views import UPLOADER_GROUP
+
+BATCH_SIZE = 5000
+LOADTEST_QNA_PREFIX = '209'  # quincenas ficticias que usa loadtest (2090xx-2099xx)
+
+
+def fake_rfc(rng) -> str:
+    letters = ''.join(rng.choice(string.ascii_uppercase) for _ in range(4))
+    return f"{letters}{rng.randint(50, 99):02d}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}{rng.choice(string.ascii_uppercase)}{rng.randint(10, 99)}"
+
+
+class Command(BaseCommand):
+    help = 'Crea usuarios y registros de prueba para el comando loadtest.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Usuarios de prueba a crear (default: 10)')
+        parser.add_argument('--username-prefix', default='loadtest', help='Prefijo de los usuarios (default: loadtest)')
+        parser.add_argument('--password', default='loadtest-pass', help='Contraseña de los usuarios de prueba')
+        parser.add_argument('--records', type=int, default=50_000, help='Registros a sembrar (default: 50000)')
+        parser.add_argument('--qnas', default='209001,209002,209003', help='Quincenas (separadas por coma) de los registros')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla del generador aleatorio')
+        parser.add_argument('--purge', action='store_true', help='Borrar antes los registros de quincenas 209xxx')
+
+    def handle(self, *args, **options):
+        qnas = [q.strip() for q in options['qnas'].split(',') if q.strip()]
+        if not qnas or any(not (len(q) == 6 and q.isdigit() and q.startswith(LOADTEST_QNA_PREFIX)) for q in qnas):
+            raise CommandError(f'--qnas debe listar quincenas AAAAMM que empiecen con {LOADTEST_QNA_PREFIX}.')
+        rng = random.Random(options['seed'])
+
+        if options['purge']:
+            deleted, _ = Record.objects.filter(qna_ini__startswith=LOADTEST_QNA_PREFIX).delete()
+            if snapshot.ENABLED:
+                # Los RFC cuyo estado venía de las quincenas borradas vuelven a su registro anterior (o se borran)
+                snapshot.refresh_matching(qna_ini__startswith=LOADTEST_QNA_PREFIX)
+            self.stdout.write(f'{deleted} registros de prueba borrados.')
+
+        group, _ = Group.objects.get_or_create(name=UPLOADER_GROUP)
+        group.permissions.add(*Permission.objects.filter(
+            content_type__app_label='fovisste', codename__in=['add_record', 'view_record'],
+        ))
+        for n in range(1, options['users'] + 1):
+            username = f"{options['username_prefix']}{n:02d}"
+            user, created = User.objects.get_or_create(username=username)
+            if created:
+                user.set_password(options['password'])
+                user.save()
+            user.groups.add(group)
+        self.stdout.write(f"{options['users']} usuarios {options['username_prefix']}NN listos.")
+
+        since = snapshot.last_pk()
+        batch = []
+        for i in range(options['records']):
+            qna_ini = qnas[i % len(qnas)]
+            batch.append(Record(
+                rfc=fake_rfc(rng), nombre=f'EMPLEADO PRUEBA {i}'[:30], tipo=rng.choice('ABM'),
+                impor=f'{rng.randint(0, 99_999_999):08d}', cpto=f'{rng.randint(1, 99):02d}', lote_actual='1',
+                qna=qna_ini, ptje=f'{rng.randint(0, 99):02d}', lote_anterior=f'{i // 1000 % 10000:04d}', qna_ini=qna_ini,
+            ))
+            if len(batch) >= BATCH_SIZE:
+                Record.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Record.objects.bulk_create(batch)
+        if snapshot.ENABLED:
+            snapshot.apply_since(since)  # consulta lee el snapshot: sin esto no vería los registros sembrados
+        self.stdout.write(self.style.SUCCESS(f"{options['records']} registros sembrados en {', '.join(qnas)}."))
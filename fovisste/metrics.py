@@ -0,0 +1,231 @@
+"""Métricas de ingesta y consulta en formato de texto de Prometheus (``/metrics``).
+
+- ``Counter`` e ``Histogram`` guardan sus valores en el cache de Django con
+  ``incr`` (atómico en Redis/Memcached), así todas las instancias de la aplicación
+  suman sobre los mismos contadores. Con LocMemCache cada proceso tiene los suyos.
+- ``DBGauge`` calcula su valor con una consulta agregada sobre tablas chicas (p. ej.
+  ``Carga``, no ``Record``) y lo guarda en cache ``ttl`` segundos.
+- Las combinaciones de etiquetas de cada métrica se anotan con ``cache.add`` (una
+  llave por combinación y un número de ranura con ``incr``): dos procesos que
+  estrenan etiquetas a la vez no se pisan el índice.
+
+Las sumas de los histogramas se guardan en microsegundos (``incr`` sólo acepta
+enteros). Un error del cache nunca debe tumbar la petición que reporta la métrica.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'fovisste:metrics:'
+GAUGE_TTL = 60
+SUM_SCALE = 1_000_000  # sumas de histogramas en micro-unidades
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+ROWS_BUCKETS = (10, 100, 1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000)
+
+
+def _incr(key, amount) -> int:
+    try:
+        return cache.incr(key, amount)
+    except ValueError:  # la llave aún no existe
+        if cache.add(key, amount, timeout=None):
+            return amount
+        return cache.incr(key, amount)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(pairs) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                logger.exception('No se pudo leer la métrica %s', metric.name)
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, pairs, value in samples:
+                lines.append(f'{name}{_format_labels(pairs)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._known = set()  # series ya anotadas en el índice por este proceso
+        registry.register(self)
+
+    def _values(self, labels) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} espera las etiquetas {self.labelnames}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _key(self, values, suffix='') -> str:
+        return f"{KEY_PREFIX}{self.name}{suffix}:{'|'.join(values)}"
+
+    def _slot_key(self, slot) -> str:
+        return f'{KEY_PREFIX}{self.name}:series:{slot}'
+
+    def _remember(self, values):
+        # Índice de combinaciones de etiquetas, para poder listarlas al hacer scrape. Sólo
+        # operaciones atómicas: quien gana el ``add`` de la combinación le asigna una ranura.
+        if values in self._known:
+            return
+        if cache.add(self._key(values, ':seen'), True, timeout=None):
+            slot = _incr(self._slot_key('n'), 1)
+            cache.set(self._slot_key(slot), list(values), timeout=None)
+        self._known.add(values)
+
+    def series(self):
+        slots = cache.get(self._slot_key('n')) or 0
+        stored = cache.get_many([self._slot_key(slot) for slot in range(1, slots + 1)])
+        return sorted({tuple(v) for v in stored.values()} | self._known)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount <= 0:
+            return
+        try:
+            values = self._values(labels)
+            self._remember(values)
+            _incr(self._key(values), int(amount))
+        except ValueError:
+            raise
+        except Exception:
+            logger.exception('No se pudo actualizar la métrica %s', self.name)
+
+    def samples(self):
+        series = self.series()
+        stored = cache.get_many([self._key(values) for values in series])
+        for values in series:
+            yield self.name, list(zip(self.labelnames, values)), stored.get(self._key(values), 0)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=SECONDS_BUCKETS, registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def _bucket_for(self, value) -> str:
+        for bound in self.buckets:
+            if value <= bound:
+                return str(bound)
+        return '+Inf'
+
+    def observe(self, value, **labels):
+        try:
+            values = self._values(labels)
+            self._remember(values)
+            _incr(self._key(values, f':le={self._bucket_for(value)}'), 1)
+            _incr(self._key(values, ':count'), 1)
+            _incr(self._key(values, ':sum'), int(round(value * SUM_SCALE)))
+        except ValueError:
+            raise
+        except Exception:
+            logger.exception('No se pudo actualizar la métrica %s', self.name)
+
+    def samples(self):
+        bounds = [str(b) for b in self.buckets] + ['+Inf']
+        for values in self.series():
+            keys = [self._key(values, f':le={b}') for b in bounds]
+            keys += [self._key(values, ':count'), self._key(values, ':sum')]
+            stored = cache.get_many(keys)
+            pairs = list(zip(self.labelnames, values))
+            cumulative = 0
+            for bound, key in zip(bounds, keys):
+                cumulative += stored.get(key, 0)
+                yield f'{self.name}_bucket', pairs + [('le', bound)], cumulative
+            yield f'{self.name}_sum', pairs, stored.get(keys[-1], 0) / SUM_SCALE
+            yield f'{self.name}_count', pairs, stored.get(keys[-2], 0)
+
+
+class DBGauge(Metric):
+    """Gauge calculado con una consulta. ``compute()`` devuelve ``[(valores_etiquetas, valor)]``."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, labelnames, compute, ttl=GAUGE_TTL, registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.compute = compute
+        self.ttl = ttl
+
+    def samples(self):
+        key = f'{KEY_PREFIX}{self.name}:gauge'
+        rows = cache.get(key)
+        if rows is None:
+            rows = [(list(values), value) for values, value in self.compute()]
+            cache.set(key, rows, self.ttl)
+        for values, value in rows:
+            yield self.name, list(zip(self.labelnames, values)), value
+
+
+# --- Métricas de la aplicación ---
+
+LINES_PARSED = Counter('fovisste_lines_parsed_total', 'Líneas leídas de archivos de carga', ['path'])
+PARSE_ERRORS = Counter('fovisste_parse_errors_total', 'Líneas rechazadas al parsear', ['path'])
+PARSE_SECONDS = Histogram('fovisste_parse_seconds', 'Duración del parseo de una petición', ['path'])
+UPLOADS = Counter('fovisste_uploads_total', 'Peticiones de preview/confirmación/carga', ['path', 'result'])
+PREVIEW_ROWS = Histogram('fovisste_preview_rows', 'Filas por preview generado', buckets=ROWS_BUCKETS)
+ROWS_INSERTED = Counter('fovisste_rows_inserted_total', 'Filas insertadas en Record', ['qna_ini'])
+ROWS_FAILED = Counter('fovisste_rows_failed_total', 'Filas que no se pudieron insertar', ['qna_ini'])
+ROWS_REVERTED = Counter('fovisste_rows_reverted_total', 'Filas borradas al revertir cargas', ['qna_ini'])
+INSERT_SECONDS = Histogram('fovisste_insert_seconds', 'Duración de la inserción de una carga', ['qna_ini'])
+LOCK_WAIT_SECONDS = Histogram('fovisste_lock_wait_seconds', 'Espera por el candado de quincena/lote', ['operacion'])
+LOCK_TIMEOUTS = Counter('fovisste_lock_timeouts_total', 'Candados de quincena/lote no obtenidos a tiempo', ['operacion'])
+SEARCHES = Counter('fovisste_searches_total', 'Búsquedas en consulta')
+SEARCH_SECONDS = Histogram('fovisste_search_seconds', 'Duración de consulta (búsqueda, conteo y envío de las filas)')
+
+
+def _records_per_qna():
+    # De Carga (una fila por archivo), no un GROUP BY sobre todo Record en cada scrape
+    from .models import Carga
+    rows = (Carga.objects.exclude(estado=Carga.REVERTIDA).values_list('qna_ini')
+            .annotate(n=Sum('creados')).order_by())
+    return [((qna or '',), n or 0) for qna, n in rows]
+
+
+def _cargas_per_estado():
+    from .models import Carga
+    rows = Carga.objects.values_list('estado').annotate(n=Count('pk')).order_by()
+    return [((estado,), n) for estado, n in rows]
+
+
+RECORDS = DBGauge('fovisste_records', 'Registros cargados por quincena (cargas no revertidas)', ['qna_ini'],
+                  _records_per_qna)
+CARGAS = DBGauge('fovisste_cargas', 'Cargas registradas por estado', ['estado'], _cargas_per_estado)
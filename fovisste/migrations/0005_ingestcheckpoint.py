@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fovisste', '0004_alter_record_options_alter_record_fecha_carga_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ruta', models.CharField(max_length=255, unique=True)),
+                ('tamano', models.BigIntegerField(default=0)),
+                ('modificado_ns', models.BigIntegerField(default=0)),
+                ('qna_ini', models.CharField(blank=True, default='', max_length=6)),
+                ('lote_anterior', models.CharField(blank=True, default='', max_length=5)),
+                ('estado', models.CharField(choices=[('ok', 'Cargado'), ('error', 'Error')], max_length=10)),
+                ('registros', models.IntegerField(default=0)),
+                ('errores', models.IntegerField(default=0)),
+                ('mensaje', models.CharField(blank=True, default='', max_length=255)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-actualizado_en'],
+            },
+        ),
+    ]
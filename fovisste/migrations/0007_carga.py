@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fovisste', '0006_chunkedupload'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Carga',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qna_ini', models.CharField(blank=True, default='', max_length=6)),
+                ('lote_anterior', models.CharField(blank=True, default='', max_length=5)),
+                ('archivo', models.CharField(blank=True, default='', max_length=255)),
+                ('modo', models.CharField(choices=[('atomic', 'Una transacción'), ('chunked', 'Por bloques')], default='atomic', max_length=10)),
+                ('estado', models.CharField(choices=[('en_proceso', 'En proceso'), ('completa', 'Completa'), ('incompleta', 'Incompleta'), ('fallida', 'Fallida')], default='en_proceso', max_length=12)),
+                ('filas', models.IntegerField(default=0)),
+                ('creados', models.IntegerField(default=0)),
+                ('fallidos', models.IntegerField(default=0)),
+                ('bloques_total', models.IntegerField(default=0)),
+                ('bloques_ok', models.IntegerField(default=0)),
+                ('errores', models.JSONField(blank=True, default=list)),
+                ('iniciado_en', models.DateTimeField(auto_now_add=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('responsable', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-iniciado_en'],
+            },
+        ),
+    ]
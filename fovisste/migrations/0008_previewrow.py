@@ -0,0 +1,37 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fovisste', '0007_carga'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PreviewRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.IntegerField()),
+                ('archivo', models.CharField(blank=True, default='', max_length=255)),
+                ('linea', models.IntegerField(blank=True, null=True)),
+                ('rfc', models.CharField(blank=True, default='', max_length=13)),
+                ('cpto', models.CharField(blank=True, default='', max_length=2)),
+                ('datos', models.JSONField(default=dict)),
+                ('original', models.JSONField(blank=True, null=True)),
+                ('invalido', models.JSONField(blank=True, default=list)),
+                ('duplicado', models.CharField(blank=True, default='', max_length=10)),
+                ('editado', models.BooleanField(default=False)),
+                ('borrado', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['indice'],
+                'indexes': [models.Index(fields=['user', 'rfc'], name='previewrow_user_rfc')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'indice'), name='previewrow_user_indice')],
+            },
+        ),
+    ]
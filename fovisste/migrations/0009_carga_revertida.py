@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fovisste', '0008_previewrow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carga',
+            name='revertido_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='carga',
+            name='revertidos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='carga',
+            name='estado',
+            field=models.CharField(choices=[('en_proceso', 'En proceso'), ('completa', 'Completa'), ('incompleta', 'Incompleta'), ('fallida', 'Fallida'), ('revertida', 'Revertida')], default='en_proceso', max_length=12),
+        ),
+    ]
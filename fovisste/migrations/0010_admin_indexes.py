@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fovisste', '0009_carga_revertida'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['creado_en'], name='activity_creado_en'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['segmento', 'creado_en'], name='activity_segmento_creado'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['qna_ini', 'lote_anterior'], name='record_qna_ini_lote'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['lote_anterior'], name='record_lote_anterior'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['tipo'], name='record_tipo'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['fecha_carga'], name='record_fecha_carga'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fovisste', '0010_admin_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveIntegerField(blank=True, null=True, unique=True)),
+                ('numero_usuario', models.PositiveIntegerField(blank=True, null=True)),
+                ('tipo', models.CharField(max_length=20)),
+                ('adquirido_en', models.DateTimeField(auto_now_add=True)),
+                ('expira_en', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['adquirido_en'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'numero_usuario'), name='uploadslot_user_numero')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def binary_rfc(apps, schema_editor):
+    # En MySQL la collation por omisión es insensible a acentos: 'NAVA…' y 'ÑAVA…'
+    # chocarían en el índice único. Los otros backends ya comparan por carácter.
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'ALTER TABLE fovisste_recordsnapshot MODIFY rfc varchar(13) COLLATE utf8mb4_bin NOT NULL'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fovisste', '0011_uploadslot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rfc', models.CharField(max_length=13, unique=True)),
+                ('nombre', models.CharField(blank=True, default='', max_length=30, null=True)),
+                ('cadena1', models.CharField(blank=True, default='', max_length=37, null=True)),
+                ('tipo', models.CharField(blank=True, default='', max_length=1, null=True)),
+                ('impor', models.CharField(blank=True, default='', max_length=8, null=True)),
+                ('cpto', models.CharField(blank=True, default='', max_length=2, null=True)),
+                ('lote_actual', models.CharField(blank=True, default='', max_length=1, null=True)),
+                ('qna', models.CharField(blank=True, default='', max_length=6, null=True)),
+                ('ptje', models.CharField(blank=True, default='', max_length=2, null=True)),
+                ('observacio', models.CharField(blank=True, default='', max_length=47, null=True)),
+                ('lote_anterior', models.CharField(blank=True, default='', max_length=5, null=True)),
+                ('qna_ini', models.CharField(blank=True, default='', max_length=6, null=True)),
+                ('fecha_carga', models.DateTimeField(blank=True, null=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('record', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='fovisste.record')),
+                ('responsable', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['rfc'],
+                'indexes': [models.Index(fields=['qna_ini', 'lote_anterior'], name='snapshot_qna_ini_lote')],
+            },
+        ),
+        migrations.RunPython(binary_rfc, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+"""Llena RecordSnapshot desde Record al migrar: consulta lo lee por omisión.
+
+Misma regla que ``fovisste.snapshot`` (gana el mayor ``(qna_ini, id)`` de cada RFC),
+escrita aquí con los modelos históricos para que la migración no dependa del
+código actual. Se ordena por RFC con collation binaria (como ``str`` de Python):
+con la de MySQL 'NAVA…' y 'ÑAVA…' quedarían intercalados y se agruparían mal.
+Después, ``python manage.py rebuild_snapshot`` repara el snapshot.
+"""
+from django.db import migrations
+from django.db.models import F, Q
+from django.db.models.functions import Collate
+
+CHUNK_SIZE = 1000
+BINARY_COLLATIONS = {'mysql': 'utf8mb4_bin', 'postgresql': 'C', 'sqlite': 'BINARY'}
+FIELDS = [
+    'nombre', 'cadena1', 'tipo', 'impor', 'cpto', 'lote_actual', 'qna', 'ptje', 'observacio',
+    'lote_anterior', 'responsable_id', 'qna_ini', 'fecha_carga',
+]
+
+
+def build_snapshot(apps, schema_editor):
+    Record = apps.get_model('fovisste', 'Record')
+    RecordSnapshot = apps.get_model('fovisste', 'RecordSnapshot')
+    db = schema_editor.connection.alias
+    unique = ['rfc'] if schema_editor.connection.features.supports_update_conflicts_with_target else None
+    update_fields = ['record', *(f.removesuffix('_id') for f in FIELDS), 'actualizado_en']
+
+    def rank(row):
+        return (row['qna_ini'] or '', row['pk'])
+
+    def flush(rows):
+        RecordSnapshot.objects.using(db).bulk_create(
+            [RecordSnapshot(rfc=row['rfc'], record_id=row['pk'], **{f: row[f] for f in FIELDS}) for row in rows],
+            update_conflicts=True, unique_fields=unique, update_fields=update_fields,
+        )
+
+    base = Record.objects.using(db).filter(rfc__gt='')
+    collation = BINARY_COLLATIONS.get(schema_editor.connection.vendor)
+    base = base.annotate(rfc_bin=Collate('rfc', collation) if collation else F('rfc')).order_by('rfc_bin', 'pk')
+    pending, current, last = [], None, None
+    while True:
+        qs = base if last is None else base.filter(Q(rfc_bin__gt=last['rfc']) | Q(rfc_bin=last['rfc'], pk__gt=last['pk']))
+        rows = list(qs.values('pk', 'rfc', *FIELDS)[:CHUNK_SIZE])
+        for row in rows:
+            if current is not None and row['rfc'] != current['rfc']:
+                pending.append(current)
+                current = None
+                if len(pending) >= CHUNK_SIZE:
+                    flush(pending)
+                    pending = []
+            if current is None or rank(row) > rank(current):
+                current = row
+        if len(rows) < CHUNK_SIZE:
+            break
+        last = rows[-1]
+    if current is not None:
+        pending.append(current)
+    if pending:
+        flush(pending)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fovisste', '0012_recordsnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_snapshot, migrations.RunPython.noop),
+    ]
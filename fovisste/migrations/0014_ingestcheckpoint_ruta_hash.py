@@ -0,0 +1,37 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_ruta_hash(apps, schema_editor):
+    IngestCheckpoint = apps.get_model('fovisste', 'IngestCheckpoint')
+    db = schema_editor.connection.alias
+    for checkpoint in IngestCheckpoint.objects.using(db).only('pk', 'ruta').iterator():
+        checkpoint.ruta_hash = hashlib.sha256(checkpoint.ruta.encode('utf-8')).hexdigest()
+        checkpoint.save(update_fields=['ruta_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fovisste', '0013_build_recordsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestcheckpoint',
+            name='ruta_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_ruta_hash, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ingestcheckpoint',
+            name='ruta_hash',
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='ingestcheckpoint',
+            name='ruta',
+            field=models.TextField(),
+        ),
+    ]
@@ -1,3 +1,6 @@
+import hashlib
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -23,6 +26,13 @@ class Record(models.Model):
 
     class Meta: # Meta datos
         ordering = ['-fecha_carga']
+        # Filtros del admin, reversión de lotes y validación de lote duplicado en qnaproceso
+        indexes = [
+            models.Index(fields=['qna_ini', 'lote_anterior'], name='record_qna_ini_lote'),
+            models.Index(fields=['lote_anterior'], name='record_lote_anterior'),
+            models.Index(fields=['tipo'], name='record_tipo'),
+            models.Index(fields=['fecha_carga'], name='record_fecha_carga'),
+        ]
 
     def __str__(self): # Representación en str
         return f"{self.rfc} - {self.nombre}"
@@ -36,6 +46,165 @@ class Activity(models.Model): # Modelo de actividad
 
     class Meta: # Meta datos
         ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['creado_en'], name='activity_creado_en'),
+            models.Index(fields=['segmento', 'creado_en'], name='activity_segmento_creado'),
+        ]
 
     def __str__(self): # Representación en str
         return f"{self.user} - {self.segmento} - {self.actividad}"
+
+
+class IngestCheckpoint(models.Model): # Avance por archivo del comando ingest_dir
+    ESTADO_OK = 'ok'
+    ESTADO_ERROR = 'error'
+    ESTADOS = [(ESTADO_OK, 'Cargado'), (ESTADO_ERROR, 'Error')]
+
+    ruta = models.TextField() # Ruta absoluta del archivo (puede pasar de 255 caracteres)
+    ruta_hash = models.CharField(max_length=64, unique=True, editable=False) # sha256 de ruta: llave única
+    tamano = models.BigIntegerField(default=0)
+    modificado_ns = models.BigIntegerField(default=0) # mtime del archivo al momento de cargarlo
+    qna_ini = models.CharField(max_length=6, blank=True, default='')
+    lote_anterior = models.CharField(max_length=5, blank=True, default='')
+    estado = models.CharField(max_length=10, choices=ESTADOS)
+    registros = models.IntegerField(default=0)
+    errores = models.IntegerField(default=0)
+    mensaje = models.CharField(max_length=255, blank=True, default='')
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta: # Meta datos
+        ordering = ['-actualizado_en']
+
+    def __str__(self): # Representación en str
+        return f"{self.ruta} ({self.estado})"
+
+    @staticmethod
+    def hash_ruta(ruta): # Llave de búsqueda por ruta (un TEXT no admite índice único completo en MySQL)
+        return hashlib.sha256(ruta.encode('utf-8')).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.ruta_hash = self.hash_ruta(self.ruta)
+        super().save(*args, **kwargs)
+
+
+class ChunkedUpload(models.Model): # Subida de un archivo grande por partes (api/chunked/...)
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    nombre = models.CharField(max_length=255) # Nombre original del archivo
+    tamano = models.BigIntegerField(null=True, blank=True) # Tamaño total declarado por el cliente
+    offset = models.BigIntegerField(default=0) # Bytes recibidos y confirmados
+    siguiente_parte = models.IntegerField(default=0)
+    completa = models.BooleanField(default=False)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta: # Meta datos
+        ordering = ['-creado_en']
+
+    def __str__(self): # Representación en str
+        return f"{self.nombre} ({self.offset}/{self.tamano or '?'})"
+
+
+class Carga(models.Model): # Una carga (archivo confirmado o cargado directo) hacia Record
+    MODO_ATOMICO = 'atomic'
+    MODO_POR_BLOQUES = 'chunked'
+    MODOS = [(MODO_ATOMICO, 'Una transacción'), (MODO_POR_BLOQUES, 'Por bloques')]
+
+    EN_PROCESO = 'en_proceso'
+    COMPLETA = 'completa'
+    INCOMPLETA = 'incompleta' # Terminó, pero algunas filas fallaron
+    FALLIDA = 'fallida'
+    REVERTIDA = 'revertida' # Sus registros se borraron (fovisste.revert)
+    ESTADOS = [
+        (EN_PROCESO, 'En proceso'), (COMPLETA, 'Completa'), (INCOMPLETA, 'Incompleta'), (FALLIDA, 'Fallida'),
+        (REVERTIDA, 'Revertida'),
+    ]
+
+    responsable = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    qna_ini = models.CharField(max_length=6, blank=True, default='')
+    lote_anterior = models.CharField(max_length=5, blank=True, default='')
+    archivo = models.CharField(max_length=255, blank=True, default='')
+    modo = models.CharField(max_length=10, choices=MODOS, default=MODO_ATOMICO)
+    estado = models.CharField(max_length=12, choices=ESTADOS, default=EN_PROCESO)
+    filas = models.IntegerField(default=0) # Filas que se intentaron insertar
+    creados = models.IntegerField(default=0)
+    fallidos = models.IntegerField(default=0)
+    bloques_total = models.IntegerField(default=0)
+    bloques_ok = models.IntegerField(default=0)
+    errores = models.JSONField(default=list, blank=True) # Muestra de filas fallidas (file, line, error)
+    iniciado_en = models.DateTimeField(auto_now_add=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+    revertidos = models.IntegerField(default=0) # Registros borrados al revertir
+    revertido_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta: # Meta datos
+        ordering = ['-iniciado_en']
+
+    def __str__(self): # Representación en str
+        return f"{self.qna_ini}/{self.lote_anterior} {self.archivo} ({self.estado})"
+
+
+class PreviewRow(models.Model): # Una fila del preview de carga (antes se guardaba todo en sesión)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    indice = models.IntegerField() # Posición en el preview (0..n-1)
+    archivo = models.CharField(max_length=255, blank=True, default='')
+    linea = models.IntegerField(null=True, blank=True)
+    rfc = models.CharField(max_length=13, blank=True, default='') # Copia de datos['rfc'] para buscar duplicados
+    cpto = models.CharField(max_length=2, blank=True, default='')
+    datos = models.JSONField(default=dict) # Campos parseados (y editados)
+    original = models.JSONField(null=True, blank=True) # Datos antes de la primera edición, para restaurar
+    invalido = models.JSONField(default=list, blank=True) # Reglas de validación que no cumple
+    duplicado = models.CharField(max_length=10, blank=True, default='')
+    editado = models.BooleanField(default=False)
+    borrado = models.BooleanField(default=False)
+
+    class Meta: # Meta datos
+        ordering = ['indice']
+        constraints = [models.UniqueConstraint(fields=['user', 'indice'], name='previewrow_user_indice')]
+        indexes = [models.Index(fields=['user', 'rfc'], name='previewrow_user_rfc')]
+
+    def __str__(self): # Representación en str
+        return f"{self.user_id} #{self.indice} {self.rfc}"
+
+
+class UploadSlot(models.Model): # Turno ocupado por un preview/carga en curso (fovisste.admission)
+    numero = models.PositiveIntegerField(null=True, blank=True, unique=True) # 0..FOVISSTE_UPLOAD_SLOTS-1
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    numero_usuario = models.PositiveIntegerField(null=True, blank=True) # 0..FOVISSTE_UPLOAD_SLOTS_PER_USER-1
+    tipo = models.CharField(max_length=20) # 'preview' o 'carga'
+    adquirido_en = models.DateTimeField(auto_now_add=True)
+    expira_en = models.DateTimeField(db_index=True) # Se libera solo si el proceso murió sin soltarlo
+
+    class Meta: # Meta datos
+        ordering = ['adquirido_en']
+        constraints = [models.UniqueConstraint(fields=['user', 'numero_usuario'], name='uploadslot_user_numero')]
+
+    def __str__(self): # Representación en str
+        return f"{self.tipo} #{self.numero} ({self.user_id})"
+
+
+class RecordSnapshot(models.Model): # Estado actual por RFC: copia de su Record más reciente (fovisste.snapshot)
+    rfc = models.CharField(max_length=13, unique=True)
+    record = models.ForeignKey(Record, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+') # Record de origen (sin FK real: la reversión borra por rangos)
+    nombre = models.CharField(max_length=30, blank=True, null=True, default='')
+    cadena1 = models.CharField(max_length=37, blank=True, null=True, default='')
+    tipo = models.CharField(max_length=1, blank=True, null=True, default='')
+    impor = models.CharField(max_length=8, blank=True, null=True, default='')
+    cpto = models.CharField(max_length=2, blank=True, null=True, default='')
+    lote_actual = models.CharField(max_length=1, blank=True, null=True, default='')
+    qna = models.CharField(max_length=6, blank=True, null=True, default='')
+    ptje = models.CharField(max_length=2, blank=True, null=True, default='')
+    observacio = models.CharField(max_length=47, blank=True, null=True, default='')
+    lote_anterior = models.CharField(max_length=5, blank=True, null=True, default='')
+    responsable = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    qna_ini = models.CharField(max_length=6, blank=True, null=True, default='')
+    fecha_carga = models.DateTimeField(null=True, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta: # Meta datos
+        ordering = ['rfc']
+        # Reversión de un lote: ubicar los RFC cuyo estado actual viene de ese lote
+        indexes = [models.Index(fields=['qna_ini', 'lote_anterior'], name='snapshot_qna_ini_lote')]
+
+    def __str__(self): # Representación en str
+        return f"{self.rfc} ({self.qna_ini})"
@@ -0,0 +1,243 @@
+"""Parsing de archivos de ancho fijo (lotes FOVISSSTE).
+
+Definición única de cortes y longitudes usada por las vistas de carga y por los
+comandos de ingesta. Las funciones trabajan sobre archivos binarios línea por
+línea, sin cargar el archivo completo en memoria.
+
+Las líneas se procesan como bytes (``parse_raw_line``): longitud y cortes se miden
+en bytes y sólo los campos de texto (``TEXT_FIELDS``) se decodifican con la lista
+de codificaciones; los campos de código son ASCII. Una línea ASCII (casi todas) se
+decodifica de una vez, que es más barato que campo por campo. La excepción es una
+línea UTF-8 con caracteres multibyte (archivo guardado desde un editor): ahí los
+anchos cuentan caracteres, como en el formato original.
+"""
+import gzip
+import zipfile
+
+# Definición de cortes fixed-width (campo, inicio, fin)
+FIELDS = [
+    ("rfc", 0, 13),
+    ("nombre", 13, 43),
+    ("cadena1", 43, 80),
+    ("tipo", 80, 81),
+    ("impor", 81, 89),
+    ("cpto", 89, 91),
+    ("lote_actual", 91, 92),
+    ("qna", 92, 98),
+    ("ptje", 98, 100),
+    ("observacio", 100, 147),
+    ("lote_anterior", 147, 153),
+    ("qna_ini", 153, 157),
+]
+FIELD_NAMES = [name for name, _, _ in FIELDS]
+TEXT_FIELDS = frozenset({'nombre', 'cadena1', 'observacio'})  # únicos campos que pueden traer acentos/Ñ
+REQUIRED_LINE_LEN = 100
+REQUIRED_MIN_LEN = 94  # si la línea tiene 94 se deja en blanco el resto (ver normalize_short_line)
+
+# Motores de parseo: por línea (siempre disponible) o columnar con NumPy (fovisste.columnar)
+ENGINE_PYTHON = 'python'
+ENGINE_NUMPY = 'numpy'
+ENGINES = (ENGINE_PYTHON, ENGINE_NUMPY)
+
+# Orden de intento para decodificar; latin-1 nunca falla y sirve de último recurso
+DEFAULT_ENCODINGS = ('utf-8', 'latin-1')
+
+UTF8_BOM = b'\xef\xbb\xbf'
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZIP_MAGIC = (b'PK\x03\x04', b'PK\x05\x06')  # archivo zip / zip vacío
+# Tope de bytes descomprimidos por archivo (protege contra "zip bombs")
+MAX_DECOMPRESSED_BYTES = 4 * 1024 ** 3
+
+
+def normalize_short_line(line: str, required_min_len: int, required_line_len: int) -> str:
+    """Normalize a short fixed-width line into the target length.
+
+    Si required_min_len >= 94 y required_line_len >= 157, mueva los caracteres que originalmente
+    se encuentran en los índices 92 y 93 a los índices de destino 155 y 156 respectivamente, y deje
+    la región central como espacios. De lo contrario, rellene la línea a la derecha hasta alcanzar la longitud de destino.
+    """
+    if len(line) >= required_line_len: # Lo suficiente largo
+        return line
+    if isinstance(line, bytes): # Misma regla sobre bytes (latin-1 conserva cada byte)
+        return normalize_short_line(line.decode('latin-1'), required_min_len, required_line_len).encode('latin-1')
+    if required_min_len >= 94 and required_line_len >= 157: # Regla especial de 94 a 157
+        buf = list(' ' * required_line_len)
+        upto = min(len(line), 92)
+        for i in range(upto):
+            buf[i] = line[i]
+        if len(line) > 92:
+            buf[98] = line[92]
+        if len(line) > 93:
+            buf[99] = line[93]
+        return ''.join(buf)
+    return line.ljust(required_line_len)
+
+
+def decode_line(raw: bytes, encodings=DEFAULT_ENCODINGS) -> str:
+    for enc in encodings[:-1]:
+        try:
+            return raw.decode(enc)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode(encodings[-1], errors='replace')
+
+
+class DecompressionLimitExceeded(ValueError):
+    pass
+
+
+def _limited_lines(stream, limit):
+    total = 0
+    for raw in stream:
+        total += len(raw)
+        if total > limit:
+            raise DecompressionLimitExceeded(f'El archivo descomprimido excede {limit} bytes')
+        yield raw
+
+
+def open_upload(name, stream, max_bytes=MAX_DECOMPRESSED_BYTES):
+    """Itera ``(nombre, lineas_binarias)`` de un archivo subido, descomprimiendo al vuelo.
+
+    El formato se detecta por los bytes mágicos, no por la extensión: gzip
+    (incluye gzip de varios miembros) y zip (un archivo por cada miembro). Texto
+    plano se devuelve tal cual. ``stream`` debe permitir ``seek`` (UploadedFile o
+    archivo en disco); nunca se descomprime el archivo completo en memoria.
+    """
+    head = stream.read(4)
+    stream.seek(0)
+    if head.startswith(GZIP_MAGIC):
+        with gzip.GzipFile(fileobj=stream, mode='rb') as gz:
+            yield name, _limited_lines(gz, max_bytes)
+    elif head in ZIP_MAGIC:
+        with zipfile.ZipFile(stream) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                with zf.open(info) as member:
+                    yield f'{name}:{info.filename}', _limited_lines(member, max_bytes)
+    else:
+        yield name, stream
+
+
+def iter_raw_lines(stream):
+    """Itera ``(idx, linea_binaria)`` sin fin de línea ni BOM, omitiendo líneas en blanco.
+
+    ``idx`` cuenta sólo líneas no vacías (igual que las vistas de carga).
+    """
+    idx = 0
+    first = True
+    for raw in stream:
+        if first:
+            first = False
+            if raw.startswith(UTF8_BOM):
+                raw = raw[len(UTF8_BOM):]
+        raw = raw.rstrip(b'\r\n')
+        if not raw.strip():
+            continue
+        idx += 1
+        yield idx, raw
+
+
+def iter_lines(stream, encodings=DEFAULT_ENCODINGS):
+    """Como ``iter_raw_lines`` pero con cada línea decodificada completa."""
+    for idx, raw in iter_raw_lines(stream):
+        yield idx, decode_line(raw, encodings)
+
+
+def parse_line(line: str) -> dict:
+    """Corta una línea (ya validada con longitud >= REQUIRED_MIN_LEN) en sus campos."""
+    if len(line) < REQUIRED_LINE_LEN:
+        line = normalize_short_line(line, REQUIRED_MIN_LEN, REQUIRED_LINE_LEN)
+    data = {field: line[start:end].strip() for field, start, end in FIELDS}
+    # Fallback especial para PTJE cuando se usó la regla de 94
+    if not data['ptje']:
+        data['ptje'] = line[155:157].strip()
+    return data
+
+
+def multibyte_text(raw: bytes, encodings=DEFAULT_ENCODINGS):
+    """La línea decodificada si alguna codificación la lee con caracteres multibyte; si no, None.
+
+    En ese caso los anchos del formato cuentan caracteres y no bytes. El último
+    recurso (latin-1) es de un byte por carácter y nunca entra aquí.
+    """
+    for enc in encodings[:-1]:
+        try:
+            text = raw.decode(enc)
+        except UnicodeDecodeError:
+            continue
+        return text if len(text) != len(raw) else None
+    return None
+
+
+def _parse_bytes(raw: bytes, encodings) -> dict:
+    if len(raw) < REQUIRED_LINE_LEN:
+        raw = normalize_short_line(raw, REQUIRED_MIN_LEN, REQUIRED_LINE_LEN)
+    data = {}
+    for field, start, end in FIELDS:
+        value = raw[start:end]
+        if field in TEXT_FIELDS and not value.isascii():
+            data[field] = decode_line(value, encodings).strip()
+        else:
+            data[field] = value.decode('latin-1').strip()
+    if not data['ptje']:
+        data['ptje'] = raw[155:157].decode('latin-1').strip()
+    return data
+
+
+def parse_raw_line(raw: bytes, encodings=DEFAULT_ENCODINGS):
+    """Devuelve ``(longitud, data)`` de una línea binaria; ``data`` es None si es corta.
+
+    Una línea ASCII se decodifica de una vez; una con bytes no ASCII se corta en
+    bytes y sólo sus campos de texto pasan por ``decode_line`` (cada campo con su
+    propio fallback), salvo que sea UTF-8 multibyte (ver ``multibyte_text``).
+    """
+    if raw.isascii():
+        line = raw.decode('ascii')
+    else:
+        line = multibyte_text(raw, encodings)
+        if line is None:
+            if len(raw) < REQUIRED_MIN_LEN:
+                return len(raw), None
+            return len(raw), _parse_bytes(raw, encodings)
+    if len(line) < REQUIRED_MIN_LEN:
+        return len(line), None
+    return len(line), parse_line(line)
+
+
+def iter_records(stream, name='', encodings=DEFAULT_ENCODINGS):
+    """Itera ``(idx, data, error)`` por cada línea no vacía del archivo.
+
+    Exactamente uno de ``data`` / ``error`` es distinto de None; ``error`` tiene la
+    misma forma que los errores que devuelven las vistas (file, line, error).
+    """
+    for idx, raw in iter_raw_lines(stream):
+        length, data = parse_raw_line(raw, encodings)
+        if data is None:
+            yield idx, None, {'file': name, 'line': idx, 'error': f'Longitud {length} < {REQUIRED_MIN_LEN}'}
+            continue
+        yield idx, data, None
+
+
+def parse_file(path, encodings=DEFAULT_ENCODINGS, engine=ENGINE_PYTHON):
+    """Parsea un archivo completo: devuelve ``(filas, errores)``.
+
+    Cada fila es una tupla con los valores en el orden de ``FIELD_NAMES`` (más
+    barata de enviar entre procesos que un dict). No usa Django, así se puede
+    ejecutar en un pool de procesos (ver comando ``ingest_dir``). Con
+    ``engine='numpy'`` se usa el motor columnar (mismo resultado, más rápido).
+    """
+    if engine == ENGINE_NUMPY:
+        from .columnar import parse_file_columnar
+        return parse_file_columnar(path, encodings)
+    rows = []
+    errors = []
+    with open(path, 'rb') as stream:
+        for name, lines in open_upload(str(path), stream):
+            for _idx, data, error in iter_records(lines, name, encodings):
+                if error is not None:
+                    errors.append(error)
+                else:
+                    rows.append(tuple(data[field] for field in FIELD_NAMES))
+    return rows, errors
@@ -0,0 +1,235 @@
+"""Preview de una carga guardado en BD, una ``PreviewRow`` por registro.
+
+Antes el preview completo vivía en la sesión (``preview_records``): corregir un
+valor implicaba volver a guardar toda la lista. Ahora cada fila se corrige, borra
+o restaura con un UPDATE de esa fila y la validación se repite sólo para ella; la
+marca de duplicado se recalcula sólo en las filas con la misma llave (RFC + cpto). En
+la sesión quedan únicamente los resúmenes (validación y duplicados), que se
+ajustan por diferencia en lugar de recalcularse.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .duplicates import DUP_ARCHIVO, DUP_BD, existing_rfcs
+from .models import PreviewRow
+from .validation import MARK_KEY, default_validator
+
+# Campos que se pueden corregir desde el preview y su longitud en Record
+EDITABLE_FIELDS = {
+    'rfc': 13, 'nombre': 30, 'cadena1': 37, 'tipo': 1, 'impor': 8, 'cpto': 2,
+    'lote_actual': 1, 'qna': 6, 'ptje': 2, 'observacio': 47,
+}
+INSERT_BATCH = 1000
+ITER_CHUNK = 2000
+
+
+class PreviewEditError(ValueError):
+    pass
+
+
+def rows_for(user):
+    return PreviewRow.objects.filter(user=user)
+
+
+def store(user, rows) -> int:
+    """Reemplaza el preview de ``user`` con ``rows`` (dicts armados por build_preview);
+    ``rows`` se consume en streaming. Devuelve cuántas filas se guardaron."""
+    with transaction.atomic():
+        rows_for(user).delete()
+        batch = []
+        stored = 0
+        for indice, data in enumerate(rows):
+            data = dict(data)
+            archivo = data.pop('archivo', '') or ''
+            linea = data.pop('linea', None)
+            invalido = data.pop(MARK_KEY, [])
+            duplicado = data.pop('duplicado', None) or ''
+            batch.append(PreviewRow(
+                user=user, indice=indice, archivo=archivo[:255], linea=linea,
+                rfc=(data.get('rfc') or '')[:13], cpto=(data.get('cpto') or '')[:2],
+                datos=data, invalido=invalido, duplicado=duplicado,
+            ))
+            stored += 1
+            if len(batch) >= INSERT_BATCH:
+                PreviewRow.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            PreviewRow.objects.bulk_create(batch)
+    return stored
+
+
+def flag_loaded(user, rfcs, qna_ini) -> int:
+    """Agrega la marca ``bd`` a las filas guardadas cuyo RFC ya tiene registros en ``qna_ini``.
+
+    Devuelve cuántas filas quedaron marcadas (con ``archivo/bd`` si ya eran duplicadas en el archivo).
+    """
+    if not (rfcs and qna_ini):
+        return 0
+    loaded = sorted(existing_rfcs(rfcs, qna_ini))
+    marked = 0
+    for start in range(0, len(loaded), INSERT_BATCH):
+        rows = rows_for(user).filter(rfc__in=loaded[start:start + INSERT_BATCH])
+        marked += rows.filter(duplicado='').update(duplicado=DUP_BD)
+        marked += rows.filter(duplicado=DUP_ARCHIVO).update(duplicado=f'{DUP_ARCHIVO}/{DUP_BD}')
+    return marked
+
+
+def clear(user):
+    rows_for(user).delete()
+
+
+def as_dict(row) -> dict:
+    return {
+        **row.datos,
+        'indice': row.indice,
+        'archivo': row.archivo,
+        'linea': row.linea,
+        'invalido': row.invalido,
+        'duplicado': row.duplicado or None,
+        'editado': row.editado,
+        'borrado': row.borrado,
+    }
+
+
+def counts(user) -> dict:
+    """Totales por tipo de las filas no borradas (una sola consulta)."""
+    return rows_for(user).filter(borrado=False).aggregate(
+        total=Count('pk'),
+        tipo_a=Count('pk', filter=Q(datos__tipo='A')),
+        tipo_b=Count('pk', filter=Q(datos__tipo='B')),
+        tipo_m=Count('pk', filter=Q(datos__tipo='M')),
+    )
+
+
+def state(row):
+    """(activa, reglas que falla, duplicado) tal como cuentan en los resúmenes."""
+    if row.borrado:
+        return False, [], ''
+    return True, list(row.invalido), row.duplicado
+
+
+def _with_flag(duplicado, flag, on) -> str:
+    flags = set((duplicado or '').split('/')) - {'', flag}
+    if on:
+        flags.add(flag)
+    return '/'.join(f for f in (DUP_ARCHIVO, DUP_BD) if f in flags)
+
+
+def _reflag_in_file(row, keys) -> list:
+    """Recalcula la marca ``archivo`` de las filas activas con las llaves ``(rfc, cpto)``
+    dadas (mismo criterio que flag_duplicates: desde la segunda aparición).
+
+    Actualiza ``row.duplicado`` en memoria y devuelve ``[(antes, después)]`` de las
+    demás filas que cambiaron, para ajustar el resumen.
+    """
+    changed, others = [], []
+    for rfc, cpto in set(keys):
+        same_key = rows_for(row.user_id).filter(rfc=rfc, cpto=cpto, borrado=False).order_by('indice')
+        for position, other in enumerate(same_key.only('pk', 'duplicado')):
+            flag = _with_flag(other.duplicado, DUP_ARCHIVO, position > 0)
+            if other.pk == row.pk:
+                row.duplicado = flag
+            elif flag != other.duplicado:
+                changed.append((other.duplicado, flag))
+            if flag != other.duplicado:
+                other.duplicado = flag
+                others.append(other)
+    PreviewRow.objects.bulk_update(others, ['duplicado'])
+    return changed
+
+
+def _db_flag(row, qna_ini) -> str:
+    # Marca ``bd`` de la fila: su RFC ya tiene registros en la quincena
+    loaded = bool(row.rfc and qna_ini and existing_rfcs([row.rfc], qna_ini))
+    return _with_flag(row.duplicado, DUP_BD, loaded)
+
+
+def _revalidate(row, qna_ini, keys_changed=True):
+    row.invalido = default_validator.row_failures(row.datos) if settings.FOVISSTE_VALIDATION else []
+    row.rfc = (row.datos.get('rfc') or '')[:13]
+    row.cpto = (row.datos.get('cpto') or '')[:2]
+    if keys_changed:
+        row.duplicado = _db_flag(row, qna_ini)
+
+
+def update_row(row, fields, qna_ini=None) -> list:
+    """Corrige campos de una fila. Sólo escribe si algún valor cambió.
+
+    Si cambia el RFC o el cpto se vuelven a marcar las filas con la llave anterior
+    y la nueva; devuelve sus cambios de marca (ver ``_reflag_in_file``).
+    """
+    unknown = sorted(set(fields) - set(EDITABLE_FIELDS))
+    if unknown:
+        raise PreviewEditError(f"Campos no editables: {', '.join(unknown)}")
+    if row.borrado:
+        raise PreviewEditError('La fila está borrada; restáurala antes de editarla.')
+    changes = {}
+    for field, value in fields.items():
+        value = ('' if value is None else str(value).strip())[:EDITABLE_FIELDS[field]]
+        if (row.datos.get(field) or '') != value:
+            changes[field] = value
+    if not changes:
+        return []
+    if row.original is None:
+        row.original = dict(row.datos)
+    old_key = (row.rfc, row.cpto)
+    row.datos = {**row.datos, **changes}
+    row.editado = row.datos != row.original
+    keys_changed = bool({'rfc', 'cpto'} & set(changes))
+    with transaction.atomic():
+        _revalidate(row, qna_ini, keys_changed=keys_changed)
+        row.save(update_fields=['datos', 'original', 'editado', 'invalido', 'rfc', 'cpto', 'duplicado'])
+        others = _reflag_in_file(row, [old_key, (row.rfc, row.cpto)]) if keys_changed else []
+        row.save(update_fields=['duplicado'])
+    return others
+
+
+def delete_row(row) -> list:
+    """Borra una fila; las demás con su llave se vuelven a marcar (devuelve sus cambios)."""
+    if row.borrado:
+        return []
+    row.borrado = True
+    with transaction.atomic():
+        row.save(update_fields=['borrado'])
+        return _reflag_in_file(row, [(row.rfc, row.cpto)])
+
+
+def restore_row(row, qna_ini=None) -> list:
+    """Deshace el borrado y las ediciones de una fila; devuelve los cambios de marca de las demás."""
+    fields = ['borrado', 'duplicado']
+    keys = [(row.rfc, row.cpto)]
+    row.borrado = False
+    if row.original is not None:
+        row.datos = row.original
+        row.original = None
+        row.editado = False
+        _revalidate(row, qna_ini)
+        fields += ['datos', 'original', 'editado', 'invalido', 'rfc', 'cpto']
+        keys.append((row.rfc, row.cpto))
+    with transaction.atomic():
+        row.save(update_fields=fields)
+        others = _reflag_in_file(row, keys)
+        row.save(update_fields=['duplicado'])
+    return others
+
+
+def adjust_summaries(session, before, after, row, others=()):
+    """Ajusta en sesión los resúmenes de validación y duplicados tras cambiar una fila.
+
+    ``others``: cambios de marca ``(antes, después)`` de otras filas activas.
+    """
+    active_before, invalid_before, dup_before = before
+    active_after, invalid_after, dup_after = after
+    validation = session.get('preview_validation')
+    if validation is not None:
+        session['preview_validation'] = default_validator.adjust_summary(
+            validation, invalid_before, invalid_after, (row.archivo, row.linea),
+            rows_delta=int(active_after) - int(active_before),
+        )
+    duplicates = session.get('preview_duplicates')
+    if duplicates is not None:
+        for flag_before, flag_after in [(dup_before, dup_after), *others]:
+            for key in (DUP_ARCHIVO, DUP_BD):
+                duplicates[key] += (key in flag_after.split('/')) - (key in flag_before.split('/'))
+        session['preview_duplicates'] = duplicates
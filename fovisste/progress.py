@@ -0,0 +1,95 @@
+"""Seguimiento de progreso de cargas largas (preview / confirmación / carga directa).
+
+El navegador genera un ``upload_id`` y lo envía junto con el archivo; mientras la
+vista procesa, se publica el avance en el cache de Django bajo ese id. La vista
+SSE ``api_progress`` lee ese estado y lo transmite al navegador.
+
+Con varios procesos de aplicación el cache debe ser compartido (ver ``CACHES``
+en ``Prestaciones/settings.py``); con LocMemCache sólo funciona en un proceso.
+No puede ser DatabaseCache (check ``fovisste.E001``): ``update`` se llama dentro de
+la transacción de la carga, y el avance no se vería hasta el commit.
+"""
+import re
+import time
+
+from django.core.cache import cache
+
+PROGRESS_TTL = 60 * 30  # segundos que se conserva el estado en cache
+PROGRESS_MIN_INTERVAL = 0.5  # segundos mínimos entre escrituras al cache
+
+STAGE_PARSING = 'parsing'
+STAGE_INSERTING = 'inserting'
+STAGE_DONE = 'done'
+STAGE_ERROR = 'error'
+FINAL_STAGES = (STAGE_DONE, STAGE_ERROR)
+
+_UPLOAD_ID_RE = re.compile(r'[A-Za-z0-9_-]{8,64}')
+
+
+def valid_upload_id(upload_id) -> bool:
+    """El id lo genera el cliente: limitarlo a un formato seguro para usarlo como llave."""
+    return bool(upload_id) and bool(_UPLOAD_ID_RE.fullmatch(upload_id))
+
+
+def progress_key(upload_id: str) -> str:
+    return f'fovisste:progress:{upload_id}'
+
+
+def get_progress(upload_id: str):
+    return cache.get(progress_key(upload_id))
+
+
+async def aget_progress(upload_id: str):
+    return await cache.aget(progress_key(upload_id))
+
+
+class ProgressTracker:
+    """Publica el avance de una carga en el cache.
+
+    Las escrituras se limitan a una cada ``PROGRESS_MIN_INTERVAL`` segundos para que
+    reportar progreso no cueste más que el propio parseo. Si no hay ``upload_id``
+    válido el tracker no hace nada, así las vistas lo usan sin condicionales.
+    """
+
+    def __init__(self, upload_id, user_id=None):
+        self.upload_id = upload_id if valid_upload_id(upload_id) else None
+        self.user_id = user_id
+        self.stage = STAGE_PARSING
+        self.lines = 0
+        self.errors = 0
+        self.created = 0
+        self.file = ''
+        self.message = ''
+        self._last_write = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.upload_id is not None
+
+    def snapshot(self) -> dict:
+        return {
+            'stage': self.stage,
+            'file': self.file,
+            'lines': self.lines,
+            'errors': self.errors,
+            'created': self.created,
+            'message': self.message,
+            'user_id': self.user_id,
+        }
+
+    def update(self, force=False, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_MIN_INTERVAL:
+            return
+        self._last_write = now
+        cache.set(progress_key(self.upload_id), self.snapshot(), PROGRESS_TTL)
+
+    def finish(self, **fields):
+        self.update(force=True, stage=STAGE_DONE, **fields)
+
+    def fail(self, message=''):
+        self.update(force=True, stage=STAGE_ERROR, message=message)
@@ -0,0 +1,204 @@
+"""Conciliación entre dos quincenas: altas, bajas y cambios por RFC.
+
+Los registros de cada quincena se leen ordenados por ``rfc`` con collation binaria
+(``fovisste.collation``: el mismo orden que Python, también con Ñ en MySQL) en
+bloques con paginación por llave ``(rfc, pk)``, así la memoria no depende del
+tamaño de la quincena ni del backend (MySQL no hace streaming con ``iterator()``).
+Las dos secuencias se recorren a la vez como un merge-join:
+
+- RFC sólo en la quincena actual: ``alta``;
+- RFC sólo en la anterior: ``baja``;
+- en ambas: cada registro se empareja por ``cpto`` (los que sobran se emparejan en
+  orden, como cambio de concepto) y si difiere ``impor``, ``cpto`` o ``ptje`` es ``cambio``.
+
+El reporte (CSV) se escribe mientras se envía y queda en
+``MEDIA_ROOT/conciliaciones/<anterior>_<actual>.csv``; se reutiliza mientras ninguna
+de las dos quincenas cambie su número de registros o su último id.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+from itertools import groupby
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+
+from .collation import binary
+from .models import Record
+
+FETCH_SIZE = 5000  # registros por consulta al recorrer una quincena
+FLUSH_ROWS = 1000  # filas del reporte por bloque enviado
+COMPARED_FIELDS = ('impor', 'cpto', 'ptje')
+ALTA, BAJA, CAMBIO = 'alta', 'baja', 'cambio'
+HEADER = [
+    'categoria', 'rfc', 'nombre',
+    'cpto_anterior', 'cpto_actual', 'impor_anterior', 'impor_actual', 'ptje_anterior', 'ptje_actual',
+    'campos',
+]
+_COLUMNS = ('pk', 'rfc', 'nombre', 'cpto', 'impor', 'ptje')
+
+
+class ReconcileError(Exception):
+    pass
+
+
+def report_dir() -> Path:
+    path = Path(settings.MEDIA_ROOT) / 'conciliaciones'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def report_path(anterior, actual) -> Path:
+    return report_dir() / f'{anterior}_{actual}.csv'
+
+
+def _meta_path(anterior, actual) -> Path:
+    return report_dir() / f'{anterior}_{actual}.json'
+
+
+def signature(qna_ini) -> list:
+    """Huella de una quincena: número de registros y último id (cambia con cargas y reversiones)."""
+    data = Record.objects.filter(qna_ini=qna_ini).aggregate(n=Count('pk'), ultimo=Max('pk'))
+    return [data['n'], data['ultimo']]
+
+
+def iter_quincena(qna_ini, fetch_size=FETCH_SIZE):
+    """Registros de la quincena como dicts, ordenados por ``(rfc, pk)``, por bloques.
+
+    Los RFC nulos se omiten (no se pueden conciliar). El orden y la paginación usan
+    collation binaria; la revisión del orden en Python queda como salvaguarda.
+    """
+    base = (Record.objects.filter(qna_ini=qna_ini, rfc__isnull=False)
+            .annotate(rfc_bin=binary('rfc')).order_by('rfc_bin', 'pk'))
+    last = None
+    while True:
+        qs = base
+        if last is not None:
+            qs = qs.filter(Q(rfc_bin__gt=last['rfc']) | Q(rfc_bin=last['rfc'], pk__gt=last['pk']))
+        chunk = list(qs.values(*_COLUMNS)[:fetch_size])
+        for row in chunk:
+            if last is not None and row['rfc'] < last['rfc']:
+                raise ReconcileError(
+                    f'El orden de RFC de la base de datos no coincide ({last["rfc"]!r} antes de {row["rfc"]!r})'
+                )
+            last = row
+            yield row
+        if len(chunk) < fetch_size:
+            return
+
+
+def _pair(old_rows, new_rows):
+    """Empareja los registros de un RFC: primero por ``cpto``, luego los que sobran en orden."""
+    pending_new = list(new_rows)
+    unmatched_old = []
+    for old in old_rows:
+        for i, new in enumerate(pending_new):
+            if new['cpto'] == old['cpto']:
+                yield old, pending_new.pop(i)
+                break
+        else:
+            unmatched_old.append(old)
+    for i, old in enumerate(unmatched_old):
+        yield old, pending_new[i] if i < len(pending_new) else None
+    for new in pending_new[len(unmatched_old):]:
+        yield None, new
+
+
+def _row(categoria, old, new, campos=()):
+    ref = new or old
+    return [
+        categoria, ref['rfc'], ref['nombre'] or '',
+        old['cpto'] if old else '', new['cpto'] if new else '',
+        old['impor'] if old else '', new['impor'] if new else '',
+        old['ptje'] if old else '', new['ptje'] if new else '',
+        '|'.join(campos),
+    ]
+
+
+def merge(old_stream, new_stream):
+    """Merge-join de dos secuencias ordenadas por RFC; itera ``(categoria, anterior, actual, campos)``.
+
+    ``categoria`` es ``None`` para los registros sin cambios (sólo cuentan en el resumen).
+    """
+    old_groups = groupby(old_stream, key=lambda r: r['rfc'])
+    new_groups = groupby(new_stream, key=lambda r: r['rfc'])
+    old = next(old_groups, None)
+    new = next(new_groups, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            for row in old[1]:
+                yield BAJA, row, None, ()
+            old = next(old_groups, None)
+        elif old is None or new[0] < old[0]:
+            for row in new[1]:
+                yield ALTA, None, row, ()
+            new = next(new_groups, None)
+        else:
+            for before, after in _pair(list(old[1]), list(new[1])):
+                if after is None:
+                    yield BAJA, before, None, ()
+                elif before is None:
+                    yield ALTA, None, after, ()
+                else:
+                    campos = tuple(f for f in COMPARED_FIELDS if (before[f] or '') != (after[f] or ''))
+                    yield (CAMBIO if campos else None), before, after, campos
+            old = next(old_groups, None)
+            new = next(new_groups, None)
+
+
+def cached_report(anterior, actual):
+    """``(ruta, resumen)`` del reporte guardado si sigue vigente, si no ``None``."""
+    path = report_path(anterior, actual)
+    try:
+        with open(_meta_path(anterior, actual), encoding='utf-8') as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if not path.exists() or meta.get('firma') != [signature(anterior), signature(actual)]:
+        return None
+    return path, meta['resumen']
+
+
+def stream_report(anterior, actual, fetch_size=FETCH_SIZE):
+    """Genera el CSV por bloques de texto y lo guarda en disco al terminar.
+
+    Si el consumidor deja de leer (cliente desconectado) el archivo parcial se borra.
+    """
+    firma = [signature(anterior), signature(actual)]
+    summary = {ALTA: 0, BAJA: 0, CAMBIO: 0, 'sin_cambio': 0}
+    fd, tmp = tempfile.mkstemp(dir=report_dir(), suffix='.part')
+    completed = False
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as fh:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(HEADER)
+            pending = 1
+            diff = merge(iter_quincena(anterior, fetch_size), iter_quincena(actual, fetch_size))
+            for categoria, before, after, campos in diff:
+                if categoria is None:
+                    summary['sin_cambio'] += 1
+                    continue
+                summary[categoria] += 1
+                writer.writerow(_row(categoria, before, after, campos))
+                pending += 1
+                if pending >= FLUSH_ROWS:
+                    text = buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                    pending = 0
+                    fh.write(text)
+                    yield text
+            text = buffer.getvalue()
+            fh.write(text)
+            yield text
+        os.replace(tmp, report_path(anterior, actual))
+        with open(_meta_path(anterior, actual), 'w', encoding='utf-8') as meta:
+            json.dump({'firma': firma, 'resumen': summary}, meta)
+        completed = True
+    finally:
+        if not completed and os.path.exists(tmp):
+            os.remove(tmp)
@@ -0,0 +1,127 @@
+"""Reversión de una carga (quincena + lote) borrando sus registros por bloques de id.
+
+Un solo ``DELETE ... WHERE qna_ini=... AND lote_anterior=...`` sobre cientos de
+miles de filas bloquea ``Record`` (y llena el log de la BD) por mucho tiempo. Aquí
+se toman los ids de la carga en orden y se borran rangos de a lo más
+``FOVISSTE_REVERT_CHUNK_SIZE`` filas, cada rango en su propia transacción corta,
+con una pausa de ``FOVISSTE_REVERT_PAUSE`` segundos entre bloques para que las
+consultas de los demás usuarios avancen. Si se interrumpe, volver a correrlo
+continúa con lo que falta.
+
+Al terminar se marcan las ``Carga`` del lote como revertidas, se borran los
+checkpoints de ``ingest_dir`` (para poder recargar el archivo corregido), se
+recalculan en ``RecordSnapshot`` los RFC que venían del lote y se registra una
+``Activity``.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import locks, metrics, snapshot
+from .models import Activity, Carga, IngestCheckpoint, Record
+
+REVERT_CHUNK_SIZE = getattr(settings, 'FOVISSTE_REVERT_CHUNK_SIZE', 5000)
+REVERT_PAUSE = getattr(settings, 'FOVISSTE_REVERT_PAUSE', 0.1)
+
+logger = logging.getLogger(__name__)
+
+
+class RevertError(Exception):
+    pass
+
+
+class RevertResult:
+    def __init__(self, qna_ini, lote_anterior):
+        self.qna_ini = qna_ini
+        self.lote_anterior = lote_anterior
+        self.deleted = 0
+        self.chunks = 0
+        self.cargas = 0
+        self.started = time.perf_counter()
+
+    def as_dict(self) -> dict:
+        return {
+            'qna_ini': self.qna_ini,
+            'lote_anterior': self.lote_anterior,
+            'deleted': self.deleted,
+            'chunks': self.chunks,
+            'cargas': self.cargas,
+            'seconds': round(time.perf_counter() - self.started, 3),
+        }
+
+
+def records_for(qna_ini, lote_anterior):
+    return Record.objects.filter(qna_ini=qna_ini, lote_anterior=lote_anterior)
+
+
+def revert_load(qna_ini, lote_anterior, user=None, chunk_size=None, pause=None, on_chunk=None) -> RevertResult:
+    """Borra los registros de la carga ``qna_ini``/``lote_anterior`` por bloques de id.
+
+    ``on_chunk(borrados)`` se llama después de cada bloque confirmado. El candado del
+    lote (fovisste.locks) se toma durante toda la reversión: una carga de ese lote no
+    puede estar corriendo a la vez.
+    """
+    try:
+        with locks.load_lock(qna_ini, lote_anterior, locks.OP_REVERSION):
+            return _revert_locked(qna_ini, lote_anterior, user, chunk_size, pause, on_chunk)
+    except locks.LockTimeout as e:
+        raise RevertError(str(e)) from e
+
+
+def _revert_locked(qna_ini, lote_anterior, user, chunk_size, pause, on_chunk):
+    chunk_size = chunk_size or REVERT_CHUNK_SIZE
+    pause = REVERT_PAUSE if pause is None else pause
+    # Toda carga corre con el candado del lote: una 'en proceso' vista aquí quedó de un
+    # proceso que murió a media carga
+    stale = Carga.objects.filter(qna_ini=qna_ini, lote_anterior=lote_anterior, estado=Carga.EN_PROCESO).update(
+        estado=Carga.FALLIDA, terminado_en=timezone.now(),
+    )
+    if stale:
+        logger.warning('Lote %s de %s: %d carga(s) en proceso abandonadas marcadas como fallidas',
+                       lote_anterior, qna_ini, stale)
+
+    result = RevertResult(qna_ini, lote_anterior)
+    records = records_for(qna_ini, lote_anterior)
+    last_pk = 0
+    while True:
+        # Rango [primero, último] de los siguientes ``chunk_size`` ids de la carga (lectura sin bloqueos)
+        ids = list(records.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            deleted, _ = records.filter(pk__gte=ids[0], pk__lte=ids[-1]).delete()
+        last_pk = ids[-1]
+        result.deleted += deleted
+        result.chunks += 1
+        if on_chunk:
+            on_chunk(result.deleted)
+        if len(ids) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    if snapshot.ENABLED:
+        try:
+            snapshot.refresh_lote(qna_ini, lote_anterior)  # esos RFC vuelven a su registro anterior (o desaparecen)
+        except locks.LockTimeout:
+            # Los registros ya se borraron; el snapshot se repara con rebuild_snapshot
+            logger.warning('Snapshot sin recalcular para el lote %s de %s: candado ocupado (correr rebuild_snapshot)',
+                           lote_anterior, qna_ini)
+    now = timezone.now()
+    with transaction.atomic():
+        for carga in Carga.objects.select_for_update().filter(qna_ini=qna_ini, lote_anterior=lote_anterior).exclude(estado=Carga.REVERTIDA):
+            carga.estado = Carga.REVERTIDA
+            carga.revertidos = result.deleted
+            carga.revertido_en = now
+            carga.save(update_fields=['estado', 'revertidos', 'revertido_en'])
+            result.cargas += 1
+        IngestCheckpoint.objects.filter(qna_ini=qna_ini, lote_anterior=lote_anterior).delete()
+        Activity.objects.create(
+            user=user, segmento='reversion',
+            actividad=f'lote {lote_anterior} qna {qna_ini}: borrados {result.deleted} registros'[:200],
+        )
+    metrics.ROWS_REVERTED.inc(result.deleted, qna_ini=qna_ini)
+    return result
@@ -0,0 +1,106 @@
+"""Lecturas de vistas de consulta hacia la réplica de la BD (alias ``replica``).
+
+El alias existe sólo si se configuró ``DB_REPLICA_HOST`` (ver settings); sin él
+todo sigue en ``default`` y el router no cambia nada.
+
+- Sólo las vistas marcadas con ``@read_replica`` (consulta, resultados, reportes)
+  leen de la réplica; el resto de las lecturas y todas las escrituras van a
+  ``default``. La carga (preview, confirmación, ``ingest_dir``) nunca toca la réplica.
+- Lectura de lo propio: después de una petición de escritura exitosa
+  (POST/PUT/PATCH/DELETE) ``PinPrimaryMiddleware`` fija la sesión a ``default``
+  durante ``FOVISSTE_REPLICA_PIN_SECONDS``, así quien acaba de confirmar una carga
+  ve sus registros en resultados aunque la réplica tenga retraso.
+"""
+import contextvars
+import functools
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_ALIAS = 'replica'
+PIN_SESSION_KEY = 'db_primary_until'
+UNSAFE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+_reading = contextvars.ContextVar('fovisste_read_replica', default=False)
+
+
+def replica_configured() -> bool:
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def pin_seconds() -> float:
+    return getattr(settings, 'FOVISSTE_REPLICA_PIN_SECONDS', 10)
+
+
+def pinned_to_primary(request) -> bool:
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+def pin_primary(request):
+    """Fija la sesión a la BD principal por ``FOVISSTE_REPLICA_PIN_SECONDS``."""
+    request.session[PIN_SESSION_KEY] = time.time() + pin_seconds()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _reading.get() and replica_configured():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Ambos alias son la misma BD
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por replicación, no por migrate
+        return db != REPLICA_ALIAS
+
+
+def _streaming_in_replica(iterator):
+    # El contenido de un StreamingHttpResponse se genera después de que la vista regresa
+    iterator = iter(iterator)
+    while True:
+        token = _reading.set(True)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _reading.reset(token)
+        yield chunk
+
+
+def read_replica(view):
+    """Decorador para vistas de sólo lectura: sus consultas van a la réplica (si existe)."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_configured() or pinned_to_primary(request):
+            return view(request, *args, **kwargs)
+        token = _reading.set(True)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _reading.reset(token)
+        if getattr(response, 'streaming', False) and not getattr(response, 'is_async', False):
+            response.streaming_content = _streaming_in_replica(response.streaming_content)
+        return response
+    return wrapper
+
+
+class PinPrimaryMiddleware:
+    """Después de una escritura exitosa, las lecturas de esa sesión se quedan en ``default``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (request.method in UNSAFE_METHODS and response.status_code < 400
+                and getattr(request, 'user', None) is not None and request.user.is_authenticated):
+            pin_primary(request)
+        return response
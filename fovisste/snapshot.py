@@ -0,0 +1,191 @@
+"""Estado actual por RFC (``RecordSnapshot``): una fila por RFC con su registro más reciente.
+
+``Record`` guarda todas las quincenas, así que buscar a una persona recorre (y
+ordena) toda su historia. ``RecordSnapshot`` tiene una fila por RFC, con índice
+único, copiada del ``Record`` con mayor ``(qna_ini, id)``: la quincena más reciente
+y, dentro de ella, la última carga. Si en esa quincena el RFC tiene varios
+conceptos, el snapshot guarda sólo el último; el historial completo sigue en
+``Record`` (consulta con "mostrar historial").
+
+Se mantiene así:
+
+- ``apply_since(pk)``: al confirmarse cada carga (``loading.load_records``) se
+  aplican los registros con id mayor al último que existía al empezar. Es
+  idempotente: sólo se escribe un RFC si el registro nuevo tiene mayor ``(qna_ini, id)``.
+- ``refresh_lote(qna_ini, lote)``: después de revertir un lote, los RFC cuyo estado
+  venía de ese lote se recalculan desde su historia (``refresh_matching`` para
+  cualquier filtro, p. ej. las quincenas que borra ``seed_loadtest --purge``).
+- ``rebuild()`` (comando ``rebuild_snapshot`` y la migración que crea la tabla):
+  recorre ``Record`` completo por ``(rfc, id)`` y borra los RFC que ya no existen.
+  Repara el snapshot si una actualización se perdió (p. ej. ``FOVISSTE_SNAPSHOT``
+  desactivado un tiempo).
+
+Cada escritura toma ``locks.snapshot_lock()`` (candado único, no por lote) y, ya con
+el candado, lee el estado actual y decide qué filas gana: cargas de lotes distintos
+que comparten RFC, reversiones y ``rebuild()`` no se pisan aunque corran a la vez.
+
+Todo se lee por bloques de ``FOVISSTE_SNAPSHOT_CHUNK`` con paginación por llave
+(el cursor de MySQL trae el resultado completo a memoria con ``iterator()``),
+ordenando por RFC con collation binaria. En MySQL la columna ``rfc`` del snapshot
+también es ``utf8mb4_bin`` (migración 0012): con la collation por omisión 'NAVA…'
+y 'ÑAVA…' chocarían en el índice único.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from . import locks
+from .collation import binary
+from .models import Record, RecordSnapshot
+
+ENABLED = getattr(settings, 'FOVISSTE_SNAPSHOT', True)
+CHUNK_SIZE = getattr(settings, 'FOVISSTE_SNAPSHOT_CHUNK', 1000)
+
+COPY_FIELDS = [
+    'nombre', 'cadena1', 'tipo', 'impor', 'cpto', 'lote_actual', 'qna', 'ptje', 'observacio',
+    'lote_anterior', 'responsable_id', 'qna_ini', 'fecha_carga',
+]
+_VALUES = ['pk', 'rfc', *COPY_FIELDS]
+_UPDATE_FIELDS = ['record', *(f.removesuffix('_id') for f in COPY_FIELDS), 'actualizado_en']
+
+
+def _rank(row):
+    return (row['qna_ini'] or '', row['pk'])
+
+
+def _latest(rows) -> dict:
+    """``{rfc: fila}`` con la fila más reciente de cada RFC."""
+    latest = {}
+    for row in rows:
+        current = latest.get(row['rfc'])
+        if current is None or _rank(row) > _rank(current):
+            latest[row['rfc']] = row
+    return latest
+
+
+def _upsert(rows):
+    if not rows:
+        return
+    objs = [RecordSnapshot(rfc=row['rfc'], record_id=row['pk'], **{f: row[f] for f in COPY_FIELDS}) for row in rows]
+    # MySQL no admite indicar la llave del conflicto (usa cualquier índice único: aquí sólo rfc)
+    unique = ['rfc'] if connection.features.supports_update_conflicts_with_target else None
+    RecordSnapshot.objects.bulk_create(objs, update_conflicts=True, unique_fields=unique, update_fields=_UPDATE_FIELDS)
+
+
+@contextmanager
+def _writing():
+    """Candado de escritura del snapshot y una transacción corta dentro de él."""
+    with locks.snapshot_lock(), transaction.atomic():
+        yield
+
+
+def last_pk() -> int:
+    return Record.objects.aggregate(m=Max('pk'))['m'] or 0
+
+
+def apply_since(pk, chunk_size=None) -> int:
+    """Aplica los registros con id > ``pk``; devuelve cuántas filas del snapshot se escribieron."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    changed = 0
+    while True:
+        rows = list(Record.objects.filter(pk__gt=pk, rfc__gt='').order_by('pk').values(*_VALUES)[:chunk_size])
+        if not rows:
+            return changed
+        pk = rows[-1]['pk']
+        latest = _latest(rows)
+        with _writing():
+            # El estado actual se lee con el candado: otro escritor pudo dejar un registro más reciente
+            current = {
+                rfc: (qna_ini or '', record_id) for rfc, qna_ini, record_id in
+                RecordSnapshot.objects.filter(rfc__in=list(latest)).values_list('rfc', 'qna_ini', 'record_id')
+            }
+            winners = [row for rfc, row in latest.items() if rfc not in current or _rank(row) > current[rfc]]
+            _upsert(winners)
+        changed += len(winners)
+        if len(rows) < chunk_size:
+            return changed
+
+
+def refresh(rfcs) -> int:
+    """Recalcula los RFC indicados desde ``Record``; borra los que ya no tienen registros."""
+    rfcs = list(rfcs)
+    if not rfcs:
+        return 0
+    with _writing():
+        # Historia leída con el candado: incluye lo que otra carga haya aplicado antes
+        latest = _latest(Record.objects.filter(rfc__in=rfcs).values(*_VALUES))
+        _upsert(list(latest.values()))
+        RecordSnapshot.objects.filter(rfc__in=[rfc for rfc in rfcs if rfc not in latest]).delete()
+    return len(rfcs)
+
+
+def refresh_lote(qna_ini, lote_anterior, chunk_size=None) -> int:
+    """Recalcula los RFC cuyo estado actual viene de ``qna_ini``/``lote_anterior`` (tras revertirlo)."""
+    return refresh_matching(chunk_size, qna_ini=qna_ini, lote_anterior=lote_anterior)
+
+
+def refresh_matching(chunk_size=None, **filters) -> int:
+    """Recalcula, por bloques, los RFC del snapshot que cumplen ``filters`` (tras borrar su historia)."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    base = RecordSnapshot.objects.filter(**filters).annotate(rfc_bin=binary('rfc')).order_by('rfc_bin')
+    refreshed = 0
+    last = ''
+    while True:
+        rfcs = list(base.filter(rfc_bin__gt=last).values_list('rfc', flat=True)[:chunk_size])
+        if not rfcs:
+            return refreshed
+        refreshed += refresh(rfcs)
+        last = rfcs[-1]
+        if len(rfcs) < chunk_size:
+            return refreshed
+
+
+def iter_history(chunk_size=None):
+    """``{'pk', 'rfc'}`` de todos los registros con RFC, ordenados por ``(rfc, id)``, por bloques."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    # Collation binaria: con la de MySQL 'NAVA…' y 'ÑAVA…' quedarían intercalados
+    base = Record.objects.filter(rfc__gt='').annotate(rfc_bin=binary('rfc')).order_by('rfc_bin', 'pk')
+    last = None
+    while True:
+        qs = base
+        if last is not None:
+            qs = qs.filter(Q(rfc_bin__gt=last['rfc']) | Q(rfc_bin=last['rfc'], pk__gt=last['pk']))
+        rows = list(qs.values('pk', 'rfc')[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+
+
+def rebuild(chunk_size=None, on_chunk=None) -> dict:
+    """Reconstruye el snapshot completo sin vaciarlo: recalcula cada RFC y al final borra los
+    que no se tocaron (RFC que ya no existen en ``Record``).
+
+    El recorrido sólo junta los RFC; cada bloque se recalcula con ``refresh()`` (con el
+    candado), así una carga confirmada a media reconstrucción no se pierde.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    started = timezone.now()
+    pending = []
+    last = None
+    written = 0
+    for row in iter_history(chunk_size):
+        if row['rfc'] == last:
+            continue
+        last = row['rfc']
+        if len(pending) >= chunk_size:
+            written += refresh(pending)
+            pending = []
+            if on_chunk:
+                on_chunk(written)
+        pending.append(row['rfc'])
+    if pending:
+        written += refresh(pending)
+        if on_chunk:
+            on_chunk(written)
+    with _writing():
+        removed, _ = RecordSnapshot.objects.filter(actualizado_en__lt=started).delete()
+    return {'rfcs': written, 'removed': removed}
@@ -0,0 +1,86 @@
+"""Páginas HTML en streaming para tablas grandes (consulta, resultados).
+
+La página se renderiza una sola vez con un marcador (``{{ filas }}``) en lugar de
+las filas. Se envía primero todo lo que va antes del marcador (encabezado,
+formulario, inicio de la tabla), luego las filas en bloques de
+``FOVISSTE_STREAM_CHUNK`` renderizados con una plantilla parcial, y al final el
+resto de la página con el número de filas enviadas (``{{ filas_total }}``): el
+primer byte no espera ni a la consulta ni a un ``COUNT(*)``.
+
+Con ``key`` cada bloque es una consulta propia paginada por llave (``LIMIT`` y
+``key > último``), y la memoria del worker se queda en un bloque. Sin ``key`` se
+usa ``iterator(chunk_size=...)``: en PostgreSQL es un cursor del lado del
+servidor, pero el cliente de MySQL trae el resultado completo a memoria, así que
+sólo conviene para consultas ya acotadas (``resultados`` muestra 200 filas).
+"""
+import uuid
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+
+CHUNK_SIZE = getattr(settings, 'FOVISSTE_STREAM_CHUNK', 500)
+
+
+def _keyset_batches(rows, size, key):
+    """Bloques de ``rows`` ordenados por ``key`` (campo único y no nulo, ``-`` para descendente)."""
+    field = key.lstrip('-')
+    lookup = f'{field}__lt' if key.startswith('-') else f'{field}__gt'
+    rows = rows.order_by(key)
+    last = None
+    while True:
+        batch = list((rows if last is None else rows.filter(**{lookup: last}))[:size])
+        if batch:
+            yield batch
+        if len(batch) < size:
+            return
+        last = getattr(batch[-1], field)
+
+
+def _batches(rows, size, key=None):
+    if key is not None:
+        yield from _keyset_batches(rows, size, key)
+        return
+    iterator = rows.iterator(chunk_size=size) if hasattr(rows, 'iterator') else iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def stream_rows(request, template_name, context, rows, row_template, chunk_size=None, on_finish=None, key=None):
+    """``StreamingHttpResponse`` de ``template_name`` con ``rows`` en el lugar de ``{{ filas }}``.
+
+    ``{{ filas_total }}`` se reemplaza por el número de filas enviadas; sólo puede ir
+    después de ``{{ filas }}``. ``key`` (p. ej. ``'-pk'``) pagina ``rows`` por llave
+    en lugar de leerlas con ``iterator()``; define también el orden de las filas.
+
+    ``row_template`` recibe ``rows`` (un bloque) y debe cubrir el caso vacío con
+    ``{% empty %}``: si no hay resultados se renderiza una vez con una lista vacía.
+    ``on_finish()`` se llama cuando ya se enviaron todas las filas (para medir la
+    petición completa: la vista regresa antes de consultarlas).
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    marker = f'filas-{uuid.uuid4().hex}'
+    total_marker = f'filas-total-{uuid.uuid4().hex}'
+    page = render_to_string(template_name, {**context, 'filas': marker, 'filas_total': total_marker}, request)
+    head, _, tail = page.partition(marker)
+    rows_template = get_template(row_template)
+
+    def content():
+        yield head
+        sent = 0
+        for batch in _batches(rows, chunk_size, key):
+            sent += len(batch)
+            yield rows_template.render({'rows': batch})
+        if not sent:
+            yield rows_template.render({'rows': []})
+        if on_finish:
+            on_finish()
+        yield tail.replace(total_marker, str(sent))
+
+    response = StreamingHttpResponse(content(), content_type='text/html; charset=utf-8')
+    response['X-Accel-Buffering'] = 'no'  # que nginx no junte la respuesta antes de enviarla
+    return response
@@ -0,0 +1,19 @@
+"""Runner de ``manage.py test``: toda la corrida usa un MEDIA_ROOT temporal."""
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TempMediaRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._media = tempfile.TemporaryDirectory(prefix='fovisste-media-')
+        # Los reportes de errores van bajo el MEDIA_ROOT temporal aunque el entorno defina otro directorio
+        self._media_settings = override_settings(MEDIA_ROOT=self._media.name, FOVISSTE_ERROR_REPORT_DIR='')
+        self._media_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._media_settings.disable()
+        self._media.cleanup()
+        super().teardown_test_environment(**kwargs)
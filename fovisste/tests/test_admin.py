@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from fovisste import admin as fovisste_admin
+from fovisste.models import Activity, Carga, Record
+
+
+class RecordAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:fovisste_record_changelist')
+        Carga.objects.create(qna_ini='202510', lote_anterior='0001')
+        Carga.objects.create(qna_ini='202510', lote_anterior='0002')
+        self.add('PEGJ800101AB1', 'PEREZ GOMEZ JUAN', '202510', '0001', 'A')
+        self.add('LOMA900202CD2', 'LOPEZ MARTINEZ ANA', '202510', '0002', 'B')
+        self.add('RUIZ850303EF3', 'RUIZ SANCHEZ LUIS', '202509', '0001', 'M')
+
+    def add(self, rfc, nombre, qna_ini, lote, tipo):
+        user = User.objects.create_user(f'u{rfc}')
+        return Record.objects.create(rfc=rfc, nombre=nombre, qna_ini=qna_ini, lote_anterior=lote, tipo=tipo, responsable=user)
+
+    def changelist(self, **params):
+        resp = self.client.get(self.url, params)
+        self.assertEqual(resp.status_code, 200)
+        return sorted(r.rfc for r in resp.context['cl'].result_list)
+
+    def test_no_query_per_row(self):
+        with CaptureQueriesContext(connection) as few:
+            self.changelist()
+        for i in range(10):
+            self.add(f'XXXX0001{i:02d}ZZ9', 'OTRO', '202510', '0001', 'A')
+        with CaptureQueriesContext(connection) as many:
+            self.changelist()
+        self.assertEqual(len(few), len(many))
+        counts = [q['sql'] for q in many.captured_queries if 'COUNT' in q['sql'] and 'fovisste_record' in q['sql']]
+        self.assertTrue(counts)
+        self.assertTrue(all('LIMIT' in sql for sql in counts))  # nunca un COUNT(*) completo
+
+    def test_targeted_search(self):
+        self.assertEqual(self.changelist(q='pegj'), ['PEGJ800101AB1'])
+        self.assertEqual(self.changelist(q='LOPEZ'), ['LOMA900202CD2'])
+        self.assertEqual(self.changelist(q='202509'), ['RUIZ850303EF3'])
+        self.assertEqual(self.changelist(q='lote:0001'), ['PEGJ800101AB1', 'RUIZ850303EF3'])
+        # Ya no es "contiene": un fragmento intermedio no encuentra nada
+        self.assertEqual(self.changelist(q='GOMEZ'), [])
+
+    def test_list_filters(self):
+        self.assertEqual(self.changelist(qna_ini='202510', lote_anterior='0002'), ['LOMA900202CD2'])
+        self.assertEqual(self.changelist(tipo='M'), ['RUIZ850303EF3'])
+        resp = self.client.get(self.url, {'qna_ini': '202510'})
+        self.assertContains(resp, '?lote_anterior=0002&amp;qna_ini=202510')
+
+    def test_unfiltered_count_uses_estimate(self):
+        with mock.patch.object(fovisste_admin, 'estimated_rows', return_value=25_000_000):
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.context['cl'].result_count, 25_000_000)
+
+
+class ActivityAdminTests(TestCase):
+    def test_search_by_username(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        other = User.objects.create_user('capturista')
+        Activity.objects.create(user=other, segmento='carga', actividad='x')
+        Activity.objects.create(user=admin, segmento='consulta', actividad='y')
+        client = Client()
+        client.force_login(admin)
+        resp = client.get(reverse('admin:fovisste_activity_changelist'), {'q': 'capturista'})
+        self.assertEqual([a.segmento for a in resp.context['cl'].result_list], ['carga'])
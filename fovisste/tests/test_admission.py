@@ -0,0 +1,86 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from fovisste import admission
+from fovisste.models import UploadSlot
+
+
+def make_line(rfc):
+    return f"{rfc.ljust(13)}{'Nombre de prueba'.ljust(30)}{''.ljust(37)}A{''.ljust(8)}{''.ljust(2)}1202510".ljust(157)
+
+
+class AdmissionTests(TestCase):
+    def setUp(self):
+        for name, value in (('GLOBAL_SLOTS', 2), ('USER_SLOTS', 1)):
+            patcher = mock.patch.object(admission, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = self.make_user('tester')
+        self.client = self.login(self.user)
+
+    def make_user(self, username):
+        user = User.objects.create_user(username)
+        user.user_permissions.add(Permission.objects.get(codename='add_record'))
+        return user
+
+    def login(self, user):
+        client = Client()
+        client.force_login(user)
+        session = client.session
+        session['qna_ini'] = '202510'
+        session['lote_anterior'] = '0001'
+        session.save()
+        return client
+
+    def preview(self, client):
+        upload = SimpleUploadedFile('lote.txt', make_line('RFC0000000001').encode('latin-1'))
+        return client.post(reverse('api_preview'), {'files': [upload]})
+
+    def test_slot_is_released_after_the_request(self):
+        resp = self.preview(self.client)
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(UploadSlot.objects.exists())
+
+    def test_per_user_limit_returns_429(self):
+        admission.acquire(self.user, admission.TIPO_CARGA)
+        resp = self.preview(self.client)
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp['Retry-After'], str(admission.RETRY_AFTER))
+        data = json.loads(resp.content)
+        self.assertFalse(data['ok'])
+        self.assertIn('Ya tienes una carga', data['error'])
+        # Otro usuario todavía tiene turno
+        self.assertEqual(self.preview(self.login(self.make_user('otro'))).status_code, 200)
+
+    def test_global_limit_returns_429(self):
+        admission.acquire(self.make_user('a'), admission.TIPO_PREVIEW)
+        admission.acquire(self.make_user('b'), admission.TIPO_PREVIEW)
+        resp = self.preview(self.client)
+        self.assertEqual(resp.status_code, 429)
+        self.assertIn('demasiadas cargas', json.loads(resp.content)['error'])
+        self.assertEqual(UploadSlot.objects.count(), 2)
+
+    def test_expired_slot_is_reclaimed(self):
+        slot = admission.acquire(self.user, admission.TIPO_CARGA)
+        UploadSlot.objects.filter(pk=slot.pk).update(expira_en=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.preview(self.client).status_code, 200)
+
+    def test_race_on_same_number_retries(self):
+        UploadSlot.objects.create(numero=0, user=self.make_user('a'), numero_usuario=0, tipo='preview',
+                                  expira_en=timezone.now() + timedelta(hours=1))
+        # Simula otro proceso que eligió el mismo número antes de insertar
+        picks = iter([0, 0, 1, 0])  # (global, usuario) por intento
+        with mock.patch.object(admission, '_first_free', side_effect=lambda taken, limit: next(picks)):
+            slot = admission.acquire(self.user, admission.TIPO_PREVIEW)
+        self.assertEqual((slot.numero, slot.numero_usuario), (1, 0))
+
+    def test_get_is_not_limited(self):
+        admission.acquire(self.user, admission.TIPO_PREVIEW)
+        self.assertEqual(self.client.get(reverse('api_preview')).status_code, 405)
@@ -0,0 +1,69 @@
+from unittest import TestCase, mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase as DjangoTestCase
+
+from fovisste import loading
+from fovisste.batching import BatchSizer
+from fovisste.models import Carga, Record
+
+
+def run(sizer, seconds_for, batches=30):
+    """Simula ``batches`` lotes llenos; ``seconds_for(tamaño)`` da la latencia de cada uno."""
+    for _ in range(batches):
+        sizer.record(sizer.size, seconds_for(sizer.size))
+    return sizer.size
+
+
+class BatchSizerTests(TestCase):
+    def test_limits_by_packet_and_params(self):
+        sizer = BatchSizer(initial=5000, row_bytes=1000, max_packet=1_000_000)
+        self.assertEqual(sizer.limit, 500)  # la mitad del paquete / 1000 bytes
+        self.assertEqual(sizer.size, 500)
+        sizer = BatchSizer(initial=5000, params_per_row=13, max_params=999)
+        self.assertEqual(sizer.size, 76)
+
+    def test_wider_rows_shrink_the_batch(self):
+        sizer = BatchSizer(initial=2000, max_packet=1_000_000)
+        sizer.observe_row(['x' * 2000] * 2)
+        self.assertLessEqual(sizer.size * sizer.row_bytes, 500_000)
+
+    def test_converges_near_best_size(self):
+        # Costo fijo por sentencia + costo por fila que crece pasando de 4000 filas
+        def seconds_for(size):
+            return 0.05 + size * 0.00001 + max(0, size - 4000) ** 2 * 1e-8
+        final = run(BatchSizer(initial=200, maximum=50_000), seconds_for)
+        self.assertTrue(1500 <= final <= 9000, final)
+
+    def test_slow_batches_shrink(self):
+        sizer = BatchSizer(initial=10_000, max_seconds=1.0)
+        sizer.record(10_000, 3.0)
+        self.assertLess(sizer.size, 10_000)
+
+    def test_partial_batch_is_ignored(self):
+        sizer = BatchSizer(initial=1000)
+        sizer.record(10, 0.001)
+        self.assertEqual(sizer.size, 1000)
+
+
+class LoadRecordsBatchingTests(DjangoTestCase):
+    def test_load_uses_adaptive_batches(self):
+        user = User.objects.create_user('tester')
+        carga = Carga.objects.create(responsable=user, qna_ini='202510', lote_anterior='0001')
+        items = ((loading.record_from_data({'rfc': f'RFC{i}'}, user), 'lote.txt', i) for i in range(700))
+        sizes = []
+        original = loading._bulk_insert
+
+        def spy(records):
+            sizes.append(len(records))
+            original(records)
+        # Sin el límite de 999 variables que Django asume para SQLite
+        unlimited = mock.patch.object(connection.ops, 'bulk_batch_size', lambda fields, objs: len(objs))
+        with mock.patch.object(loading, 'BULK_BATCH_SIZE', 100), mock.patch.object(loading, '_learned_sizes', {}), \
+                mock.patch.object(loading, '_bulk_insert', spy), unlimited, self.assertLogs('fovisste.batching', 'INFO'):
+            loading.load_records(items, carga, Carga.MODO_ATOMICO)
+        self.assertEqual(Record.objects.count(), 700)
+        self.assertEqual(sum(sizes), 700)
+        self.assertEqual(sizes[0], 100)
+        self.assertGreater(len(set(sizes)), 1)
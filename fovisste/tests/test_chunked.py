@@ -0,0 +1,86 @@
+import json
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, Client
+from django.contrib.auth.models import User, Permission
+from django.urls import reverse
+from fovisste import chunked
+from fovisste.models import ChunkedUpload, PreviewRow
+
+
+def make_line(rfc):
+    return f"{rfc.ljust(13)}{'Nombre de prueba'.ljust(30)}{''.ljust(37)}A{''.ljust(8)}{''.ljust(2)}1202510".ljust(157)
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='pass')
+        self.user.user_permissions.add(Permission.objects.get(codename='add_record'))
+        self.client = Client()
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['qna_ini'] = '202510'
+        session['lote_anterior'] = '0001'
+        session.save()
+        self.content = '\r\n'.join(make_line(f'RFC000000000{i}') for i in range(5)).encode('latin-1')
+
+    def start(self):
+        resp = self.client.post(reverse('api_chunked_start'), {'filename': 'lote.txt', 'size': len(self.content)})
+        self.assertEqual(resp.status_code, 200)
+        return json.loads(resp.content)
+
+    def put(self, chunked_id, index, offset, body):
+        return self.client.generic(
+            'PUT', reverse('api_chunked_put', args=[chunked_id, index]), body,
+            content_type='application/octet-stream', HTTP_X_CHUNK_OFFSET=str(offset),
+        )
+
+    def test_chunks_then_finish_builds_preview(self):
+        state = self.start()
+        pieces = [self.content[i:i + 200] for i in range(0, len(self.content), 200)]
+        offset = 0
+        for index, piece in enumerate(pieces):
+            resp = self.put(state['chunked_id'], index, offset, piece)
+            self.assertEqual(resp.status_code, 200)
+            offset = json.loads(resp.content)['offset']
+        self.assertEqual(offset, len(self.content))
+
+        resp = self.client.post(reverse('api_chunked_finish'), {'chunked_id': [state['chunked_id']]})
+        self.assertEqual(resp.status_code, 200)
+        data = json.loads(resp.content)
+        self.assertEqual(data['preview_count'], 5)
+        self.assertEqual(PreviewRow.objects.filter(user=self.user).count(), 5)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_wrong_offset_returns_current_state(self):
+        state = self.start()
+        self.put(state['chunked_id'], 0, 0, self.content[:100])
+        # Reintento de la misma parte (p. ej. tras un corte de red): se rechaza y se indica dónde seguir
+        resp = self.put(state['chunked_id'], 0, 0, self.content[:100])
+        self.assertEqual(resp.status_code, 409)
+        data = json.loads(resp.content)
+        self.assertEqual(data['offset'], 100)
+        self.assertEqual(data['next_chunk'], 1)
+        self.assertEqual(list(chunked.upload_dir().glob(f"{state['chunked_id']}.*.tmp")), [])
+
+    def test_part_is_received_outside_the_row_lock(self):
+        state = self.start()
+        depth = []
+        receive = chunked.receive_part
+
+        def spy(upload, stream):
+            depth.append(len(connection.atomic_blocks))
+            return receive(upload, stream)
+        baseline = len(connection.atomic_blocks)
+        with mock.patch.object(chunked, 'receive_part', spy):
+            resp = self.put(state['chunked_id'], 0, 0, self.content[:100])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(depth, [baseline])  # sin transacción (ni select_for_update) abierta
+
+    def test_finish_rejects_incomplete_upload(self):
+        state = self.start()
+        self.put(state['chunked_id'], 0, 0, self.content[:100])
+        resp = self.client.post(reverse('api_chunked_finish'), {'chunked_id': [state['chunked_id']]})
+        self.assertEqual(resp.status_code, 409)
+        self.assertFalse(PreviewRow.objects.exists())
@@ -0,0 +1,52 @@
+import io
+import os
+import tempfile
+from unittest import skipUnless
+
+from django.test import SimpleTestCase
+from fovisste import columnar
+from fovisste.parsing import FIELD_NAMES, iter_records, parse_file
+
+
+def make_line(i, length=157, tipo='A', ptje='30'):
+    line = (f"{f'RFC{i:010d}'.ljust(13)}{f'Nombre {i}'.ljust(30)}{''.ljust(37)}{tipo}{i:08d}64"
+            f"1202510{ptje}{'Observación'.ljust(47)}0001202510")
+    return line[:length].ljust(length)
+
+
+@skipUnless(columnar.AVAILABLE, 'NumPy no está instalado')
+class ColumnarParseTests(SimpleTestCase):
+    def content(self):
+        lines = [make_line(i, length) for i, length in enumerate([157, 100, 94, 157, 120, 157], start=1)]
+        lines[3] = lines[3].replace('Nombre 4 ', 'Ñoño 4   ')  # UTF-8 multibyte -> parser por línea
+        lines.insert(2, 'corta')
+        lines.insert(4, '   ')
+        lines.append(make_line(7, ptje='  '))  # fallback de PTJE desde [155:157]
+        return ('﻿' + '\r\n'.join(lines) + '\r\n').encode('utf-8')
+
+    def reference(self, content):
+        rows, errors = [], []
+        for idx, data, error in iter_records(io.BytesIO(content), 'lote.txt'):
+            if error:
+                errors.append(error)
+            else:
+                rows.append((idx, tuple(data[f] for f in FIELD_NAMES)))
+        return rows, errors
+
+    def test_matches_line_parser_for_mixed_lengths(self):
+        content = self.content()
+        expected_rows, expected_errors = self.reference(content)
+        for block_bytes in (200, columnar.BLOCK_BYTES):
+            rows, errors = [], []
+            for block in columnar.iter_column_blocks(io.BytesIO(content), 'lote.txt', block_bytes=block_bytes):
+                rows.extend(zip(block.lines.tolist(), block.rows()))
+                errors.extend(block.errors)
+            self.assertEqual(rows, expected_rows)
+            self.assertEqual(errors, expected_errors)
+
+    def test_parse_file_engine(self):
+        fd, path = tempfile.mkstemp(suffix='.txt')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(self.content())
+        self.assertEqual(parse_file(path, engine='numpy'), parse_file(path))
@@ -0,0 +1,56 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase
+
+from fovisste import dbpool
+from fovisste.management.commands import bench_connections
+
+
+class BenchConnectionsTests(SimpleTestCase):
+    def setUp(self):
+        # BD de pruebas del backend que se esté usando, con conexiones persistentes y sin pool
+        conn = connections['default']
+        options = {k: v for k, v in conn.settings_dict.get('OPTIONS', {}).items() if k != 'pool'}
+        overrides = {'CONN_MAX_AGE': 60, 'OPTIONS': options}
+        if conn.vendor == 'sqlite' and conn.is_in_memory_db():
+            # Archivo SQLite propio: una BD en memoria nunca se cierra y ocultaría la diferencia
+            fd, path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(fd)
+            self.addCleanup(os.remove, path)
+            overrides['NAME'] = path
+        patcher = mock.patch.dict(conn.settings_dict, overrides)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_persistent_connection_is_opened_once(self):
+        opened, timings = bench_connections.run_mode('default', bench_connections.MODE_DIRECT, 20)
+        self.assertEqual((opened, len(timings)), (20, 20))
+        opened, timings = bench_connections.run_mode('default', bench_connections.MODE_CONFIGURED, 20)
+        self.assertEqual((opened, len(timings)), (1, 20))
+
+    def test_command_output(self):
+        out = StringIO()
+        call_command('bench_connections', requests=5, stdout=out)
+        output = out.getvalue()
+        self.assertIn('CONN_MAX_AGE=60', output)
+        self.assertIn('pool=no', output)
+        self.assertIn('por_peticion  5 peticiones, 5 conexiones abiertas', output)
+        self.assertIn('configurada   5 peticiones, 1 conexiones abiertas', output)
+        self.assertIn('Ahorro por petición', output)
+
+
+class RecycleConnectionsTests(TestCase):
+    def test_expired_connection_is_closed_outside_transactions(self):
+        conn = connections['default']
+        with mock.patch.object(type(conn), 'close_if_unusable_or_obsolete') as close:
+            dbpool.recycle_connections()  # TestCase: dentro de la transacción de la prueba
+        close.assert_not_called()
+        with mock.patch.object(conn, 'in_atomic_block', False), \
+                mock.patch.object(type(conn), 'close_if_unusable_or_obsolete') as close:
+            dbpool.recycle_connections()
+        close.assert_called()
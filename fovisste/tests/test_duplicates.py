@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from fovisste import duplicates, preview
+from fovisste.duplicates import DuplicateMarker
+from fovisste.models import PreviewRow, Record
+
+
+class DuplicateQueryTests(TestCase):
+    def test_db_lookup_is_chunked_not_per_row(self):
+        user = User.objects.create_user('tester')
+        Record.objects.create(rfc='RFC0000000002', qna_ini='202510')
+        marker = DuplicateMarker()
+        rows = [{'rfc': f'RFC000000000{i % 5}', 'cpto': str(i)} for i in range(50)]
+        for row in rows:
+            marker.mark(row)
+        preview.store(user, rows)
+        # 5 RFC distintos en bloques de 2 -> 3 consultas, más las 2 que marcan las filas
+        with self.assertNumQueries(5), mock.patch.object(duplicates, 'QUERY_CHUNK', 2):
+            marked = preview.flag_loaded(user, marker.rfcs(), '202510')
+        self.assertEqual((marker.in_file, marked), (0, 10))
+
+    def test_existing_rfcs_distinct_ignores_meta_ordering(self):
+        Record.objects.bulk_create([Record(rfc='RFC0000000001', qna_ini='202510') for _ in range(3)])
+        with CaptureQueriesContext(connection) as queries:
+            found = duplicates.existing_rfcs({'RFC0000000001', 'RFC0000000009'}, '202510')
+        self.assertEqual(found, {'RFC0000000001'})
+        self.assertNotIn('ORDER BY', queries[0]['sql'])
+
+
+def line(rfc, cpto):
+    return f"{rfc.ljust(13)}{'NOMBRE'.ljust(30)}{''.ljust(37)}A{''.ljust(8)}{cpto}1202510{''.ljust(49)}0001202510"
+
+
+class PreviewDuplicateSourcesTests(TestCase):
+    """Una fuente de duplicado por prueba, a través de ``api_preview``."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('tester')
+        self.user.user_permissions.add(Permission.objects.get(codename='add_record'))
+        self.client = Client()
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['qna_ini'] = '202510'
+        session['lote_anterior'] = '0001'
+        session.save()
+
+    def post(self, *files):
+        uploads = [SimpleUploadedFile(name, '\n'.join(lines).encode()) for name, lines in files]
+        resp = self.client.post(reverse('api_preview'), {'files': uploads})
+        self.assertEqual(resp.status_code, 200)
+        return dict(PreviewRow.objects.filter(user=self.user).values_list('indice', 'duplicado'))
+
+    def test_in_file(self):
+        flags = self.post(('a.txt', [line('RFC0000000001', '01'), line('RFC0000000001', '02'),
+                                     line('RFC0000000001', '01')]))
+        self.assertEqual(list(flags.values()), ['', '', 'archivo'])  # otro cpto no es duplicado
+
+    def test_across_files(self):
+        flags = self.post(('a.txt', [line('RFC0000000001', '01')]), ('b.txt', [line('RFC0000000001', '01')]))
+        self.assertEqual(list(flags.values()), ['', 'archivo'])
+
+    def test_against_db(self):
+        Record.objects.create(rfc='RFC0000000001', qna_ini='202510')
+        Record.objects.create(rfc='RFC0000000002', qna_ini='202509')  # otra quincena
+        flags = self.post(('a.txt', [line('RFC0000000001', '01'), line('RFC0000000002', '01'),
+                                     line('RFC0000000001', '01')]))
+        self.assertEqual(list(flags.values()), ['bd', '', 'archivo/bd'])
+        self.assertEqual(self.client.session['preview_duplicates'], {'archivo': 1, 'bd': 2})
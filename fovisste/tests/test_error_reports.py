@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from fovisste import error_reports
+
+
+def make_line(rfc):
+    return f"{rfc.ljust(13)}{'Nombre de prueba'.ljust(30)}{''.ljust(37)}A{''.ljust(8)}{''.ljust(2)}1202510".ljust(157)
+
+
+class ErrorReportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='pass')
+        self.user.user_permissions.add(Permission.objects.get(codename='add_record'))
+        self.client = Client()
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['qna_ini'] = '202510'
+        session['lote_anterior'] = '0001'
+        session.save()
+
+    def upload_bad_file(self, short_lines=300):
+        lines = [make_line('RFC0000000001')] + ['LINEA CORTA'] * short_lines + [make_line('RFC0000000002')]
+        upload = SimpleUploadedFile('lote.txt', '\r\n'.join(lines).encode('latin-1'))
+        resp = self.client.post(reverse('api_preview'), {'files': [upload]})
+        self.assertEqual(resp.status_code, 200)
+        return json.loads(resp.content)
+
+    def download(self, report_id, fmt):
+        resp = self.client.get(reverse('api_error_report', args=[report_id]), {'formato': fmt})
+        self.assertEqual(resp.status_code, 200)
+        return b''.join(resp.streaming_content).decode()
+
+    def test_response_and_session_are_bounded(self):
+        data = self.upload_bad_file()
+        self.assertEqual(data['preview_count'], 2)
+        self.assertEqual(len(data['errors']), error_reports.SAMPLE_LIMIT)
+        summary = data['error_summary']
+        self.assertEqual(summary['total'], 300)
+        self.assertEqual(summary['por_tipo'], {'longitud': 300})
+        self.assertTrue(summary['truncado'])
+        self.assertEqual(self.client.session['preview_errors'], summary)
+
+    def test_full_list_downloads_as_ndjson_and_csv(self):
+        report_id = self.upload_bad_file()['error_summary']['reporte']
+        lines = self.download(report_id, 'ndjson').splitlines()
+        self.assertEqual(len(lines), 300)
+        first = json.loads(lines[0])
+        self.assertEqual((first['tipo'], first['file'], first['line']), ('longitud', 'lote.txt', 2))
+
+        rows = list(csv.DictReader(io.StringIO(self.download(report_id, 'csv'))))
+        self.assertEqual(len(rows), 300)
+        self.assertEqual(rows[-1]['line'], '301')
+
+    def test_report_is_private_and_removed_with_the_preview(self):
+        report_id = self.upload_bad_file()['error_summary']['reporte']
+        other = Client()
+        other.force_login(User.objects.create_user('otro'))
+        self.assertEqual(other.get(reverse('api_error_report', args=[report_id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api_error_report', args=['..%2Fx'])).status_code, 404)
+
+        self.client.post(reverse('api_clear_preview'))
+        self.assertFalse(error_reports.report_path(self.user.pk, report_id).exists())
+
+    def test_clean_file_has_no_report(self):
+        upload = SimpleUploadedFile('lote.txt', make_line('RFC0000000001').encode('latin-1'))
+        data = json.loads(self.client.post(reverse('api_preview'), {'files': [upload]}).content)
+        self.assertEqual(data['error_summary'], {'total': 0, 'por_tipo': {}, 'muestra': 0, 'truncado': False, 'reporte': None})
+
+    def test_report_is_written_in_blocks_to_the_configured_dir(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(FOVISSTE_ERROR_REPORT_DIR=directory):
+            report = error_reports.ErrorReport(self.user.pk)
+            report.add({'file': 'lote.txt', 'line': 1, 'error': 'Longitud 5'})
+            self.assertFalse(report.path.exists())  # sin archivo hasta el primer bloque
+            with mock.patch.object(error_reports, 'FLUSH_LINES', 7):
+                report.extend({'file': 'lote.txt', 'line': n, 'error': 'Longitud 5'} for n in range(2, 21))
+            report_id = report.summary()['reporte']
+            self.assertEqual(report.path.parent, Path(directory, str(self.user.pk)))
+            lines = self.download(report_id, 'ndjson').splitlines()
+        self.assertEqual([json.loads(line)['line'] for line in lines], list(range(1, 21)))
@@ -0,0 +1,109 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from fovisste.management.commands import ingest_dir
+from fovisste.models import IngestCheckpoint, Record
+from fovisste.parsing import ENGINE_PYTHON
+
+
+def make_line(rfc, nombre='Nombre de prueba', tipo='A'):
+    return f"{rfc[:13].ljust(13)}{nombre[:30].ljust(30)}{''.ljust(37)}{tipo}{'00001234'}{'64'}1202510{'30'}".ljust(157)
+
+
+class IngestDirTests(TransactionTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.write('202510_0001.txt', [make_line('RFC0000000001'), make_line('RFC0000000002'), 'corta'])
+        self.write('202510_0002.txt', [make_line('RFC0000000003')])
+
+    def write(self, name, lines):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='latin-1', newline='') as fh:
+            fh.write('\r\n'.join(lines) + '\r\n')
+        # Fecha en el pasado para que no se confunda con un archivo aún en copia
+        os.utime(path, (1_700_000_000, 1_700_000_000))
+        return path
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('ingest_dir', self.tmp.name, *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_loads_files_with_qna_and_lote_from_name(self):
+        self.run_command('--workers', '1')
+        self.assertEqual(Record.objects.filter(qna_ini='202510', lote_anterior='0001').count(), 2)
+        self.assertEqual(Record.objects.filter(qna_ini='202510', lote_anterior='0002').count(), 1)
+        checkpoint = IngestCheckpoint.objects.get(ruta__endswith='202510_0001.txt')
+        self.assertEqual(checkpoint.estado, IngestCheckpoint.ESTADO_OK)
+        self.assertEqual(checkpoint.registros, 2)
+        self.assertEqual(checkpoint.errores, 1)
+
+    def test_resume_skips_finished_files(self):
+        self.run_command('--workers', '2')
+        self.write('202510_0003.txt', [make_line('RFC0000000004')])
+        self.run_command('--workers', '2')
+        self.assertEqual(Record.objects.count(), 4)
+        self.assertEqual(IngestCheckpoint.objects.filter(estado=IngestCheckpoint.ESTADO_OK).count(), 3)
+
+    def test_parse_keeps_at_most_workers_files_in_flight(self):
+        for lote in range(3, 8):
+            self.write(f'202510_{lote:04d}.txt', [make_line(f'RFC{lote:010d}')])
+        submitted = []
+
+        class Pool(ThreadPoolExecutor):
+            def submit(self, fn, *args):
+                submitted.append(args[0])
+                return super().submit(fn, *args)
+
+        command = ingest_dir.Command()
+        command.options = {'workers': 2, 'engine': ENGINE_PYTHON}
+        pending = [(path, path.stat()) for path in sorted(Path(self.tmp.name).iterdir())]
+        received = 0
+        with mock.patch.object(ingest_dir, 'ProcessPoolExecutor', Pool):
+            for _path, _stat, _result, error in command.parse_all(pending):
+                self.assertIsNone(error)
+                received += 1
+                # Resultados sin consumir + archivos parseándose: nunca más que los workers
+                self.assertLessEqual(len(submitted) - received, 2)
+        self.assertEqual((received, len(submitted)), (7, 7))
+
+    def test_file_without_lote_is_recorded_as_error(self):
+        self.write('sin_datos.txt', [make_line('RFC0000000009')])
+        self.run_command('--workers', '1')
+        checkpoint = IngestCheckpoint.objects.get(ruta__endswith='sin_datos.txt')
+        self.assertEqual(checkpoint.estado, IngestCheckpoint.ESTADO_ERROR)
+        self.assertFalse(Record.objects.filter(rfc='RFC0000000009').exists())
+
+    def test_insert_error_is_checkpointed_and_run_continues(self):
+        load_records = ingest_dir.load_records
+
+        def failing(items, carga, mode):
+            if carga.lote_anterior == '0001':
+                raise RuntimeError('conexión perdida')
+            return load_records(items, carga, mode)
+        with mock.patch.object(ingest_dir, 'load_records', failing):
+            self.run_command('--workers', '1')
+        checkpoint = IngestCheckpoint.objects.get(ruta__endswith='202510_0001.txt')
+        self.assertEqual(checkpoint.estado, IngestCheckpoint.ESTADO_ERROR)
+        self.assertIn('conexión perdida', checkpoint.mensaje)
+        self.assertFalse(Record.objects.filter(lote_anterior='0001').exists())
+        self.assertEqual(Record.objects.filter(lote_anterior='0002').count(), 1)
+
+    def test_long_paths_are_checkpointed(self):
+        directory = Path(self.tmp.name, *(['subdirectorio_de_lotes'] * 12))
+        directory.mkdir(parents=True)
+        path = Path(self.write(os.path.join(directory, '202510_0003.txt'), [make_line('RFC0000000004')]))
+        self.assertGreater(len(str(path)), 255)
+        out = StringIO()
+        call_command('ingest_dir', str(directory), '--workers', '1', stdout=out, stderr=StringIO())
+        call_command('ingest_dir', str(directory), '--workers', '1', stdout=out, stderr=StringIO())
+        checkpoint = IngestCheckpoint.objects.get()
+        self.assertEqual((checkpoint.ruta, checkpoint.estado), (str(path), IngestCheckpoint.ESTADO_OK))
+        self.assertEqual(Record.objects.count(), 1)
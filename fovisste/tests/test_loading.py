@@ -0,0 +1,111 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import Client, TestCase
+from django.urls import reverse
+from fovisste import loading, preview, views
+from fovisste.models import Activity, Carga, PreviewRow, Record
+
+
+def failing_insert(records):
+    # Simula un error de BD (p. ej. valor inválido) en las filas con RFC 'MALO'
+    if any(r.rfc == 'MALO' for r in records):
+        raise DatabaseError('valor inválido')
+    Record.objects.bulk_create(records)
+
+
+class LoadRecordsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='pass')
+        self.carga = Carga.objects.create(responsable=self.user, qna_ini='202510', lote_anterior='0001')
+
+    def items(self, rfcs):
+        for line, rfc in enumerate(rfcs, start=1):
+            yield loading.record_from_data({'rfc': rfc}, self.user, '202510', '0001'), 'lote.txt', line
+
+    def test_chunked_isolates_failed_rows(self):
+        rfcs = ['RFC1', 'RFC2', 'MALO', 'RFC4', 'RFC5']
+        with mock.patch.object(loading, '_bulk_insert', failing_insert):
+            result = loading.load_records(self.items(rfcs), self.carga, Carga.MODO_POR_BLOQUES, chunk_size=2)
+        self.assertEqual(result.created, 4)
+        self.assertEqual(result.failed, [{'file': 'lote.txt', 'line': 3, 'error': 'valor inválido'}])
+        self.assertEqual(Record.objects.count(), 4)
+        self.carga.refresh_from_db()
+        self.assertEqual(self.carga.estado, Carga.INCOMPLETA)
+        self.assertEqual((self.carga.bloques_total, self.carga.bloques_ok), (3, 2))  # el bloque con 'MALO' no
+        self.assertEqual(self.carga.fallidos, 1)
+
+    def test_chunked_without_failures_is_complete(self):
+        result = loading.load_records(self.items(['RFC1', 'RFC2', 'RFC3']), self.carga, Carga.MODO_POR_BLOQUES, chunk_size=2)
+        self.assertEqual(result.created, 3)
+        self.assertEqual(self.carga.estado, Carga.COMPLETA)
+
+    def test_atomic_rolls_back_everything(self):
+        with mock.patch.object(loading, '_bulk_insert', failing_insert):
+            with self.assertRaises(DatabaseError):
+                loading.load_records(self.items(['RFC1', 'MALO']), self.carga, Carga.MODO_ATOMICO)
+        self.assertEqual(Record.objects.count(), 0)
+        self.assertEqual(self.carga.estado, Carga.FALLIDA)
+
+
+class DirectUploadPartialTests(TestCase):
+    def setUp(self):
+        self.user = user = User.objects.create_user('tester', password='pass')
+        user.user_permissions.add(Permission.objects.get(codename='add_record'))
+        self.client = Client()
+        self.client.force_login(user)
+        session = self.client.session
+        session['qna_ini'] = '202510'
+        session['lote_anterior'] = '0001'
+        session.save()
+
+    def test_chunked_failure_reports_committed_blocks(self):
+        content = '\r\n'.join(
+            f"{f'RFC{i:010d}'.ljust(13)}{'EMPLEADO'.ljust(30)}{''.ljust(37)}A{i:08d}641202510{'30'}".ljust(157)
+            for i in range(5)
+        ).encode('latin-1')
+        calls = []
+
+        def record_from_data(*args):
+            calls.append(1)
+            if len(calls) == 4:
+                raise RuntimeError('conexión perdida')
+            return loading.record_from_data(*args)
+
+        with mock.patch.object(views, 'record_from_data', record_from_data), \
+                mock.patch.object(loading, 'COMMIT_CHUNK_SIZE', 2):
+            resp = self.client.post(reverse('api_upload'), {
+                'files': [SimpleUploadedFile('lote.txt', content)], 'commit_mode': Carga.MODO_POR_BLOQUES,
+            })
+        data = json.loads(resp.content)
+        self.assertEqual(data['created'], 2)
+        self.assertEqual(Record.objects.count(), 2)
+        self.assertEqual(data['cargas'][0]['created'], 2)
+        self.assertTrue(data['cargas'][0]['partial'])
+        self.assertEqual(data['error_summary']['por_tipo'], {'insercion': 1})
+        self.assertNotIn('qna_ini', self.client.session)
+
+    def test_confirm_chunked_failure_reports_committed_blocks(self):
+        preview.store(self.user, [{'rfc': f'RFC{i:010d}', 'archivo': 'lote.txt', 'linea': i} for i in range(5)])
+        calls = []
+
+        def record_from_data(*args):
+            calls.append(1)
+            if len(calls) == 4:
+                raise RuntimeError('conexión perdida')
+            return loading.record_from_data(*args)
+
+        with mock.patch.object(views, 'record_from_data', record_from_data), \
+                mock.patch.object(loading, 'COMMIT_CHUNK_SIZE', 2):
+            resp = self.client.post(reverse('api_upload'), {'confirm': '1', 'commit_mode': Carga.MODO_POR_BLOQUES})
+        self.assertEqual(resp.status_code, 200)
+        data = json.loads(resp.content)
+        self.assertEqual((data['created'], data['carga']['created']), (2, 2))
+        self.assertTrue(data['carga']['partial'])
+        self.assertEqual(Carga.objects.get(pk=data['carga']['carga']).creados, 2)
+        self.assertEqual(data['error_summary']['por_tipo'], {'insercion': 1})
+        self.assertFalse(PreviewRow.objects.filter(user=self.user).exists())  # no se puede confirmar dos veces
+        self.assertTrue(Activity.objects.filter(user=self.user, actividad__contains='carga parcial').exists())
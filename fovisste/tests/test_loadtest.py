@@ -0,0 +1,50 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+from fovisste.management.commands.loadtest import Stats, percentile
+from fovisste.models import Record, RecordSnapshot
+
+
+class LoadtestStatsTests(SimpleTestCase):
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summary_per_endpoint(self):
+        stats = Stats()
+        for ms in (10, 20, 30, 40):
+            stats.record('consulta', ms / 1000, ok=True)
+        stats.record('confirm', 0.5, ok=False)
+        stats.stop()
+        summary = stats.summary()
+        self.assertEqual(summary['consulta']['requests'], 4)
+        self.assertAlmostEqual(summary['consulta']['p50_ms'], 20)
+        self.assertEqual(summary['confirm']['error_rate'], 1.0)
+
+    def test_requires_a_user_per_virtual_user(self):
+        with self.assertRaisesMessage(CommandError, 'etapa mayor (5)'):
+            call_command('loadtest', '--users', '3', '--stages', '1,5', stdout=StringIO())
+
+
+class SeedLoadtestTests(TestCase):
+    def test_seeds_users_and_records(self):
+        call_command('seed_loadtest', '--users', '2', '--records', '30', '--qnas', '209001,209002', stdout=StringIO())
+        user = User.objects.get(username='loadtest02')
+        self.assertTrue(user.has_perm('fovisste.add_record'))
+        self.assertEqual(Record.objects.filter(qna_ini='209001').count(), 15)
+        self.assertEqual(RecordSnapshot.objects.count(), Record.objects.order_by().values('rfc').distinct().count())
+        call_command('seed_loadtest', '--users', '0', '--records', '0', '--purge', stdout=StringIO())
+        self.assertFalse(Record.objects.exists())
+        self.assertFalse(RecordSnapshot.objects.exists())
+
+    def test_purge_restores_real_state(self):
+        real = Record.objects.create(rfc='AAAA800101AA1', qna_ini='202510', impor='00000001')
+        Record.objects.create(rfc='AAAA800101AA1', qna_ini='209001', impor='00000002')
+        call_command('rebuild_snapshot', stdout=StringIO())
+        call_command('seed_loadtest', '--users', '0', '--records', '0', '--purge', stdout=StringIO())
+        self.assertEqual(RecordSnapshot.objects.get().record_id, real.pk)
@@ -0,0 +1,143 @@
+import json
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from fovisste import locks, metrics
+from fovisste.models import Carga, Record
+from fovisste.revert import RevertError, revert_load
+
+
+class FakeCursor:
+    def __init__(self, results):
+        self.results = list(results)
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.executed.append((sql, params))
+
+    def fetchone(self):
+        return (self.results.pop(0) if self.results else None,)
+
+
+class FakeConnection:
+    def __init__(self, vendor, results=()):
+        self.vendor = vendor
+        self.cursor_obj = FakeCursor(results)
+
+    def cursor(self):
+        return self.cursor_obj
+
+
+class BackendLockTests(SimpleTestCase):
+    def test_mysql_uses_get_lock(self):
+        conn = FakeConnection('mysql', [1, 0])
+        self.assertTrue(locks.acquire(conn, 'fovisste:carga:202510:0001', 2.5))
+        self.assertFalse(locks.acquire(conn, 'fovisste:carga:202510:0001', 0))
+        locks.release(conn, 'fovisste:carga:202510:0001')
+        self.assertEqual(conn.cursor_obj.executed, [
+            ('SELECT GET_LOCK(%s, %s)', ['fovisste:carga:202510:0001', 3]),
+            ('SELECT GET_LOCK(%s, %s)', ['fovisste:carga:202510:0001', 0]),
+            ('SELECT RELEASE_LOCK(%s)', ['fovisste:carga:202510:0001']),
+        ])
+
+    def test_postgres_polls_advisory_lock_until_timeout(self):
+        key = locks.lock_key('fovisste:carga:202510:0001')
+        self.assertEqual(key, locks.lock_key('fovisste:carga:202510:0001'))
+        self.assertNotEqual(key, locks.lock_key('fovisste:carga:202510:0002'))
+        conn = FakeConnection('postgresql', [False, False, True])
+        with mock.patch.object(locks, 'POLL_SECONDS', 0):
+            self.assertTrue(locks.acquire(conn, 'fovisste:carga:202510:0001', 5))
+        self.assertEqual(conn.cursor_obj.executed, [('SELECT pg_try_advisory_lock(%s)', [key])] * 3)
+        conn = FakeConnection('postgresql', [False])
+        self.assertFalse(locks.acquire(conn, 'x', 0))
+        locks.release(conn, 'x')
+        self.assertEqual(conn.cursor_obj.executed[-1], ('SELECT pg_advisory_unlock(%s)', [locks.lock_key('x')]))
+
+
+class HeldLock:
+    """Mantiene el candado de un lote desde otro hilo (como otro nodo cargándolo)."""
+
+    def __init__(self, qna_ini, lote):
+        self.args = (qna_ini, lote)
+        self.ready = threading.Event()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.run)
+
+    def run(self):
+        with locks.load_lock(*self.args, timeout=0):
+            self.ready.set()
+            self.done.wait(5)
+
+    def __enter__(self):
+        self.thread.start()
+        self.ready.wait(5)
+        return self
+
+    def __exit__(self, *exc):
+        self.done.set()
+        self.thread.join()
+
+
+class LoadLockTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('tester')
+        self.user.user_permissions.add(*Permission.objects.filter(codename__in=['add_record', 'delete_record']))
+        self.client = Client()
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['qna_ini'] = '202510'
+        session['lote_anterior'] = '0001'
+        session.save()
+
+    def timeouts(self, operacion):
+        return dict((tuple(v for _, v in labels), value) for _, labels, value in metrics.LOCK_TIMEOUTS.samples()).get((operacion,), 0)
+
+    def test_lock_is_reentrant_and_released(self):
+        with locks.load_lock('202510', '0001'):
+            with locks.load_lock('202510', '0001', timeout=0):
+                pass
+        with HeldLock('202510', '0001'):
+            pass  # otro hilo lo pudo tomar: quedó libre
+
+    def test_busy_lote_rejects_preview_and_upload(self):
+        with HeldLock('202510', '0001'):
+            upload = SimpleUploadedFile('lote.txt', b'X' * 157)
+            resp = self.client.post(reverse('api_preview'), {'files': [upload]})
+            self.assertEqual(resp.status_code, 409)
+            self.assertIn('otro proceso', json.loads(resp.content)['error'])
+            with mock.patch.object(locks, 'LOCK_TIMEOUT', 0):
+                resp = self.client.post(reverse('api_upload'), {'confirm': '1'})
+            self.assertEqual(resp.status_code, 409)
+            # Otro lote no se bloquea
+            with locks.load_lock('202510', '0002', timeout=0):
+                pass
+        self.assertEqual(self.timeouts(locks.OP_PREVIEW), 1)
+        self.assertEqual(self.timeouts(locks.OP_CARGA), 1)
+
+    def test_upload_rechecks_under_lock_for_any_user(self):
+        # Cargado por otro usuario después de que esta sesión pasó qnaproceso
+        Record.objects.create(rfc='AAAA800101AA1', qna_ini='202510', lote_anterior='0001',
+                              responsable=User.objects.create_user('otro'))
+        resp = self.client.post(reverse('api_upload'), {'confirm': '1'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(json.loads(resp.content)['redirect'], 'qnaproceso')
+
+    def test_revert_waits_for_lock(self):
+        Carga.objects.create(qna_ini='202510', lote_anterior='0001', estado=Carga.COMPLETA)
+        with HeldLock('202510', '0001'), mock.patch.object(locks, 'LOCK_TIMEOUT', 0):
+            with self.assertRaisesMessage(RevertError, 'otro proceso'):
+                revert_load('202510', '0001')
+        self.assertEqual(revert_load('202510', '0001', pause=0).cargas, 1)
@@ -0,0 +1,114 @@
+"""Presupuestos de memoria (tracemalloc) para parseo, preview y confirmación.
+
+Cada ruta tiene un costo fijo y un costo por fila. Se mide el pico con dos tamaños
+de archivo: la pendiente entre ambos es el costo real por fila y debe quedar bajo
+el presupuesto. Si un cambio vuelve a materializar el archivo completo (listas de
+dicts, instancias de Record, el preview en sesión) la pendiente se dispara y la
+prueba falla en CI en lugar de tumbar un worker a media carga.
+"""
+import io
+import tracemalloc
+from unittest import mock
+
+from django.contrib.auth.models import User, Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client
+from django.urls import reverse
+from fovisste import loading, preview
+from fovisste.models import Record
+from fovisste.parsing import iter_records
+
+SMALL, LARGE = 1_000, 5_000
+
+# Bytes por fila (pendiente) y costo fijo (importaciones, plantillas, caches de Django)
+PARSE_PEAK_BUDGET = 64 * 1024  # el parseo es streaming: no depende del tamaño del archivo
+PREVIEW_BYTES_PER_ROW = 1_500  # cuerpo de la petición y llaves RFC + cpto para duplicados
+CONFIRM_BYTES_PER_ROW = 600
+FIXED_BUDGET = 6 * 1024 * 1024
+# Lote adaptativo y bloque de lectura del preview bajo SMALL: en ambos tamaños llegan a su
+# tope, así su memoria es costo fijo y no se confunde con costo por fila
+BATCH_INITIAL, BATCH_MAX = 50, 200
+READ_CHUNK = 500
+
+
+def make_content(rows):
+    lines = (
+        f"{f'RFC{i:010d}'.ljust(13)}{f'EMPLEADO {i}'.ljust(30)}{''.ljust(37)}A{i % 10**8:08d}641202510{'30'}"
+        .ljust(157)
+        for i in range(rows)
+    )
+    return '\r\n'.join(lines).encode('latin-1')
+
+
+def peak_of(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class MemoryBudgetTests(TestCase):
+    def setUp(self):
+        # El lote adaptativo sigue activo; su memoria está acotada por FOVISSTE_BULK_BATCH_MAX
+        self.batches = []
+        timed_insert = loading._timed_insert
+
+        def record_batch(records, sizer):
+            self.batches.append(len(records))
+            timed_insert(records, sizer)
+        for patcher in (
+            mock.patch.object(loading, 'BULK_BATCH_SIZE', BATCH_INITIAL),
+            mock.patch.object(loading, 'BULK_BATCH_MAX', BATCH_MAX),
+            mock.patch.dict(loading._learned_sizes, clear=True),
+            mock.patch.object(loading, '_timed_insert', record_batch),
+            mock.patch.object(preview, 'ITER_CHUNK', READ_CHUNK),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('tester', password='pass')
+        self.user.user_permissions.add(Permission.objects.get(codename='add_record'))
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.contents = {rows: make_content(rows) for rows in (SMALL, LARGE)}
+
+    def start_session(self, lote):
+        session = self.client.session
+        session['qna_ini'] = '202510'
+        session['lote_anterior'] = lote
+        session.save()
+
+    def preview(self, rows):
+        f = SimpleUploadedFile('lote.txt', self.contents[rows])
+        resp = self.client.post(reverse('api_preview'), {'files': [f]})
+        self.assertEqual(resp.json()['preview_count'], rows)
+
+    def confirm(self, rows):
+        resp = self.client.post(reverse('api_upload'), {'confirm': '1'})
+        self.assertEqual(resp.json()['created'], rows)
+
+    def assert_budget(self, peaks, per_row, label):
+        slope = (peaks[LARGE] - peaks[SMALL]) / (LARGE - SMALL)
+        self.assertLessEqual(slope, per_row, f'{label}: {slope:.0f} bytes por fila (presupuesto {per_row})')
+        for rows, peak in peaks.items():
+            self.assertLessEqual(peak, FIXED_BUDGET + per_row * rows,
+                                 f'{label}: pico de {peak} bytes con {rows} filas')
+
+    def test_parse_peak_does_not_grow_with_file(self):
+        for rows, content in self.contents.items():
+            peak = peak_of(lambda: sum(1 for _ in iter_records(io.BytesIO(content), 'lote.txt')))
+            self.assertLessEqual(peak, PARSE_PEAK_BUDGET, f'parseo: pico de {peak} bytes con {rows} filas')
+
+    def test_preview_and_confirm_per_row_budget(self):
+        preview_peaks, confirm_peaks = {}, {}
+        for n, rows in enumerate((SMALL, LARGE), start=1):
+            self.start_session(f'{n:04d}')
+            preview_peaks[rows] = peak_of(lambda: self.preview(rows))
+            confirm_peaks[rows] = peak_of(lambda: self.confirm(rows))
+        self.assert_budget(preview_peaks, PREVIEW_BYTES_PER_ROW, 'preview')
+        self.assert_budget(confirm_peaks, CONFIRM_BYTES_PER_ROW, 'confirmación')
+        self.assertEqual(Record.objects.count(), SMALL + LARGE)
+        # El tamaño del lote cambió durante la carga, sin pasar del tope
+        self.assertGreater(len(set(self.batches)), 1)
+        self.assertLessEqual(max(self.batches), BATCH_MAX)
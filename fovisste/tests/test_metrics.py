@@ -0,0 +1,80 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from fovisste import metrics
+from fovisste.metrics import Counter, DBGauge, Histogram, Registry
+from fovisste.models import Carga, Record
+
+
+class RegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.registry = Registry()
+
+    def test_counter_and_histogram_text_format(self):
+        rows = Counter('test_rows_total', 'Filas', ['qna_ini'], registry=self.registry)
+        seconds = Histogram('test_seconds', 'Duración', buckets=(0.1, 1), registry=self.registry)
+        rows.inc(5, qna_ini='202510')
+        rows.inc(2, qna_ini='202510')
+        seconds.observe(0.05)
+        seconds.observe(3)
+        text = self.registry.render()
+        self.assertIn('# TYPE test_rows_total counter', text)
+        self.assertIn('test_rows_total{qna_ini="202510"} 7', text)
+        self.assertIn('test_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{le="1"} 1', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn('test_seconds_count 2', text)
+        self.assertIn('test_seconds_sum 3.05', text)
+
+    def test_labels_must_match(self):
+        rows = Counter('test_labels_total', 'Filas', ['qna_ini'], registry=self.registry)
+        with self.assertRaises(ValueError):
+            rows.inc(1, lote='0001')
+
+    def test_series_index_survives_other_processes(self):
+        rows = Counter('test_procs_total', 'Filas', ['qna_ini'], registry=self.registry)
+        # Otro proceso (su propio ``_known``) estrena etiquetas después de que éste leyó el índice
+        other = Counter('test_procs_total', 'Filas', ['qna_ini'], registry=Registry())
+        rows.inc(1, qna_ini='202510')
+        other.inc(1, qna_ini='202511')
+        other.inc(1, qna_ini='202510')
+        rows.inc(1, qna_ini='202512')
+        fresh = Counter('test_procs_total', 'Filas', ['qna_ini'], registry=Registry())
+        self.assertEqual(fresh.series(), [('202510',), ('202511',), ('202512',)])
+        self.assertEqual(cache.get('fovisste:metrics:test_procs_total:series:n'), 3)
+
+    def test_records_gauge_comes_from_cargas(self):
+        Carga.objects.create(qna_ini='202510', creados=10, estado=Carga.COMPLETA)
+        Carga.objects.create(qna_ini='202510', creados=5, estado=Carga.INCOMPLETA)
+        Carga.objects.create(qna_ini='202511', creados=7, estado=Carga.REVERTIDA)
+        with self.assertNumQueries(1):
+            rows = metrics._records_per_qna()
+        self.assertEqual(rows, [(('202510',), 15)])
+
+    def test_db_gauge_is_cached(self):
+        Record.objects.create(rfc='A', qna_ini='202510')
+        gauge = DBGauge('test_records', 'Registros', ['qna_ini'],
+                        lambda: [((qna,), Record.objects.filter(qna_ini=qna).count()) for qna in ['202510']],
+                        registry=self.registry)
+        self.assertIn('test_records{qna_ini="202510"} 1', self.registry.render())
+        Record.objects.create(rfc='B', qna_ini='202510')
+        with self.assertNumQueries(0):
+            self.assertIn('test_records{qna_ini="202510"} 1', self.registry.render())
+
+
+class MetricsViewTests(TestCase):
+    def test_staff_only(self):
+        client = Client()
+        client.force_login(User.objects.create_user('tester', password='pass'))
+        self.assertEqual(client.get(reverse('metrics')).status_code, 403)
+        client.force_login(User.objects.create_user('admin', password='pass', is_staff=True))
+        resp = client.get(reverse('metrics'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b'# TYPE fovisste_rows_inserted_total counter', resp.content)
+
+    @override_settings(FOVISSTE_METRICS_TOKEN='secreto')
+    def test_bearer_token(self):
+        resp = Client().get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(resp.status_code, 200)
@@ -0,0 +1,54 @@
+import io
+
+from django.test import SimpleTestCase
+
+from fovisste.parsing import iter_records, parse_raw_line
+
+
+def make_raw(nombre=b'PEREZ GOMEZ JUAN', observacio=b'SIN OBSERVACION'):
+    return (b'PEGJ800101AB1' + nombre.ljust(30) + b' ' * 37 + b'A' + b'00012345' + b'64' + b'1' + b'202510'
+            + b'30' + observacio.ljust(47) + b'0001' + b'202510')
+
+
+class RawLineParseTests(SimpleTestCase):
+    def test_ascii_line(self):
+        length, data = parse_raw_line(make_raw())
+        self.assertEqual(length, 157)
+        self.assertEqual((data['rfc'], data['nombre'], data['impor'], data['cpto'], data['ptje']),
+                         ('PEGJ800101AB1', 'PEREZ GOMEZ JUAN', '00012345', '64', '30'))
+
+    def test_latin1_fields_are_cut_by_bytes(self):
+        raw = make_raw('MUÑOZ PEÑA'.encode('latin-1'), 'OBSERVACIÓN'.encode('latin-1'))
+        length, data = parse_raw_line(raw)
+        self.assertEqual(length, 157)
+        self.assertEqual((data['nombre'], data['observacio']), ('MUÑOZ PEÑA', 'OBSERVACIÓN'))
+        self.assertEqual((data['tipo'], data['impor'], data['qna']), ('A', '00012345', '202510'))
+
+    def test_each_text_field_falls_back_on_its_own(self):
+        # nombre en UTF-8 y observacio en latin-1: la línea completa no es UTF-8 válido
+        raw = make_raw('MUÑOZ'.encode('utf-8'), 'ACLARACIÓN'.encode('latin-1'))
+        _, data = parse_raw_line(raw)
+        self.assertEqual((data['nombre'], data['observacio']), ('MUÑOZ', 'ACLARACIÓN'))
+        self.assertEqual(data['cpto'], '64')
+
+    def test_utf8_multibyte_line_counts_characters(self):
+        line = make_raw().decode('ascii').replace('PEREZ GOMEZ JUAN', 'MUÑOZ PEÑA      ')
+        length, data = parse_raw_line(line.encode('utf-8'))
+        self.assertEqual(length, 157)
+        self.assertEqual((data['nombre'], data['impor'], data['ptje']), ('MUÑOZ PEÑA', '00012345', '30'))
+
+    def test_short_lines(self):
+        self.assertEqual(parse_raw_line(b'CORTA'), (5, None))
+        self.assertEqual(parse_raw_line('Ñ'.encode('latin-1') * 50), (50, None))
+        _, data = parse_raw_line(make_raw()[:94])
+        self.assertEqual(data['observacio'], '')
+
+    def test_iter_records_mixed_encodings(self):
+        content = b'\xef\xbb\xbf' + b'\r\n'.join([
+            make_raw('MUÑOZ'.encode('latin-1')), b'   ', 'MUÑOZ'.encode('utf-8').ljust(100), make_raw(),
+        ]) + b'\r\n'
+        rows = list(iter_records(io.BytesIO(content), 'lote.txt'))
+        self.assertEqual([idx for idx, _, _ in rows], [1, 2, 3])
+        self.assertEqual(rows[0][1]['nombre'], 'MUÑOZ')
+        self.assertEqual(rows[1][1]['rfc'], 'MUÑOZ')  # 99 caracteres en 100 bytes
+        self.assertEqual(rows[2][1]['rfc'], 'PEGJ800101AB1')
@@ -2,8 +2,12 @@ from django.test import TestCase, Client
 from django.contrib.auth.models import User, Permission
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
-from fovisste.models import Record
+from fovisste import preview
+from fovisste.models import PreviewRow, Record
+import gzip
+import io
 import json
+import zipfile
 
 class PreviewFlowTests(TestCase):
     def setUp(self):
@@ -43,10 +47,30 @@ class PreviewFlowTests(TestCase):
         data = json.loads(resp.content)
         self.assertTrue(data.get('ok'))
         self.assertEqual(data.get('preview_count'), 2)
-        # session debe contener preview_records
-        session = self.client.session
-        self.assertIn('preview_records', session)
-        self.assertEqual(len(session['preview_records']), 2)
+        # las filas del preview quedan en BD
+        self.assertEqual(PreviewRow.objects.filter(user=self.user).count(), 2)
+
+    def test_preview_with_gzip_multi_member(self):
+        part1 = gzip.compress((self.make_fixed_width_line(rfc='RFC0000000001') + "\n").encode('utf-8'))
+        part2 = gzip.compress((self.make_fixed_width_line(rfc='RFC0000000002') + "\n").encode('utf-8'))
+        # El nombre no importa: el formato se detecta por bytes mágicos
+        f = SimpleUploadedFile('lote.dat', part1 + part2)
+        resp = self.client.post(reverse('api_preview'), {'files': [f]})
+        data = json.loads(resp.content)
+        self.assertEqual(data.get('preview_count'), 2)
+        rfcs = list(PreviewRow.objects.filter(user=self.user).values_list('rfc', flat=True))
+        self.assertEqual(rfcs, ['RFC0000000001', 'RFC0000000002'])
+
+    def test_preview_with_zip_members(self):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('a.txt', self.make_fixed_width_line(rfc='RFC0000000001') + "\r\n")
+            zf.writestr('b.txt', self.make_fixed_width_line(rfc='RFC0000000002') + "\r\ncorta\r\n")
+        f = SimpleUploadedFile('lotes.zip', buf.getvalue())
+        resp = self.client.post(reverse('api_preview'), {'files': [f]})
+        data = json.loads(resp.content)
+        self.assertEqual(data.get('preview_count'), 2)
+        self.assertEqual(data['errors'][0]['file'], 'lotes.zip:b.txt')
 
     def test_preview_with_empty_file(self):
         f = SimpleUploadedFile('empty.txt', b'\n\n')
@@ -55,26 +79,21 @@ class PreviewFlowTests(TestCase):
         data = json.loads(resp.content)
         self.assertTrue(data.get('ok'))
         self.assertEqual(data.get('preview_count'), 0)
-        # session no debe contener preview_records
-        session = self.client.session
-        self.assertNotIn('preview_records', session)
+        # no deben quedar filas de preview
+        self.assertFalse(PreviewRow.objects.filter(user=self.user).exists())
 
     def test_clear_preview_endpoint(self):
-        # Primero crear preview en sesión manualmente
-        session = self.client.session
-        session['preview_records'] = [{'rfc':'X'}]
-        session.save()
+        # Primero crear preview manualmente
+        preview.store(self.user, [{'rfc':'X'}])
         resp = self.client.post(reverse('api_clear_preview'))
         self.assertEqual(resp.status_code, 200)
         data = json.loads(resp.content)
         self.assertTrue(data.get('ok'))
-        session = self.client.session
-        self.assertNotIn('preview_records', session)
+        self.assertFalse(PreviewRow.objects.filter(user=self.user).exists())
 
     def test_confirm_creates_records(self):
-        # Preparar preview en sesión
-        session = self.client.session
-        session['preview_records'] = [
+        # Preparar preview
+        preview.store(self.user, [
             {
                 'rfc':'RFC0000000001',
                 'nombre':'User One',
@@ -89,15 +108,28 @@ class PreviewFlowTests(TestCase):
                 'lote_anterior':'0001',
                 'qna_ini':'202510'
             }
-        ]
-        session.save()
+        ])
         resp = self.client.post(reverse('api_upload'), {'confirm': '1'})
         self.assertEqual(resp.status_code, 200)
         data = json.loads(resp.content)
         self.assertTrue(data.get('ok'))
         # Comprobar que se creó el registro en BD
         self.assertEqual(Record.objects.filter(rfc='RFC0000000001').count(), 1)
-        # Session debe haber sido limpiada del preview
-        session = self.client.session
-        self.assertNotIn('preview_records', session)
-*** End Patch
\ No newline at end of file
+        # El preview debe haber sido limpiado
+        self.assertFalse(PreviewRow.objects.filter(user=self.user).exists())
+
+    def test_preview_flags_duplicates(self):
+        Record.objects.create(rfc='RFC0000000003', qna_ini='202510', lote_anterior='0009')
+        Record.objects.create(rfc='RFC0000000004', qna_ini='202509', lote_anterior='0009')  # otra quincena
+        content = "\n".join([
+            self.make_fixed_width_line(rfc='RFC0000000001'),
+            self.make_fixed_width_line(rfc='RFC0000000001'),
+            self.make_fixed_width_line(rfc='RFC0000000003'),
+            self.make_fixed_width_line(rfc='RFC0000000004'),
+        ])
+        f = SimpleUploadedFile('dup.txt', content.encode('utf-8'))
+        resp = self.client.post(reverse('api_preview'), {'files': [f]})
+        data = json.loads(resp.content)
+        self.assertEqual(data['duplicates'], {'archivo': 1, 'bd': 1})
+        flags = list(PreviewRow.objects.filter(user=self.user).values_list('duplicado', flat=True))
+        self.assertEqual(flags, ['', 'archivo', 'bd', ''])
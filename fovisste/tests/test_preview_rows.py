@@ -0,0 +1,106 @@
+import json
+
+from django.contrib.auth.models import User, Permission
+from django.test import TestCase, Client
+from django.urls import reverse
+from fovisste import preview
+from fovisste.models import PreviewRow, Record
+
+
+def row(rfc, **overrides):
+    data = {'rfc': rfc, 'nombre': 'Nombre', 'tipo': 'A', 'impor': '00001234', 'cpto': '01',
+            'lote_actual': '1', 'qna': '202510', 'ptje': '', 'lote_anterior': '0001', 'qna_ini': '202510'}
+    data.update(overrides)
+    return data
+
+
+class PreviewRowEditTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='pass')
+        self.user.user_permissions.add(Permission.objects.get(codename='add_record'))
+        self.client = Client()
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['qna_ini'] = '202510'
+        session['lote_anterior'] = '0001'
+        session['preview_validation'] = {'rows': 3, 'invalid': 1, 'rules': [{
+            'rule': 'tipo_valido', 'field': 'tipo', 'message': 'Tipo debe ser A, B o M', 'count': 1,
+            'samples': [{'value': 'X', 'file': 'lote.txt', 'line': 2}],
+        }]}
+        session['preview_duplicates'] = {'archivo': 0, 'bd': 0}
+        session.save()
+        preview.store(self.user, [
+            row('MOTW670508F27', archivo='lote.txt', linea=1),
+            row('ABC850101AB1', tipo='X', archivo='lote.txt', linea=2, invalido=['tipo_valido']),
+            row('XYZ900101AA1', archivo='lote.txt', linea=3),
+        ])
+
+    def patch(self, index, fields):
+        return self.client.patch(reverse('api_preview_row', args=[index]), json.dumps(fields),
+                                 content_type='application/json')
+
+    def test_patch_revalidates_row_and_adjusts_summary(self):
+        resp = self.patch(1, {'tipo': 'B'})
+        self.assertEqual(resp.status_code, 200)
+        data = json.loads(resp.content)
+        self.assertTrue(data['row']['editado'])
+        self.assertEqual(data['row']['invalido'], [])
+        self.assertEqual(data['validation']['invalid'], 0)
+        self.assertEqual(data['validation']['rules'], [])
+        stored = PreviewRow.objects.get(user=self.user, indice=1)
+        self.assertEqual(stored.datos['tipo'], 'B')
+        self.assertEqual(stored.original['tipo'], 'X')
+        # Las demás filas no se tocan
+        self.assertFalse(PreviewRow.objects.filter(user=self.user, editado=True).exclude(indice=1).exists())
+
+    def test_patch_flags_new_failure_and_duplicate(self):
+        data = json.loads(self.patch(2, {'rfc': 'MOTW670508F27', 'qna': '202599'}).content)
+        self.assertEqual(data['row']['invalido'], ['qna_formato'])
+        self.assertEqual(data['row']['duplicado'], 'archivo')
+        self.assertEqual(data['duplicates'], {'archivo': 1, 'bd': 0})
+        self.assertEqual(data['validation']['invalid'], 2)
+
+    def test_patch_rejects_unknown_fields(self):
+        resp = self.patch(0, {'qna_ini': '202501'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(self.patch(99, {'tipo': 'A'}).status_code, 404)
+
+    def test_delete_and_restore(self):
+        self.patch(1, {'tipo': 'B'})
+        resp = self.client.delete(reverse('api_preview_row', args=[1]))
+        self.assertEqual(json.loads(resp.content)['validation']['rows'], 2)
+        resp = self.client.post(reverse('api_preview_row_restore', args=[1]))
+        data = json.loads(resp.content)
+        self.assertEqual(data['row']['tipo'], 'X')
+        self.assertFalse(data['row']['editado'])
+        self.assertFalse(data['row']['borrado'])
+        self.assertEqual(data['validation']['rows'], 3)
+        self.assertEqual(data['validation']['invalid'], 1)
+
+    def flags(self):
+        return list(PreviewRow.objects.filter(user=self.user).order_by('indice').values_list('duplicado', flat=True))
+
+    def test_other_rows_are_reflagged_when_first_occurrence_changes(self):
+        self.patch(2, {'rfc': 'MOTW670508F27'})  # la fila 2 repite a la 0
+        self.assertEqual(self.flags(), ['', '', 'archivo'])
+        # Borrar la primera aparición: la fila 2 deja de ser duplicada
+        data = json.loads(self.client.delete(reverse('api_preview_row', args=[0])).content)
+        self.assertEqual(data['duplicates'], {'archivo': 0, 'bd': 0})
+        self.assertEqual(self.flags()[2], '')
+        # Al restaurarla, la fila 2 vuelve a ser duplicada
+        data = json.loads(self.client.post(reverse('api_preview_row_restore', args=[0])).content)
+        self.assertEqual(data['duplicates'], {'archivo': 1, 'bd': 0})
+        self.assertEqual(self.flags(), ['', '', 'archivo'])
+        # Cambiar el cpto de la fila 0: la 2 queda como primera aparición de su llave
+        data = json.loads(self.patch(0, {'cpto': '02'}).content)
+        self.assertEqual(data['duplicates'], {'archivo': 0, 'bd': 0})
+        self.assertEqual(self.flags(), ['', '', ''])
+
+    def test_confirm_uses_edits_and_skips_deleted_rows(self):
+        self.patch(1, {'tipo': 'B'})
+        self.client.delete(reverse('api_preview_row', args=[2]))
+        resp = self.client.post(reverse('api_upload'), {'confirm': '1'})
+        self.assertEqual(json.loads(resp.content)['created'], 2)
+        self.assertEqual(Record.objects.get(rfc='ABC850101AB1').tipo, 'B')
+        self.assertFalse(Record.objects.filter(rfc='XYZ900101AA1').exists())
+        self.assertFalse(PreviewRow.objects.exists())
@@ -0,0 +1,66 @@
+from django.test import TestCase, Client, AsyncClient, override_settings
+from django.contrib.auth.models import User, Permission
+from django.core.cache import cache
+from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from fovisste.checks import progress_cache_check
+from fovisste.progress import ProgressTracker, get_progress
+import json
+
+
+class ProgressTests(TestCase):
+    upload_id = 'abc123def456'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('tester', password='pass')
+        perm = Permission.objects.get(codename='add_record')
+        self.user.user_permissions.add(perm)
+        self.client = Client()
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['qna_ini'] = '202510'
+        session['lote_anterior'] = '0001'
+        session.save()
+
+    def test_tracker_without_id_is_noop(self):
+        tracker = ProgressTracker(None)
+        tracker.finish(lines=5)
+        self.assertFalse(tracker.enabled)
+        tracker = ProgressTracker('../etc')  # id inválido
+        self.assertFalse(tracker.enabled)
+
+    def test_database_cache_is_rejected(self):
+        self.assertEqual(progress_cache_check(None), [])
+        db_cache = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}
+        with override_settings(CACHES=db_cache):
+            self.assertEqual([e.id for e in progress_cache_check(None)], ['fovisste.E001'])
+
+    def test_preview_publishes_final_progress(self):
+        line = 'RFC0000000001' + 'User One'.ljust(30) + ' ' * 37 + 'A' + ' ' * 11 + '1202510'
+        content = (line.ljust(157) + '\n' + 'corta\n').encode('utf-8')
+        f = SimpleUploadedFile('test.txt', content)
+        resp = self.client.post(reverse('api_preview'), {'files': [f], 'upload_id': self.upload_id})
+        self.assertEqual(resp.status_code, 200)
+        state = get_progress(self.upload_id)
+        self.assertEqual(state['stage'], 'done')
+        self.assertEqual(state['lines'], 2)
+        self.assertEqual(state['errors'], 1)
+        self.assertEqual(state['file'], 'test.txt')
+
+    async def test_stream_sends_final_event(self):
+        ProgressTracker(self.upload_id, self.user.pk).finish(lines=10, created=10)
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        resp = await client.get(reverse('api_progress', args=[self.upload_id]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in resp.streaming_content]).decode()
+        data = json.loads(body.split('event: progress\ndata: ')[1].split('\n\n')[0])
+        self.assertEqual(data['stage'], 'done')
+        self.assertEqual(data['created'], 10)
+        self.assertNotIn('user_id', data)
+
+    async def test_stream_requires_login(self):
+        resp = await AsyncClient().get(reverse('api_progress', args=[self.upload_id]))
+        self.assertEqual(resp.status_code, 401)
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+import shutil
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from fovisste import reconcile
+from fovisste.models import Record
+
+
+def add(qna_ini, rfc, cpto='01', impor='00001000', ptje='10'):
+    return Record.objects.create(qna_ini=qna_ini, rfc=rfc, nombre=f'NOMBRE {rfc}', cpto=cpto, impor=impor, ptje=ptje)
+
+
+class ReconcileTests(TestCase):
+    def setUp(self):
+        # Los reportes en caché llevan la firma de la quincena (conteo y último id), que se repite entre pruebas
+        self.addCleanup(shutil.rmtree, reconcile.report_dir(), True)
+        self.user = User.objects.create_user('analista', password='pass')
+        self.user.user_permissions.add(Permission.objects.get(codename='view_record'))
+        self.client = Client()
+        self.client.force_login(self.user)
+
+        for qna in ('202509', '202510'):
+            add(qna, 'AAAA800101AA1')  # sin cambios
+            add(qna, 'CCCC800101CC3', cpto='01')
+            add(qna, 'CCCC800101CC3', cpto='02', impor='00002000' if qna == '202509' else '00002500')
+        add('202509', 'BBBB800101BB2')  # baja
+        add('202510', 'DDDD800101DD4')  # alta
+        add('202509', 'EEEE800101EE5', cpto='03')
+        add('202510', 'EEEE800101EE5', cpto='04', ptje='20')  # cambio de concepto y puntaje
+        add('202508', 'ZZZZ800101ZZ9')  # otra quincena: no cuenta
+
+    def get(self, **params):
+        return self.client.get(reverse('conciliacion'), params)
+
+    def rows(self, response):
+        body = b''.join(response.streaming_content).decode()
+        return list(csv.DictReader(io.StringIO(body)))
+
+    def test_merge_categorizes_by_rfc(self):
+        # Bloques de 2 registros: la paginación por (rfc, pk) debe cortar dentro de un mismo RFC
+        with mock.patch.object(reconcile, 'FETCH_SIZE', 2):
+            resp = self.get(anterior='202509', actual='202510')
+            self.assertEqual(resp.status_code, 200)
+            rows = self.rows(resp)
+        found = sorted((r['categoria'], r['rfc'], r['campos']) for r in rows)
+        self.assertEqual(found, [
+            ('alta', 'DDDD800101DD4', ''),
+            ('baja', 'BBBB800101BB2', ''),
+            ('cambio', 'CCCC800101CC3', 'impor'),
+            ('cambio', 'EEEE800101EE5', 'cpto|ptje'),
+        ])
+        cambio = next(r for r in rows if r['rfc'] == 'CCCC800101CC3')
+        self.assertEqual((cambio['impor_anterior'], cambio['impor_actual']), ('00002000', '00002500'))
+
+    def test_enye_is_not_merged_with_n(self):
+        # En MySQL la collation por omisión ordena 'Ñ' igual que 'N'
+        for qna in ('202509', '202510'):
+            add(qna, 'ÑAVA800101AA1')
+        add('202509', 'NAVA800101AA1')
+        with mock.patch.object(reconcile, 'FETCH_SIZE', 1):
+            rows = self.rows(self.get(anterior='202509', actual='202510'))
+        self.assertIn(('baja', 'NAVA800101AA1'), [(r['categoria'], r['rfc']) for r in rows])
+        self.assertNotIn('ÑAVA800101AA1', [r['rfc'] for r in rows])
+
+    def test_report_is_cached_until_a_quincena_changes(self):
+        first = self.rows(self.get(anterior='202509', actual='202510'))
+        cached = self.get(anterior='202509', actual='202510')
+        self.assertIn('attachment', cached['Content-Disposition'])
+        self.assertEqual(json.loads(cached['X-Conciliacion']), {'alta': 1, 'baja': 1, 'cambio': 2, 'sin_cambio': 2})
+        self.assertEqual(self.rows(cached), first)
+
+        add('202510', 'FFFF800101FF6')
+        self.assertIsNone(reconcile.cached_report('202509', '202510'))
+        again = self.rows(self.get(anterior='202509', actual='202510'))
+        self.assertIn('FFFF800101FF6', [r['rfc'] for r in again])
+
+    def test_disconnect_leaves_no_partial_report(self):
+        with mock.patch.object(reconcile, 'FLUSH_ROWS', 1):
+            stream = reconcile.stream_report('202509', '202510')
+            next(stream)
+            stream.close()
+        self.assertEqual(list(reconcile.report_dir().iterdir()), [])
+
+    def test_invalid_params(self):
+        self.assertEqual(self.get(anterior='2025', actual='202510').status_code, 400)
+        self.assertEqual(self.get(anterior='202510', actual='202510').status_code, 400)
@@ -0,0 +1,68 @@
+import io
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from fovisste import revert
+from fovisste.models import Activity, Carga, IngestCheckpoint, Record
+
+
+class RevertLoadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        # Dos lotes intercalados: los rangos de id de uno contienen filas del otro
+        for i in range(10):
+            Record.objects.create(rfc=f'RFC{i:010d}', qna_ini='202510', lote_anterior='0001')
+            Record.objects.create(rfc=f'OTR{i:010d}', qna_ini='202510', lote_anterior='0002')
+        self.carga = Carga.objects.create(qna_ini='202510', lote_anterior='0001', creados=10, estado=Carga.COMPLETA)
+        IngestCheckpoint.objects.create(ruta='/datos/202510_0001.txt', qna_ini='202510', lote_anterior='0001',
+                                        estado=IngestCheckpoint.ESTADO_OK, registros=10)
+
+    def test_deletes_only_the_load_in_chunks(self):
+        progress = []
+        result = revert.revert_load('202510', '0001', user=self.user, chunk_size=3, pause=0, on_chunk=progress.append)
+        self.assertEqual((result.deleted, result.chunks, result.cargas), (10, 4, 1))
+        self.assertEqual(progress, [3, 6, 9, 10])
+        self.assertFalse(Record.objects.filter(lote_anterior='0001').exists())
+        self.assertEqual(Record.objects.filter(lote_anterior='0002').count(), 10)
+
+        self.carga.refresh_from_db()
+        self.assertEqual(self.carga.estado, Carga.REVERTIDA)
+        self.assertEqual(self.carga.revertidos, 10)
+        self.assertIsNotNone(self.carga.revertido_en)
+        self.assertFalse(IngestCheckpoint.objects.exists())
+        self.assertTrue(Activity.objects.filter(user=self.user, segmento='reversion').exists())
+
+    def test_abandoned_load_in_progress_does_not_block(self):
+        # Con el candado del lote tomado, una carga 'en proceso' es de un proceso que murió
+        stale = Carga.objects.create(qna_ini='202510', lote_anterior='0001', estado=Carga.EN_PROCESO)
+        with self.assertLogs('fovisste.revert', 'WARNING'):
+            result = revert.revert_load('202510', '0001', pause=0)
+        self.assertEqual((result.deleted, result.cargas), (10, 2))
+        stale.refresh_from_db()
+        self.assertEqual(stale.estado, Carga.REVERTIDA)
+        self.assertIsNotNone(stale.terminado_en)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('revert_load', qna_ini='202510', lote='0001', dry_run=True, stdout=out)
+        self.assertIn('10 registros', out.getvalue())
+        self.assertEqual(Record.objects.count(), 20)
+
+        call_command('revert_load', carga=self.carga.pk, user='admin', chunk_size=4, pause=0,
+                     interactive=False, stdout=io.StringIO())
+        self.assertEqual(Record.objects.count(), 10)
+        with self.assertRaises(CommandError):
+            call_command('revert_load', qna_ini='2025', lote='0001', interactive=False, stdout=io.StringIO())
+
+    def test_admin_action(self):
+        client = Client()
+        client.force_login(self.user)
+        resp = client.post(reverse('admin:fovisste_carga_changelist'), {
+            'action': 'revertir_cargas', '_selected_action': [self.carga.pk],
+        }, follow=True)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(Record.objects.filter(lote_anterior='0001').count(), 0)
+        self.assertContains(resp, '10 registros borrados')
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.test import Client, TestCase, modify_settings
+from django.urls import reverse
+
+from fovisste import routers
+from fovisste.models import Record, RecordSnapshot
+
+
+class ReplicaRoutingTests(TestCase):
+    """Sin segunda BD en tests, el alias de réplica se apunta a ``default`` y se
+    revisa a dónde decide el router mandar cada lectura."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('analista', password='pass')
+        self.user.user_permissions.add(*Permission.objects.filter(codename__in=['view_record', 'add_record']))
+        self.client = Client()
+        self.client.force_login(self.user)
+        Record.objects.create(rfc='AAAA800101AA1', qna_ini='202510', responsable=self.user)
+
+        patcher = mock.patch.object(routers, 'REPLICA_ALIAS', 'default')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.reads = []
+        original = routers.ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = original(router, model, **hints)
+            if model in (Record, RecordSnapshot):
+                self.reads.append(alias)
+            return alias
+        patcher = mock.patch.object(routers.ReplicaRouter, 'db_for_read', spy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, name, params=None):
+        """GET completo: consulta y resultados leen sus filas mientras se envía la respuesta."""
+        resp = self.client.get(reverse(name), params or {})
+        b''.join(resp.streaming_content)
+        return resp
+
+    def test_read_views_use_replica(self):
+        self.get('consulta', {'q': 'AAAA'})
+        self.assertTrue(self.reads)
+        self.assertEqual(set(self.reads), {'default'})  # 'default' = alias de réplica parchado
+
+    def test_streamed_report_reads_from_replica(self):
+        resp = self.client.get(reverse('conciliacion'), {'anterior': '202509', 'actual': '202510'})
+        self.reads.clear()
+        b''.join(resp.streaming_content)
+        self.assertTrue(self.reads)
+        self.assertEqual(set(self.reads), {'default'})
+
+    def test_other_reads_stay_on_primary(self):
+        self.client.get(reverse('carga'))
+        list(Record.objects.all())
+        self.assertNotIn('default', self.reads)
+
+    @modify_settings(MIDDLEWARE={'append': 'fovisste.routers.PinPrimaryMiddleware'})
+    def test_write_pins_session_to_primary(self):
+        self.client.post(reverse('qnaproceso'), {'qna_proceso': '202511', 'lote': '0001'})
+        self.get('resultados')
+        self.assertTrue(self.reads)
+        self.assertNotIn('default', self.reads)
+
+    def test_without_replica_router_is_noop(self):
+        with mock.patch.object(routers, 'REPLICA_ALIAS', 'replica'):
+            self.get('resultados')
+            self.assertFalse(routers.ReplicaRouter().allow_migrate('replica', 'fovisste'))
+        self.assertEqual(set(self.reads), {None})
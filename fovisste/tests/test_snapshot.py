@@ -0,0 +1,180 @@
+import io
+from contextlib import contextmanager
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from fovisste import loading, locks, revert, snapshot
+from fovisste.models import Carga, Record, RecordSnapshot
+
+RFC = 'AAAA800101AA1'
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('analista')
+
+    def load(self, qna_ini, lote, rows, mode=Carga.MODO_ATOMICO):
+        carga = Carga.objects.create(responsable=self.user, qna_ini=qna_ini, lote_anterior=lote)
+        items = (
+            (loading.record_from_data({'rfc': rfc, 'impor': impor}, self.user, qna_ini, lote), 'lote.txt', line)
+            for line, (rfc, impor) in enumerate(rows, start=1)
+        )
+        with self.captureOnCommitCallbacks(execute=True):  # el snapshot se actualiza al confirmar
+            return loading.load_records(items, carga, mode, chunk_size=2)
+
+    def run_before_first_write(self, other):
+        """Ejecuta ``other()`` justo antes de que el primer escritor tome el candado del snapshot."""
+        original = locks.snapshot_lock
+        pending = [other]
+
+        @contextmanager
+        def lock(*args, **kwargs):
+            if pending:
+                pending.pop()()
+            with original(*args, **kwargs):
+                yield
+        return mock.patch.object(locks, 'snapshot_lock', lock)
+
+    def current(self, rfc):
+        return RecordSnapshot.objects.values_list('qna_ini', 'lote_anterior', 'impor').get(rfc=rfc)
+
+    def test_load_updates_latest_quincena_only(self):
+        self.load('202510', '0001', [(RFC, '00000100'), ('BBBB800101AA1', '00000200')])
+        self.load('202512', '0001', [(RFC, '00000300')], mode=Carga.MODO_POR_BLOQUES)
+        # Una quincena anterior cargada después no reemplaza al estado actual
+        self.load('202511', '0001', [(RFC, '00000999'), ('BBBB800101AA1', '00000400')])
+        self.assertEqual(self.current(RFC), ('202512', '0001', '00000300'))
+        self.assertEqual(self.current('BBBB800101AA1'), ('202511', '0001', '00000400'))
+        self.assertEqual(RecordSnapshot.objects.count(), 2)
+
+    def test_apply_since_is_chunked_and_idempotent(self):
+        Record.objects.bulk_create(
+            [Record(rfc=f'RFC{i:010d}', qna_ini='202510', impor=f'{i:08d}') for i in range(7)]
+            + [Record(rfc='RFC0000000001', qna_ini='202510', impor='00000042')]
+        )
+        self.assertEqual(snapshot.apply_since(0, chunk_size=3), 8)  # el RFC repetido llega en otro bloque
+        self.assertEqual(snapshot.apply_since(0, chunk_size=3), 0)
+        self.assertEqual(self.current('RFC0000000001'), ('202510', '', '00000042'))  # mayor id dentro de la quincena
+
+    def test_interleaved_apply_keeps_newest(self):
+        old, new = Record.objects.bulk_create([
+            Record(rfc=RFC, qna_ini='202510', impor='00000001'),
+            Record(rfc=RFC, qna_ini='202511', impor='00000002'),
+        ])
+        # La carga de 202511 termina mientras la de 202510 ya leyó sus registros
+        with self.run_before_first_write(lambda: snapshot.apply_since(new.pk - 1)):
+            self.assertEqual(snapshot.apply_since(old.pk - 1, chunk_size=1), 0)  # nada nuevo que escribir
+        self.assertEqual(self.current(RFC), ('202511', '', '00000002'))
+
+    def test_rebuild_keeps_load_applied_meanwhile(self):
+        Record.objects.create(rfc=RFC, qna_ini='202510', impor='00000001')
+
+        def load():
+            newer = Record.objects.create(rfc=RFC, qna_ini='202511', impor='00000002')
+            snapshot.apply_since(newer.pk - 1)
+        with self.run_before_first_write(load):
+            snapshot.rebuild()
+        self.assertEqual(self.current(RFC), ('202511', '', '00000002'))
+
+    def test_ingest_transaction_rolled_back_leaves_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    carga = Carga.objects.create(qna_ini='202510', lote_anterior='0001')
+                    loading.load_records([(Record(rfc=RFC, qna_ini='202510'), 'lote.txt', 1)], carga)
+                    raise RuntimeError('checkpoint')
+            except RuntimeError:
+                pass
+        self.assertFalse(RecordSnapshot.objects.exists())
+
+    def test_migration_builds_snapshot(self):
+        Record.objects.bulk_create([
+            Record(rfc=RFC, qna_ini='202511', impor='00000002'),
+            Record(rfc=RFC, qna_ini='202510', impor='00000001'),
+            Record(rfc='BBBB800101AA1', qna_ini='202509'),
+        ])
+        migration = import_module('fovisste.migrations.0013_build_recordsnapshot')
+        migration.build_snapshot(apps, SimpleNamespace(connection=connection))
+        self.assertEqual(self.current(RFC), ('202511', '', '00000002'))
+        self.assertEqual(RecordSnapshot.objects.count(), 2)
+
+    def test_enye_and_n_are_distinct_rfcs(self):
+        Record.objects.bulk_create([
+            Record(rfc='ÑAVA800101AA1', qna_ini='202510', impor='00000001'),
+            Record(rfc='NAVA800101AA1', qna_ini='202510', impor='00000002'),
+            Record(rfc='ÑAVA800101AA1', qna_ini='202511', impor='00000003'),
+        ])
+        snapshot.rebuild(chunk_size=1)
+        self.assertEqual(self.current('NAVA800101AA1'), ('202510', '', '00000002'))
+        self.assertEqual(self.current('ÑAVA800101AA1'), ('202511', '', '00000003'))
+
+    def test_revert_restores_previous_state(self):
+        self.load('202510', '0001', [(RFC, '00000100')])
+        self.load('202511', '0001', [(RFC, '00000200'), ('SOLO800101AA1', '00000300')])
+        revert.revert_load('202511', '0001', pause=0)
+        self.assertEqual(self.current(RFC), ('202510', '0001', '00000100'))
+        self.assertFalse(RecordSnapshot.objects.filter(rfc='SOLO800101AA1').exists())
+
+    def test_rebuild_command(self):
+        Record.objects.bulk_create([
+            Record(rfc=RFC, qna_ini='202511', impor='00000002'),
+            Record(rfc=RFC, qna_ini='202510', impor='00000001'),
+            Record(rfc='BBBB800101AA1', qna_ini='202509'),
+            Record(rfc='', qna_ini='202510'),
+        ])
+        RecordSnapshot.objects.create(rfc='BORRADO800101', record_id=0)
+        out = io.StringIO()
+        call_command('rebuild_snapshot', chunk_size=1, stdout=out)
+        self.assertIn('2 RFC, 1 eliminados', out.getvalue())
+        self.assertEqual(self.current(RFC), ('202511', '', '00000002'))
+        self.assertEqual(list(RecordSnapshot.objects.values_list('rfc', flat=True)), ['AAAA800101AA1', 'BBBB800101AA1'])
+
+
+class ConsultaSnapshotTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('analista')
+        user.user_permissions.add(Permission.objects.get(codename='view_record'))
+        self.client = Client()
+        self.client.force_login(user)
+        Record.objects.bulk_create([
+            Record(rfc=RFC, qna_ini=qna, responsable=user) for qna in ('202509', '202510', '202511')
+        ] + [Record(rfc='AAAA800102AA1', qna_ini='202511', responsable=user)])
+        snapshot.rebuild()
+
+    def page(self, params):
+        resp = self.client.get(reverse('consulta'), params)
+        return b''.join(resp.streaming_content).decode()
+
+    def test_disabled_snapshot_uses_history(self):
+        with mock.patch.object(snapshot, 'ENABLED', False):
+            page = self.page({'q': 'AAAA80'})
+        self.assertIn('Total de registros: <strong>4</strong>', page)
+
+    def test_default_shows_current_state(self):
+        page = self.page({'q': 'AAAA80'})
+        self.assertIn('Total de registros: <strong>2</strong>', page)
+        self.assertIn('(quincena más reciente por RFC)', page)
+
+    def test_history_shows_every_quincena(self):
+        page = self.page({'q': 'AAAA80', 'historial': '1'})
+        self.assertIn('Total de registros: <strong>4</strong>', page)
+        self.assertIn('name="historial" value="1" checked', page)
+
+    def test_full_rfc_is_an_exact_lookup(self):
+        with CaptureQueriesContext(connection) as queries:
+            page = self.page({'q': RFC.lower()})
+        self.assertIn('Total de registros: <strong>1</strong>', page)
+        self.assertIn('<td>202511</td>', page)
+        sql = [q['sql'] for q in queries if 'fovisste_recordsnapshot' in q['sql']]
+        self.assertTrue(sql)
+        self.assertFalse(any('LIKE' in s for s in sql))
+        self.assertFalse(any('FROM "fovisste_record"' in q['sql'] for q in queries))  # sin tocar el historial
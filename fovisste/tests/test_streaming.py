@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from fovisste import metrics, snapshot, streaming
+from fovisste.models import Record
+
+
+class StreamedPagesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('analista')
+        self.user.user_permissions.add(Permission.objects.get(codename='view_record'))
+        self.client = Client()
+        self.client.force_login(self.user)
+        Record.objects.bulk_create([
+            Record(rfc=f'AAAA8001{i:02d}AA1', nombre=f'NOMBRE {i}', qna_ini='202510', lote_anterior='0001',
+                   responsable=self.user)
+            for i in range(25)
+        ])
+        snapshot.rebuild()
+
+    def chunks(self, name, params=None, chunk_size=10):
+        with mock.patch.object(streaming, 'CHUNK_SIZE', chunk_size):
+            resp = self.client.get(reverse(name), params or {})
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['Content-Type'], 'text/html; charset=utf-8')
+        return [c.decode() for c in resp.streaming_content]
+
+    def test_consulta_sends_header_first_then_row_blocks(self):
+        with CaptureQueriesContext(connection) as queries:
+            chunks = self.chunks('consulta', {'q': 'AAAA'})
+        head, tail = chunks[0], chunks[-1]
+        self.assertNotIn('<td>', head)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries))  # el total se cuenta al enviar
+        self.assertIn('Total de registros: <strong>25</strong>', tail)
+        self.assertEqual([c.count('<tr>') for c in chunks[1:-1]], [10, 10, 5])
+        self.assertIn('</table>', tail)
+        page = ''.join(chunks)
+        self.assertLess(page.index('AAAA800101AA1'), page.index('AAAA800124AA1'))  # orden del snapshot
+        self.assertIn('AAAA800124AA1', page)
+        self.assertIn('<td>analista</td>', page)  # responsable sin una consulta por fila
+        self.assertLess(len(queries), 15)
+
+    def test_history_is_paged_by_key_newest_first(self):
+        with CaptureQueriesContext(connection) as queries:
+            chunks = self.chunks('consulta', {'q': 'AAAA', 'historial': '1'})
+        self.assertEqual([c.count('<tr>') for c in chunks[1:-1]], [10, 10, 5])
+        page = ''.join(chunks)
+        self.assertLess(page.index('AAAA800124AA1'), page.index('AAAA800101AA1'))
+        self.assertIn('Total de registros: <strong>25</strong>', chunks[-1])
+        pages = [q['sql'] for q in queries if 'FROM "fovisste_record"' in q['sql'] and 'LIMIT 10' in q['sql']]
+        self.assertEqual(len(pages), 3)  # un bloque por consulta, no un cursor con todo el resultado
+
+    def test_search_duration_covers_streamed_rows(self):
+        with mock.patch.object(metrics.SEARCH_SECONDS, 'observe') as observe:
+            resp = self.client.get(reverse('consulta'), {'q': 'AAAA'})
+            observe.assert_not_called()  # las filas aún no se consultan
+            b''.join(resp.streaming_content)
+        observe.assert_called_once()
+
+    def test_consulta_without_results(self):
+        page = ''.join(self.chunks('consulta', {'q': 'ZZZZ'}))
+        self.assertIn('Sin resultados', page)
+        page = ''.join(self.chunks('consulta'))
+        self.assertIn('Total de registros: <strong>0</strong>', page)
+
+    def test_resultados_streams_only_user_records(self):
+        Record.objects.create(rfc='OTRO800101AA1', responsable=User.objects.create_user('otro'))
+        chunks = self.chunks('resultados', chunk_size=20)
+        self.assertEqual([c.count('<tr>') for c in chunks[1:-1]], [20, 5])
+        self.assertNotIn('OTRO800101AA1', ''.join(chunks))
+        Record.objects.all().delete()
+        self.assertIn('No se encontraron registros recientes.', ''.join(self.chunks('resultados')))
@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template import engines
+from django.test import RequestFactory, TestCase, override_settings
+from fovisste.timing import ServerTimingMiddleware
+
+TIMED_TEMPLATES = [{
+    'NAME': 'django',
+    'BACKEND': 'fovisste.timing.TimedDjangoTemplates',
+    'DIRS': [],
+    'APP_DIRS': False,
+}]
+
+
+def view(request):
+    list(User.objects.all())
+    User.objects.count()
+    return HttpResponse(engines['django'].from_string('{{ n }}').render({'n': 1}))
+
+
+def streaming_view(request):
+    def content():
+        yield 'head'
+        yield str(User.objects.count())  # consulta hecha después de que la vista regresa
+    return StreamingHttpResponse(content())
+
+
+@override_settings(TEMPLATES=TIMED_TEMPLATES)
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/foviste/consulta/')
+
+    def test_header_reports_queries_and_phases(self):
+        response = ServerTimingMiddleware(view)(self.request)
+        header = response['Server-Timing']
+        self.assertIn('db;desc="2 queries"', header)
+        self.assertIn('tpl;dur=', header)
+        self.assertIn('total;dur=', header)
+
+    @override_settings(FOVISSTE_TIMING_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_untouched(self):
+        response = ServerTimingMiddleware(view)(self.request)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(FOVISSTE_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_sql(self):
+        with self.assertLogs('fovisste.timing', 'WARNING') as logs:
+            ServerTimingMiddleware(view)(self.request)
+        self.assertIn('/foviste/consulta/', logs.output[0])
+        self.assertIn('auth_user', logs.output[0])
+
+    @override_settings(FOVISSTE_SLOW_REQUEST_MS=0)
+    def test_streaming_body_is_measured_when_it_finishes(self):
+        with self.assertNoLogs('fovisste.timing', 'WARNING'):
+            response = ServerTimingMiddleware(streaming_view)(self.request)
+        self.assertIn('total;desc="hasta las cabeceras"', response['Server-Timing'])
+        with self.assertLogs('fovisste.timing', 'WARNING') as logs:
+            b''.join(response.streaming_content)
+        self.assertIn('1 consultas', logs.output[0])
+        self.assertIn('auth_user', logs.output[0])
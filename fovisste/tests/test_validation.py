@@ -0,0 +1,39 @@
+from django.test import SimpleTestCase
+from fovisste.validation import Validator, default_validator
+
+
+def row(**overrides):
+    base = {'rfc': 'MOTW670508F27', 'qna': '202510', 'tipo': 'A', 'impor': '00001234', 'ptje': '30'}
+    base.update(overrides)
+    return base
+
+
+class ValidationTests(SimpleTestCase):
+    def test_valid_rows_have_no_failures(self):
+        report = default_validator.validate_batch([row(), row(rfc='ABC850101AB1', impor='', ptje='')])
+        self.assertEqual(report.rows, 2)
+        self.assertEqual(report.invalid, 0)
+        self.assertEqual(report.as_dict()['rules'], [])
+
+    def test_counts_and_samples_per_rule(self):
+        rows = [row(rfc='RFC0000000001'), row(tipo='X'), row(qna='202500'), row(impor='12A4'), row(tipo='')]
+        positions = [('lote.txt', i) for i in range(1, 6)]
+        report = default_validator.validate_batch(rows, positions)
+        self.assertEqual(report.counts['rfc_formato'], 1)
+        self.assertEqual(report.counts['tipo_valido'], 2)
+        self.assertEqual(report.counts['qna_formato'], 1)
+        self.assertEqual(report.counts['impor_numerico'], 1)
+        self.assertEqual(report.counts['ptje_numerico'], 0)
+        self.assertEqual(report.samples['tipo_valido'], [
+            {'value': 'X', 'file': 'lote.txt', 'line': 2},
+            {'value': '', 'file': 'lote.txt', 'line': 5},
+        ])
+
+    def test_samples_are_capped_across_batches(self):
+        validation = Validator(sample_limit=3).batches(batch_size=4)
+        for i in range(10):
+            validation.add(row(tipo='Z'), 'lote.txt', i + 1)
+        report = validation.finish()
+        self.assertEqual(report.rows, 10)
+        self.assertEqual(report.counts['tipo_valido'], 10)
+        self.assertEqual([s['line'] for s in report.samples['tipo_valido']], [1, 2, 3])
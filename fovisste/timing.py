@@ -0,0 +1,173 @@
+"""Instrumentación por petición: número de consultas, tiempo en BD, tiempo de
+render de plantillas y tiempo total, expuestos en la cabecera ``Server-Timing``.
+
+Se activa con ``FOVISSTE_SERVER_TIMING`` (ver settings). Sólo se mide una
+fracción de las peticiones (``FOVISSTE_TIMING_SAMPLE_RATE``); las demás pasan sin
+costo adicional. Las peticiones que tardan más de ``FOVISSTE_SLOW_REQUEST_MS`` se
+registran en el logger ``fovisste.timing`` junto con sus consultas más lentas.
+
+El tiempo de plantillas sólo se mide si ``TEMPLATES`` usa ``TimedDjangoTemplates``.
+
+En respuestas en streaming (consulta, resultados) las filas se consultan y
+renderizan mientras se envía el cuerpo, después de las cabeceras: ``Server-Timing``
+sólo cubre lo previo (``total`` = hasta las cabeceras) y el log de peticiones lentas
+se escribe al terminar el stream, con todas sus consultas y plantillas.
+"""
+import contextvars
+import heapq
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('fovisste.timing')
+
+SLOWEST_QUERIES = 3  # consultas que se incluyen en el log de peticiones lentas
+SQL_LOG_LENGTH = 500
+
+_current = contextvars.ContextVar('fovisste_request_timing', default=None)
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self._slowest = []  # heap de (duración, sql)
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += elapsed
+            item = (elapsed, sql)
+            if len(self._slowest) < SLOWEST_QUERIES:
+                heapq.heappush(self._slowest, item)
+            elif elapsed > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    @property
+    def slowest(self):
+        return sorted(self._slowest, reverse=True)
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self, total, streaming=False) -> str:
+        parts = [
+            f'db;desc="{self.queries} queries";dur={self.db_time * 1000:.1f}',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;desc="hasta las cabeceras";dur={total * 1000:.1f}' if streaming else f'total;dur={total * 1000:.1f}',
+        ]
+        return ', '.join(parts)
+
+    @contextmanager
+    def measuring(self):
+        """Mide las consultas (todas las conexiones) y plantillas del bloque."""
+        token = _current.set(self)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(self.execute_wrapper))
+                yield
+        finally:
+            _current.reset(token)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Backend de plantillas de Django que suma el tiempo de render a la petición medida."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'FOVISSTE_TIMING_SAMPLE_RATE', 1.0)
+        self.slow_ms = getattr(settings, 'FOVISSTE_SLOW_REQUEST_MS', 1000)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        timing = RequestTiming()
+        with timing.measuring():
+            response = self.get_response(request)
+        if getattr(response, 'streaming', False) and not getattr(response, 'is_async', False):
+            response['Server-Timing'] = timing.header(timing.total(), streaming=True)
+            response.streaming_content = self._timed_stream(request, response.streaming_content, timing)
+            return response
+        self.report(request, response, timing)
+        return response
+
+    def _timed_stream(self, request, iterator, timing):
+        # El cuerpo se genera después de que la vista regresa: cada bloque se mide aparte
+        iterator = iter(iterator)
+        while True:
+            with timing.measuring():
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+            yield chunk
+        self.log_slow(request, timing, timing.total())
+
+    async def __acall__(self, request):
+        # Vistas async (p. ej. el stream SSE de progreso): las consultas corren en otros
+        # hilos vía sync_to_async, así que sólo se mide el tiempo total.
+        if not self.sampled():
+            return await self.get_response(request)
+        timing = RequestTiming()
+        response = await self.get_response(request)
+        self.report(request, response, timing)
+        return response
+
+    def report(self, request, response, timing):
+        total = timing.total()
+        response['Server-Timing'] = timing.header(total)
+        self.log_slow(request, timing, total)
+
+    def log_slow(self, request, timing, total):
+        if total * 1000 >= self.slow_ms:
+            slowest = '; '.join(f'{dur * 1000:.1f}ms {sql[:SQL_LOG_LENGTH]}' for dur, sql in timing.slowest)
+            logger.warning(
+                'Petición lenta %s %s: %.1fms total, %d consultas (%.1fms BD), %.1fms plantillas. Más lentas: %s',
+                request.method, request.path, total * 1000, timing.queries, timing.db_time * 1000,
+                timing.template_time * 1000, slowest or '-',
+            )
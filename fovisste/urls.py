@@ -30,10 +30,22 @@ urlpatterns = [
     path('foviste/consulta/', views.consulta_view, name='consulta'),
     path('foviste/qnaproceso/', views.qnaproceso_view, name='qnaproceso'),
     path('foviste/resultados/', views.resultados_view, name='resultados'),
+    path('foviste/conciliacion/', views.conciliacion_view, name='conciliacion'),
 
     # API
     path('api/preview/', views.preview_upload_view, name='api_preview'),
+    path('api/preview/rows/<int:index>/', views.preview_row_view, name='api_preview_row'),
+    path('api/preview/rows/<int:index>/restore/', views.preview_row_restore_view, name='api_preview_row_restore'),
     path('api/update_lote/', views.update_lote_view, name='api_update_lote'),
     path('api/clear_preview/', views.clear_preview_view, name='api_clear_preview'),
     path('api/upload/', views.api_upload_view, name='api_upload'),
+    path('api/errores/<str:report_id>/', views.error_report_view, name='api_error_report'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('api/progress/<str:upload_id>/', views.progress_stream_view, name='api_progress'),
+
+    # Subida por partes: start -> chunk N (PUT) -> finish (genera el preview)
+    path('api/chunked/start/', views.chunked_start_view, name='api_chunked_start'),
+    path('api/chunked/finish/', views.chunked_finish_view, name='api_chunked_finish'),
+    path('api/chunked/<uuid:chunked_id>/', views.chunked_status_view, name='api_chunked_status'),
+    path('api/chunked/<uuid:chunked_id>/chunk/<int:index>/', views.chunked_put_view, name='api_chunked_put'),
 ]
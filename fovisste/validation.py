@@ -0,0 +1,198 @@
+"""Validación por lotes de los campos parseados.
+
+Las reglas se compilan una sola vez (regex / conjuntos) y se aplican columna por
+columna sobre lotes de filas, en lugar de construir un dict de error por línea.
+El resultado es un ``ValidationReport`` con conteos por regla y una muestra
+acotada de líneas para cada una. La validación sólo informa: no impide la carga.
+"""
+import re
+
+SAMPLE_LIMIT = 20  # líneas de ejemplo que se guardan por regla
+BATCH_SIZE = 1000
+MARK_KEY = 'invalido'  # con mark=True, cada fila inválida recibe la lista de reglas que no cumple
+
+TIPOS_VALIDOS = frozenset({'A', 'B', 'M'})
+# Persona física (4 letras) o moral (3 letras) + fecha AAMMDD + homoclave
+RFC_RE = r'[A-ZÑ&]{3,4}\d{2}(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])[A-Z\d]{3}'
+# Quincena AAAAQQ con QQ entre 01 y 24
+QNA_RE = r'(19|20)\d{2}(0[1-9]|1\d|2[0-4])'
+NUMERIC_RE = r'\d+'
+
+
+class Rule:
+    """Regla sobre un campo. ``check`` recibe el valor y devuelve algo verdadero si es válido.
+
+    Con ``required=False`` un valor vacío se considera válido.
+    """
+
+    def __init__(self, name, field, check, message, required=True):
+        self.name = name
+        self.field = field
+        self.check = check
+        self.message = message
+        self.required = required
+
+    @classmethod
+    def regex(cls, name, field, pattern, message, required=True):
+        return cls(name, field, re.compile(pattern).fullmatch, message, required)
+
+    @classmethod
+    def choices(cls, name, field, values, message, required=True):
+        return cls(name, field, frozenset(values).__contains__, message, required)
+
+    def accepts(self, value) -> bool:
+        return not (value or self.required) or bool(self.check(value))
+
+    def failures(self, values):
+        """Índices de ``values`` que no cumplen la regla.
+
+        Se evalúa cada valor distinto una sola vez: tipo, qna o importes se repiten
+        mucho dentro de un lote, así que la mayoría de las reglas cuestan un ``set()``.
+        """
+        check = self.check
+        bad = {value for value in set(values) if (value or self.required) and not check(value)}
+        if not bad:
+            return []
+        return [i for i, value in enumerate(values) if value in bad]
+
+
+DEFAULT_RULES = (
+    Rule.regex('rfc_formato', 'rfc', RFC_RE, 'RFC con formato inválido'),
+    Rule.regex('qna_formato', 'qna', QNA_RE, 'QNA debe ser AAAAQQ (quincena 01-24)'),
+    Rule.choices('tipo_valido', 'tipo', TIPOS_VALIDOS, 'Tipo debe ser A, B o M'),
+    Rule.regex('impor_numerico', 'impor', NUMERIC_RE, 'Importe no numérico', required=False),
+    Rule.regex('ptje_numerico', 'ptje', NUMERIC_RE, 'Puntaje no numérico', required=False),
+)
+
+
+class ValidationReport:
+    def __init__(self, rules, sample_limit=SAMPLE_LIMIT):
+        self.rules = {rule.name: rule for rule in rules}
+        self.sample_limit = sample_limit
+        self.rows = 0
+        self.counts = {name: 0 for name in self.rules}
+        self.samples = {name: [] for name in self.rules}
+
+    @property
+    def invalid(self) -> int:
+        return sum(self.counts.values())
+
+    def as_dict(self) -> dict:
+        return {
+            'rows': self.rows,
+            'invalid': self.invalid,
+            'rules': [
+                {
+                    'rule': name,
+                    'field': rule.field,
+                    'message': rule.message,
+                    'count': self.counts[name],
+                    'samples': self.samples[name],
+                }
+                for name, rule in self.rules.items() if self.counts[name]
+            ],
+        }
+
+
+class Validator:
+    def __init__(self, rules=DEFAULT_RULES, sample_limit=SAMPLE_LIMIT):
+        self.rules = tuple(rules)
+        self.sample_limit = sample_limit
+
+    def new_report(self) -> ValidationReport:
+        return ValidationReport(self.rules, self.sample_limit)
+
+    def validate_batch(self, rows, positions=None, report=None, mark=False) -> ValidationReport:
+        """Valida una lista de dicts. ``positions`` (opcional) es una lista paralela de
+        ``(archivo, linea)`` que se usa en las muestras. Con ``mark`` se agregan los
+        nombres de regla a ``row[MARK_KEY]`` de cada fila que falla."""
+        report = report or self.new_report()
+        report.rows += len(rows)
+        for rule in self.rules:
+            field = rule.field
+            values = [row.get(field) or '' for row in rows]
+            bad = rule.failures(values)
+            if not bad:
+                continue
+            report.counts[rule.name] += len(bad)
+            if mark:
+                for i in bad:
+                    rows[i].setdefault(MARK_KEY, []).append(rule.name)
+            samples = report.samples[rule.name]
+            for i in bad[:max(0, self.sample_limit - len(samples))]:
+                sample = {'value': values[i]}
+                if positions is not None:
+                    sample['file'], sample['line'] = positions[i]
+                samples.append(sample)
+        return report
+
+    def batches(self, batch_size=BATCH_SIZE, mark=False):
+        return BatchValidation(self, batch_size, mark)
+
+    def row_failures(self, row) -> list:
+        """Reglas que no cumple una sola fila (p. ej. al editarla en el preview)."""
+        return [rule.name for rule in self.rules if not rule.accepts(row.get(rule.field) or '')]
+
+    def adjust_summary(self, summary, before, after, position=None, rows_delta=0):
+        """Actualiza un ``ValidationReport.as_dict()`` ya guardado cuando una fila pasa de
+        fallar ``before`` a fallar ``after``, sin volver a validar todo el lote.
+
+        Las muestras de reglas que la fila ya cumple se quitan si eran de esa fila.
+        """
+        if summary is None:
+            return None
+        rules = {rule.name: rule for rule in self.rules}
+        entries = {entry['rule']: entry for entry in summary['rules']}
+        for name in set(before) - set(after):
+            entry = entries.get(name)
+            if entry is None:
+                continue
+            entry['count'] -= 1
+            if position is not None:
+                entry['samples'] = [
+                    s for s in entry['samples'] if (s.get('file'), s.get('line')) != tuple(position)
+                ]
+            summary['invalid'] -= 1
+        for name in set(after) - set(before):
+            entry = entries.get(name)
+            if entry is None:
+                rule = rules[name]
+                entry = entries[name] = {
+                    'rule': name, 'field': rule.field, 'message': rule.message, 'count': 0, 'samples': [],
+                }
+            entry['count'] += 1
+            summary['invalid'] += 1
+        summary['rows'] += rows_delta
+        summary['rules'] = [entry for entry in entries.values() if entry['count'] > 0]
+        return summary
+
+
+class BatchValidation:
+    """Acumula filas conforme se parsean y las valida en lotes de ``batch_size``."""
+
+    def __init__(self, validator, batch_size=BATCH_SIZE, mark=False):
+        self.validator = validator
+        self.batch_size = batch_size
+        self.mark = mark
+        self.report = validator.new_report()
+        self._rows = []
+        self._positions = []
+
+    def add(self, row, file='', line=None):
+        self._rows.append(row)
+        self._positions.append((file, line))
+        if len(self._rows) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self.validator.validate_batch(self._rows, self._positions, self.report, self.mark)
+            self._rows = []
+            self._positions = []
+
+    def finish(self) -> ValidationReport:
+        self._flush()
+        return self.report
+
+
+default_validator = Validator()
@@ -1,6 +1,12 @@
+import asyncio
 import io
+import json
+import logging
 import re
 import os
+import time
+
+from asgiref.sync import sync_to_async
 
 from django.conf import settings
 from django.http import FileResponse, Http404
@@ -9,36 +15,39 @@ from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.models import Group, Permission, User
+from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.db.models import Q
-from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
 from .forms import SignUpForm
-from .models import Record, Activity
-
+from . import chunked, error_reports, locks, metrics, preview, reconcile, snapshot
+from .admission import TIPO_CARGA, TIPO_PREVIEW, limit_concurrency
+from .routers import read_replica
+from .streaming import stream_rows
+from .loading import COMMIT_MODE, COMMIT_MODES, load_records, record_from_data
+from .models import Carga, ChunkedUpload, PreviewRow, Record, RecordSnapshot, Activity
+from .parsing import iter_records, open_upload
+from .parsing import normalize_short_line  # noqa: F401 (se usa como views.normalize_short_line)
+from .duplicates import DUP_ARCHIVO, DUP_BD, DuplicateMarker
+from .validation import RFC_RE, default_validator
+from .progress import (
+    FINAL_STAGES, STAGE_INSERTING, STAGE_PARSING, ProgressTracker, aget_progress, valid_upload_id,
+)
+
+logger = logging.getLogger(__name__)
+
+# Parámetros del stream SSE de progreso (segundos)
+PROGRESS_POLL_INTERVAL = 0.5
+PROGRESS_HEARTBEAT = 15
+PROGRESS_WAIT_START = 120  # tiempo máximo esperando a que la carga publique su primer estado
+PROGRESS_MAX_STREAM = 60 * 30
+
+# Una búsqueda que es un RFC completo se resuelve con el índice único de RecordSnapshot
+RFC_COMPLETO_RE = re.compile(RFC_RE)
 
-def normalize_short_line(line: str, required_min_len: int, required_line_len: int) -> str:
-    """Normalize a short fixed-width line into the target length.
-
-    Si required_min_len >= 94 y required_line_len >= 157, mueva los caracteres que originalmente 
-    se encuentran en los índices 92 y 93 a los índices de destino 155 y 156 respectivamente, y deje 
-    la región central como espacios. De lo contrario, rellene la línea a la derecha hasta alcanzar la longitud de destino.
-    """
-    if len(line) >= required_line_len: # Lo suficiente largo
-        return line
-    if required_min_len >= 94 and required_line_len >= 157: # Regla especial de 94 a 157
-        buf = list(' ' * required_line_len)
-        upto = min(len(line), 92)
-        for i in range(upto):
-            buf[i] = line[i]
-        if len(line) > 92:
-            buf[98] = line[92]
-        if len(line) > 93:
-            buf[99] = line[93]
-        return ''.join(buf)
-    return line.ljust(required_line_len)
 
 # Helpers de roles
 UPLOADER_GROUP = 'uploader'
@@ -52,6 +61,13 @@ def has_existing_load(user, qna_ini, lote_anterior):
         lote_anterior=lote_anterior
     ).exists()
 
+def lote_cargado(qna_ini, lote_anterior):
+    """Verifica si el lote ya tiene registros para la quincena (de cualquier usuario)"""
+    return Record.objects.filter(lote_anterior=lote_anterior, qna_ini=qna_ini).exists()
+
+def lock_busy_response(error): # Otro proceso tiene el candado de la quincena/lote
+    return JsonResponse({'ok': False, 'error': str(error)}, status=409)
+
 def ensure_roles(): # Crear roles si no existen
     Group.objects.get_or_create(name=UPLOADER_GROUP)
     Group.objects.get_or_create(name=VIEWER_GROUP)
@@ -59,6 +75,17 @@ def ensure_roles(): # Crear roles si no existen
 def add_activity(user, segmento, actividad): # Agregar actividad
     Activity.objects.create(user=user, segmento=segmento, actividad=actividad)
 
+# Llaves de sesión con los resúmenes del preview (las filas están en PreviewRow)
+PREVIEW_SESSION_KEYS = ('preview_errors', 'preview_validation', 'preview_duplicates')
+
+def clear_preview_session(request): # Quitar el preview de la sesión, sus filas y su reporte de errores
+    previous = request.session.get('preview_errors')
+    if isinstance(previous, dict) and previous.get('reporte'):
+        error_reports.remove(request.user.pk, previous['reporte'])
+    for key in PREVIEW_SESSION_KEYS:
+        request.session.pop(key, None)
+    preview.clear(request.user)
+
 
 def devtools_probe(request):
     """Sirve un JSON dummy para solicitudes de Chrome DevTools a /.well-known/... en desarrollo."""
@@ -108,49 +135,47 @@ def carga_view(request: HttpRequest) -> HttpResponse:
         messages.warning(request, 'Ya existe una carga para esta combinación. Reinicia el proceso en la página de Quincena Proceso.')
         return redirect('qnaproceso')
 
-    # Obtener datos de sesión para preview si existen
-    preview_records = request.session.get('preview_records')
-    # Normalizar: asegurarse de que sea una lista
-    if not isinstance(preview_records, list):
-        preview_records = []
-
-    # Sólo calcular conteos si hay registros en preview
-    if preview_records:
-        tipo_a_count = sum(1 for r in preview_records if (r.get('tipo') if isinstance(r, dict) else None) == 'A')
-        tipo_b_count = sum(1 for r in preview_records if (r.get('tipo') if isinstance(r, dict) else None) == 'B')
-        tipo_m_count = sum(1 for r in preview_records if (r.get('tipo') if isinstance(r, dict) else None) == 'M')
-        total_count = len(preview_records)
-    else:
-        tipo_a_count = 0
-        tipo_b_count = 0
-        tipo_m_count = 0
-        total_count = 0
+    # Filas del preview (incluye las borradas, para poder restaurarlas) y conteos por tipo
+    preview_records = [
+        preview.as_dict(row) for row in preview.rows_for(request.user).iterator(chunk_size=preview.ITER_CHUNK)
+    ]
+    counts = preview.counts(request.user) if preview_records else {}
 
     context = {
         'qna_ini': qna_ini,
         'lote_anterior': lote_anterior,
         'preview_records': preview_records,
-        'tipo_a_count': tipo_a_count,
-        'tipo_b_count': tipo_b_count,
-        'tipo_m_count': tipo_m_count,
-        'total_count': total_count,
+        'tipo_a_count': counts.get('tipo_a', 0),
+        'tipo_b_count': counts.get('tipo_b', 0),
+        'tipo_m_count': counts.get('tipo_m', 0),
+        'total_count': counts.get('total', 0),
+        'chunk_size': chunked.CHUNK_SIZE,
+        'validation': request.session.get('preview_validation') if preview_records else None,
+        'duplicates': request.session.get('preview_duplicates') if preview_records else None,
     }
-    # Depuración: mostrar primer registro de preview (si existe) para verificar valores antes de render
     if preview_records:
-        try:
-            print(f"DEBUG carga_view: preview_records[0] = {preview_records[0]!r}")
-        except Exception as e:
-            print(f"DEBUG carga_view: error imprimiendo preview_records[0]: {e}")
+        logger.debug('carga_view: primer registro del preview %r', preview_records[0])
     return render(request, 'carga.html', context)
 
 @login_required # Consulta de archivos
 @permission_required('fovisste.view_record', raise_exception=True)
+@read_replica
 def consulta_view(request: HttpRequest) -> HttpResponse:
+    """Búsqueda sobre ``RecordSnapshot`` (estado actual, una fila por RFC); con
+    ``historial=1`` (o con ``FOVISSTE_SNAPSHOT`` desactivado, porque entonces el
+    snapshot no se actualiza) busca en todas las quincenas de ``Record``. Un RFC
+    completo es una sola lectura por el índice único."""
+    started = time.perf_counter()
     q = request.GET.get('q', '').strip()
-    results = []  # Inicializar results como lista vacía
-
-    if q:     #si q es verdadera entonces muestraa los valores de estos campos o columnas
-        results = Record.objects.filter(
+    historial = request.GET.get('historial') == '1' or not snapshot.ENABLED
+    model = Record if historial else RecordSnapshot
+    results = model.objects.none()  # Sin búsqueda no se muestran filas
+
+    if q and not historial and RFC_COMPLETO_RE.fullmatch(q.upper()):
+        results = RecordSnapshot.objects.filter(rfc=q.upper()).select_related('responsable')
+        add_activity(request.user, 'consulta', f'busqueda rfc="{q}"')
+    elif q:     #si q es verdadera entonces muestraa los valores de estos campos o columnas
+        results = model.objects.filter(
             Q(rfc__icontains=q) |
             Q(nombre__icontains=q) |
             Q(cadena1__icontains=q) |
@@ -162,19 +187,47 @@ def consulta_view(request: HttpRequest) -> HttpResponse:
             Q(observacio__icontains=q) |
             Q(lote_anterior__icontains=q) |
             Q(qna_ini__icontains=q)
-        )
-        add_activity(request.user, 'consulta', f'busqueda q="{q}"')
-    # Calcular total de registros: usar count() si es un QuerySet (más eficiente),
-    # o len() si es una lista/iterable ya evaluada.
-    if hasattr(results, 'count') and callable(getattr(results, 'count')):
-        try:
-            total = results.count()
-        except Exception:
-            total = len(results)
-    else:
-        total = len(results)
+        ).select_related('responsable')
+        add_activity(request.user, 'consulta', f'busqueda q="{q}"' + (' (historial)' if historial else ''))
+
+    def searched():
+        # Al terminar de enviar las filas: la búsqueda completa, no sólo el conteo
+        metrics.SEARCHES.inc()
+        metrics.SEARCH_SECONDS.observe(time.perf_counter() - started)
+
+    # Encabezado y formulario salen de inmediato; las filas se envían por bloques paginados
+    # por llave (historial: más recientes primero, como '-fecha_carga') y el total va al final
+    return stream_rows(
+        request, 'consulta.html', {'q': q, 'historial': historial}, results, 'partials/consulta_filas.html',
+        on_finish=searched if q else None, key='-pk' if model is Record else 'rfc',
+    )
+
+@login_required # Conciliación entre dos quincenas (CSV)
+@permission_required('fovisste.view_record', raise_exception=True)
+@read_replica
+def conciliacion_view(request: HttpRequest) -> HttpResponse:
+    """Altas, bajas y cambios de ``impor``/``cpto``/``ptje`` por RFC entre ``anterior`` y ``actual``.
 
-    return render(request, 'consulta.html', {'q': q, 'results': results, 'total': total})
+    Si el reporte de ese par ya está en disco y vigente se sirve tal cual; si no, se
+    genera en streaming (merge-join por RFC) y se guarda para la siguiente vez.
+    """
+    anterior = request.GET.get('anterior', '').strip()
+    actual = request.GET.get('actual', '').strip()
+    if not (re.fullmatch(r"\d{6}", anterior) and re.fullmatch(r"\d{6}", actual)):
+        return JsonResponse({'ok': False, 'error': 'anterior y actual deben tener 6 dígitos (AAAAMM).'}, status=400)
+    if anterior == actual:
+        return JsonResponse({'ok': False, 'error': 'Las quincenas deben ser distintas.'}, status=400)
+    add_activity(request.user, 'conciliacion', f'{anterior} vs {actual}')
+    filename = f'conciliacion_{anterior}_{actual}.csv'
+    cached = reconcile.cached_report(anterior, actual)
+    if cached is not None:
+        path, summary = cached
+        response = FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type='text/csv')
+        response['X-Conciliacion'] = json.dumps(summary)
+        return response
+    response = StreamingHttpResponse(reconcile.stream_report(anterior, actual), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 @login_required  # Página de quincena en proceso
 def qnaproceso_view(request: HttpRequest) -> HttpResponse:
@@ -197,7 +250,8 @@ def qnaproceso_view(request: HttpRequest) -> HttpResponse:
             ok = False
         if ok:
             # Nueva validación: verificar si el lote ya está duplicado en la BD
-            if Record.objects.filter(lote_anterior=lote, qna_ini=qna).exists():
+            # Sólo un aviso temprano: la revisión definitiva se repite con el candado al cargar (fovisste.locks)
+            if lote_cargado(qna, lote):
                 messages.error(request, f'El lote "{lote}" para la quincena "{qna}" ya tiene registros cargados. Por favor, elige un lote diferente o reinicia el proceso.')
             else:
                 request.session['qna_ini'] = qna
@@ -213,6 +267,7 @@ def qnaproceso_view(request: HttpRequest) -> HttpResponse:
 # Resultados de cargas recientes 
 @login_required
 @permission_required('fovisste.view_record', raise_exception=True)
+@read_replica
 def resultados_view(request: HttpRequest) -> HttpResponse:
     """Vista para mostrar resultados de cargas recientes."""
     # Obtener parámetros de consulta opcionales
@@ -233,12 +288,11 @@ def resultados_view(request: HttpRequest) -> HttpResponse:
     records = records[:200]
 
     context = {
-        'records': records,
         'qna_filter': qna_filter,
         'lote_filter': lote_filter,
     }
-    # Renderizar la plantilla de resultados con el contexto generado
-    return render(request, 'resultados.html', context)
+    # Renderizar la plantilla de resultados; las filas se envían por bloques
+    return stream_rows(request, 'resultados.html', context, records, 'partials/resultados_filas.html')
 @login_required
 @permission_required('fovisste.add_record', raise_exception=True)
 def update_lote_view(request: HttpRequest) -> JsonResponse:
@@ -249,11 +303,11 @@ def update_lote_view(request: HttpRequest) -> JsonResponse:
             return JsonResponse({'ok': False, 'error': 'Lote debe tener 4 dígitos.'}, status=400)
         # Actualizar lote en sesión y limpiar cualquier preview previo
         request.session['lote_anterior'] = nuevo_lote
-        request.session.pop('preview_records', None)
-        request.session.pop('preview_errors', None)
+        clear_preview_session(request)
         return JsonResponse({'ok': True})
     return JsonResponse({'ok': False, 'error': 'Método no permitido'}, status=405)
 @permission_required('fovisste.add_record', raise_exception=True)
+@limit_concurrency(TIPO_CARGA)
 def api_upload_view(request: HttpRequest) -> JsonResponse:
     """Carga de archivos de ancho fijo y grabado directo en MySQL vía ORM.
 
@@ -273,168 +327,263 @@ def api_upload_view(request: HttpRequest) -> JsonResponse:
             'error': 'Debes capturar "Quincena Proceso" y "Lote" antes de realizar la carga.'
         }, status=400)
 
-    # Verificar si ya existe una carga para esta combinación
+    # Con el candado de la quincena/lote ningún otro nodo puede cargarlo al mismo tiempo
     qna_ini = request.session.get('qna_ini')
     lote_anterior = request.session.get('lote_anterior')
-    if has_existing_load(request.user, qna_ini, lote_anterior):
+    try:
+        with locks.load_lock(qna_ini, lote_anterior, locks.OP_CARGA):
+            return _api_upload(request, qna_ini, lote_anterior)
+    except locks.LockTimeout as e:
+        metrics.UPLOADS.inc(path='upload', result='locked')
+        return lock_busy_response(e)
+
+def _api_upload(request: HttpRequest, qna_ini, lote_anterior) -> JsonResponse:
+    """api_upload_view con el candado de ``qna_ini``/``lote_anterior`` tomado."""
+    # Verificar si ya existe una carga para esta combinación (de cualquier usuario)
+    if lote_cargado(qna_ini, lote_anterior):
         return JsonResponse({
             'ok': False,
             'error': 'Ya existe una carga para esta combinación de Quincena y Lote. Debes reiniciar el proceso en la página de Quincena Proceso.',
             'redirect': 'qnaproceso'
         }, status=400)
 
-    # Si es confirmación, procesar datos editados
+    progress = ProgressTracker(request.POST.get('upload_id'), request.user.pk)
+
+    commit_mode = request.POST.get('commit_mode') or COMMIT_MODE
+    if commit_mode not in COMMIT_MODES:
+        return JsonResponse({'ok': False, 'error': f'Modo de carga inválido: {commit_mode}'}, status=400)
+
+    def on_progress(created):
+        progress.update(stage=STAGE_INSERTING, created=created)
+
+    # Si es confirmación, procesar datos editados (filas no borradas del preview)
     if request.POST.get('confirm'):
-        print("DEBUG: Entrando en flujo de confirmación en api_upload_view")  # Depuración
-        preview_records = request.session.get('preview_records', [])
-        print(f"DEBUG: Preview records en confirmación: {len(preview_records)}")  # Depuración
-        # Inicializar contador de creados para el caso en que no haya registros
-        total_created = 0
-        batch = []
-        if not preview_records:
+        rows = preview.rows_for(request.user).filter(borrado=False)
+        total = rows.count()
+        logger.debug('confirmación de preview con %d registros', total)
+        if not total:
             return JsonResponse({'ok': False, 'error': 'No hay registros en preview para confirmar.'}, status=400)
 
-        for data in preview_records:
-            rec = Record(
-                rfc=data.get('rfc', '')[:13],
-                nombre=data.get('nombre', '')[:30],
-                cadena1=data.get('cadena1') or None,
-                tipo=data.get('tipo', '')[:1],
-                impor=data.get('impor', '')[:8],
-                cpto=data.get('cpto', '')[:2],
-                lote_actual=data.get('lote_actual', '')[:1],
-                qna=data.get('qna', '')[:6],
-                ptje=data.get('ptje', '')[:2],
-                observacio=data.get('observacio') or None,
-                lote_anterior=data.get('lote_anterior', '')[:5],
-                qna_ini=data.get('qna_ini', '')[:6],
-                responsable=request.user,
-            )
-            batch.append(rec)
+        archivos = sorted(set(rows.exclude(archivo='').values_list('archivo', flat=True)))
+        carga = Carga.objects.create(
+            responsable=request.user, qna_ini=qna_ini, lote_anterior=lote_anterior,
+            archivo=', '.join(archivos)[:255], modo=commit_mode,
+        )
+        items = (
+            (record_from_data(row.datos, request.user), row.archivo, row.linea)
+            for row in rows.iterator(chunk_size=preview.ITER_CHUNK)
+        )
+        progress.update(force=True, stage=STAGE_INSERTING, lines=total)
+        report = error_reports.ErrorReport(request.user.pk)
         try:
-            if batch:
-                print(f"DEBUG: Procesando {len(batch)} registros para bulk_create")  # Depuración
-                with transaction.atomic():
-                    Record.objects.bulk_create(batch, batch_size=1000)
-                total_created = len(batch)
-                print(f"DEBUG: Registros creados exitosamente: {total_created}")  # Depuración
-            else:
-                print("DEBUG: No hay registros para procesar en confirmación")  # Depuración
+            result = load_records(items, carga, commit_mode, on_progress=on_progress)
         except Exception as e:
-            print(f"ERROR: falló bulk_create: {e}")
-            return JsonResponse({'ok': False, 'error': f'Error al insertar registros: {e}'}, status=500)
+            logger.exception('falló la inserción del preview confirmado (carga %s)', carga.pk)
+            if not carga.creados:
+                progress.fail(str(e))
+                metrics.UPLOADS.inc(path='confirm', result='error')
+                return JsonResponse({'ok': False, 'error': f'Error al insertar registros: {e}'}, status=500)
+            # En modo por bloques los bloques ya confirmados se quedan en Record: el preview ya no
+            # se puede volver a confirmar (duplicaría esas filas), así que se limpia igual que al terminar
+            clear_preview_session(request)
+            report.add({'error': f'Carga parcial ({carga.creados} registros guardados): {e}'},
+                       error_reports.TIPO_INSERCION)
+            progress.finish(created=carga.creados, errors=carga.fallidos + 1)
+            metrics.UPLOADS.inc(path='confirm', result='ok')
+            add_activity(request.user, 'carga', f'{carga.archivo}: carga parcial, creados {carga.creados} registros')
+            return JsonResponse({
+                'ok': True, 'created': carga.creados, 'errors': report.sample, 'error_summary': report.summary(),
+                'carga': {'carga': carga.pk, 'estado': carga.estado, 'created': carga.creados,
+                          'failed': carga.fallidos, 'partial': True},
+            })
+        logger.debug('confirmación: creados %d, fallidos %d', result.created, len(result.failed))
 
         # Limpiar sesiones
-        request.session.pop('preview_records', None)
-        request.session.pop('preview_errors', None)
-        print("DEBUG: Sesiones limpiadas después de confirmación")  # Depuración
-        return JsonResponse({'ok': True, 'created': total_created, 'errors': []})
+        clear_preview_session(request)
+        progress.finish(created=result.created, errors=len(result.failed))
+        metrics.UPLOADS.inc(path='confirm', result='ok')
+        add_activity(request.user, 'carga', f'{carga.archivo}: creados {result.created} registros')
+        report.extend(result.failed, error_reports.TIPO_INSERCION)
+        return JsonResponse({
+            'ok': True, 'created': result.created, 'errors': report.sample,
+            'error_summary': report.summary(), 'carga': result.as_dict(),
+        })
 
     # Código original para carga directa
 
     # Inicializar variables para el procesamiento
     files = request.FILES.getlist('files')
-    errors = []
+    # Errores: conteo por tipo y muestra en memoria, lista completa en archivo (error_reports)
+    errors = error_reports.ErrorReport(request.user.pk)
     total_created = 0
 
-    # Definición de cortes fixed-width (inicio, fin)
-    FIELDS = [
-        ("rfc", 0, 13),
-        ("nombre", 13, 43),
-        ("cadena1", 43, 80),
-        ("tipo", 80, 81),
-        ("impor", 81, 89),
-        ("cpto", 89, 91),
-        ("lote_actual", 91, 92),
-        ("qna", 92, 98),
-        ("ptje", 98, 100),
-        ("observacio", 100, 147),
-        ("lote_anterior", 147, 153), # actualizar de 147, 151
-        ("qna_ini", 153, 157),   # actualizar 151,157
-    ]
-    REQUIRED_LINE_LEN = 100
-    REQUIRED_MIN_LEN = 94  # según aclaración: si la línea tiene 92 PONER EN BLANCO AL RESTO
+    # Cortes fixed-width y longitudes: ver fovisste/parsing.py (FIELDS, REQUIRED_*)
+    session_lote = request.session.get('lote_anterior')
+    session_qna = request.session.get('qna_ini')
+    validation = default_validator.batches() if settings.FOVISSTE_VALIDATION else None
+
+    def parsed_items(f):
+        # Texto plano, .gz o .zip: se lee línea por línea sin cargar el archivo completo
+        for name, stream in open_upload(f.name, f):
+            for idx, data, error in iter_records(stream, name):
+                progress.update(stage=STAGE_PARSING, file=name, lines=progress.lines + 1, errors=len(errors))
+                if error is not None:
+                    errors.add(error)
+                    continue
+                if validation is not None:
+                    validation.add(data, name, idx)
+                # Sobrescribir lote/quincena con sesión si está disponible
+                yield record_from_data(data, request.user, session_qna, session_lote), name, idx
 
+    cargas = []
     for f in files:
+        carga = Carga.objects.create(
+            responsable=request.user, qna_ini=session_qna, lote_anterior=session_lote,
+            archivo=f.name[:255], modo=commit_mode,
+        )
         try:
-            content = f.read()
-            # Intentar decodificar preferentemente con utf-8-sig (quita BOM), luego utf-8 y fallback latin-1
-            try:
-                text = content.decode('utf-8-sig')
-            except Exception:
-                try:
-                    text = content.decode('utf-8')
-                except UnicodeDecodeError:
-                    text = content.decode('latin-1')
-            # Quitar BOM residual si existe
-            if text and text[0] == '\ufeff':
-                text = text.lstrip('\ufeff')
-
-            lines = [ln.rstrip('\r\n') for ln in text.splitlines() if ln.strip()]
-            if not lines:
-                continue
-
-            batch = []
-            with transaction.atomic():
-                for idx, line in enumerate(lines, start=1):
-                    if len(line) < REQUIRED_MIN_LEN:
-                        errors.append({
-                            'file': f.name,
-                            'line': idx,
-                            'error': f'Longitud {len(line)} < {REQUIRED_MIN_LEN}',
-                        })
-                        continue
-                    # Asegurar ancho para cortes (pad con espacios hasta REQUIRED_LINE_LEN)
-                    if len(line) < REQUIRED_LINE_LEN:
-                        line = normalize_short_line(line, REQUIRED_MIN_LEN, REQUIRED_LINE_LEN)
-                    # Construir diccionario de campos a partir de cortes fixed-width
-                    data = {}
-                    for field, start, end in FIELDS:
-                        # usar strip() para eliminar espacios a ambos lados
-                        data[field] = line[start:end].strip()
-
-                    # Depuración adicional: registrar la representación cruda de la línea para detectar offsets/encoding
-                    print(f"DEBUG RAW LINE ({f.name} line {idx}): {repr(line[:60])}")
-                    if not data.get('rfc'):
-                        print(f"DEBUG RFC MISSING SLICES ({f.name} line {idx}): slice0={repr(line[0:13])} slice13={repr(line[13:43])} len={len(line)}")
-                    # Fallback especial para PTJE cuando se usó la regla de 94
-                    if REQUIRED_MIN_LEN == 94 and not data.get('ptje'):
-                        # PTJE fue movido a posiciones 156-157 (1-based) -> 155:157 (0-based slice)
-                        data['ptje'] = line[155:157].strip()
-                    # Crear instancia usando ORM (se insertar\u0000 en MySQL)
-                    rec = Record(
-                        rfc=data['rfc'][:13],
-                        nombre=data['nombre'][:30],
-                        cadena1=(data['cadena1'][:37] or None),
-                        tipo=data['tipo'][:1],
-                        impor=data['impor'][:8],
-                        cpto=data['cpto'][:2],
-                        lote_actual=data['lote_actual'][:1],
-                        qna=data['qna'][:6],
-                        ptje=data['ptje'][:2],
-                        observacio=(data['observacio'][:47] or None),
-                        # Sobrescribir con sesión si está disponible
-                        lote_anterior=(request.session.get('lote_anterior') or data['lote_anterior'][:6] or None),
-                        qna_ini=(request.session.get('qna_ini') or data['qna_ini'][:4] or None),
-                        responsable=request.user, # Usuario que realiza la carga
-                    )
-                    batch.append(rec)
-
-                if batch:
-                    Record.objects.bulk_create(batch, batch_size=1000)
-                    total_created += len(batch)
-
-            add_activity(request.user, 'carga', f'{f.name}: creados {len(batch)} registros')
+            result = load_records(parsed_items(f), carga, commit_mode, on_progress=on_progress)
         except Exception as e:
-            errors.append({'file': f.name, 'error': str(e)})
+            # En modo por bloques los bloques ya confirmados se quedan en Record
+            if carga.creados:
+                total_created += carga.creados
+                errors.add({'file': f.name, 'error': f'Carga parcial ({carga.creados} registros guardados): {e}'},
+                           error_reports.TIPO_INSERCION)
+                cargas.append({'carga': carga.pk, 'estado': carga.estado, 'created': carga.creados,
+                               'failed': carga.fallidos, 'partial': True})
+                add_activity(request.user, 'carga', f'{f.name}: carga parcial, creados {carga.creados} registros')
+            else:
+                errors.add({'file': f.name, 'error': str(e)}, error_reports.TIPO_ARCHIVO)
+            continue
+        total_created += result.created
+        errors.extend(result.failed, error_reports.TIPO_INSERCION)
+        cargas.append(result.as_dict())
+        add_activity(request.user, 'carga', f'{f.name}: creados {result.created} registros')
 
     # Limpiar sesión después de carga exitosa para forzar nuevo proceso
     if total_created > 0:
         request.session.pop('qna_ini', None)
         request.session.pop('lote_anterior', None)
 
+    progress.finish(created=total_created, errors=len(errors))
+    metrics.LINES_PARSED.inc(progress.lines, path='upload')
+    metrics.PARSE_ERRORS.inc(len(errors), path='upload')
+    metrics.UPLOADS.inc(path='upload', result='error' if errors and not total_created else 'ok')
+    return JsonResponse({
+        'ok': True,
+        'created': total_created,
+        'errors': errors.sample,
+        'error_summary': errors.summary(),
+        'cargas': cargas,
+        'validation': validation.finish().as_dict() if validation is not None else None,
+    })
+
+def preview_blocked(request: HttpRequest):
+    """Respuesta de error si el lote de la sesión no se puede previsualizar, o None.
+
+    Toma el candado sin esperar: si otro proceso está cargando o revirtiendo ese
+    lote, responde 409 de inmediato en lugar de parsear un archivo que no se podrá confirmar.
+    """
+    qna_ini = request.session.get('qna_ini')
+    lote_anterior = request.session.get('lote_anterior')
+    try:
+        with locks.load_lock(qna_ini, lote_anterior, locks.OP_PREVIEW, timeout=0):
+            cargado = lote_cargado(qna_ini, lote_anterior)
+    except locks.LockTimeout as e:
+        return lock_busy_response(e)
+    if cargado:
+        return JsonResponse({
+            'ok': False,
+            'error': 'Ya existe una carga para esta combinación de Quincena y Lote. Debes reiniciar el proceso en la página de Quincena Proceso.',
+            'redirect': 'qnaproceso'
+        }, status=400)
+    return None
+
+def build_preview(request: HttpRequest, sources) -> JsonResponse:
+    """Parsea en streaming los archivos ``(nombre, archivo_binario)`` y guarda el preview
+    (filas en ``PreviewRow``, resúmenes en sesión).
+
+    Las filas pasan del parser a ``PreviewRow`` por bloques sin juntarse en memoria:
+    la marca de duplicado dentro del archivo se pone al paso (sólo se guardan las
+    llaves) y la de duplicado contra la BD después, sobre las filas ya guardadas.
+
+    Lo usan api_preview (multipart) y la subida por partes (api_chunked_finish).
+    """
+    started = time.perf_counter()
+    errors = error_reports.ErrorReport(request.user.pk)
+    progress = ProgressTracker(request.POST.get('upload_id'), request.user.pk)
+    progress.update(force=True, stage=STAGE_PARSING)
+    qna_ini = request.session.get('qna_ini')
+    lote_anterior = request.session.get('lote_anterior')
+    # mark=True: cada fila guarda las reglas que no cumple, para ajustar el resumen al editarla
+    validation = default_validator.batches(mark=True) if settings.FOVISSTE_VALIDATION else None
+    marker = DuplicateMarker()
+
+    def parsed_rows():
+        for source_name, source in sources:
+            try:
+                # Texto plano, .gz o .zip (un archivo por miembro), descomprimido al vuelo
+                for name, stream in open_upload(source_name, source):
+                    for idx, data, error in iter_records(stream, name):
+                        progress.update(file=name, lines=progress.lines + 1, errors=len(errors))
+                        if error is not None:
+                            errors.add(error)
+                            continue
+                        # Sobrescribir con sesión
+                        data['lote_anterior'] = lote_anterior or data['lote_anterior']
+                        data['qna_ini'] = qna_ini or data['qna_ini']
+                        # Origen de la fila, para reportar fallos al confirmar
+                        data['archivo'] = name
+                        data['linea'] = idx
+                        if validation is not None:
+                            validation.add(data, name, idx)
+                        marker.mark(data)
+                        yield data
+            except Exception as e:
+                errors.add({'file': source_name, 'error': str(e)}, error_reports.TIPO_ARCHIVO)
+
+    # Guarda las filas en BD conforme se parsean (reemplaza el preview anterior)
+    preview_count = preview.store(request.user, parsed_rows())
+    validation_summary = validation.finish().as_dict() if validation is not None else None
+    # Duplicados dentro del archivo (RFC + cpto) y contra lo ya cargado en esta quincena
+    duplicates = None
+    if preview_count:
+        duplicates = {DUP_ARCHIVO: marker.in_file, DUP_BD: preview.flag_loaded(request.user, marker.rfcs(), qna_ini)}
+
+    progress.finish(errors=len(errors))
+    metrics.PARSE_SECONDS.observe(time.perf_counter() - started, path='preview')
+    metrics.LINES_PARSED.inc(progress.lines, path='preview')
+    metrics.PARSE_ERRORS.inc(len(errors), path='preview')
+    metrics.PREVIEW_ROWS.observe(preview_count)
+    metrics.UPLOADS.inc(path='preview', result='ok' if preview_count else 'error')
+    logger.debug('preview con %d registros y %d errores', preview_count, len(errors))
+
+    # Si no se obtuvieron registros, devolver mensaje sin preview
+    error_summary = errors.summary()
+    if not preview_count:
+        # Eliminar el preview previo para evitar mostrar filas antiguas
+        clear_preview_session(request)
+        request.session['preview_errors'] = error_summary
+        return JsonResponse({'ok': True, 'preview_count': 0, 'errors': errors.sample, 'error_summary': error_summary})
+
+    # Resúmenes en sesión para mostrar en carga.html
+    request.session['preview_errors'] = error_summary
+    request.session['preview_validation'] = validation_summary
+    request.session['preview_duplicates'] = duplicates
+
+    return JsonResponse({
+        'ok': True,
+        'preview_count': preview_count,
+        'errors': errors.sample,
+        'error_summary': error_summary,
+        'validation': validation_summary,
+        'duplicates': duplicates,
+    })
+
+
 @login_required # Preview de archivos antes de guardar
 @permission_required('fovisste.add_record', raise_exception=True)
+@limit_concurrency(TIPO_PREVIEW)
 def preview_upload_view(request: HttpRequest) -> JsonResponse:
     if request.method != 'POST':
         return JsonResponse({'ok': False, 'error': 'Método no permitido'}, status=405)
@@ -446,82 +595,286 @@ def preview_upload_view(request: HttpRequest) -> JsonResponse:
     files = request.FILES.getlist('files')
     if not files:
         return JsonResponse({'ok': False, 'error': 'No se recibieron archivos'}, status=400)
+    blocked = preview_blocked(request)
+    if blocked is not None:
+        return blocked
 
-    preview_records = []
-    errors = []
-
-    # Definición de cortes fixed-width (igual que en api_upload_view)
-    FIELDS = [
-        ("rfc", 0, 13),
-        ("nombre", 13, 43),
-        ("cadena1", 43, 80),
-        ("tipo", 80, 81),
-        ("impor", 81, 89),
-        ("cpto", 89, 91),
-        ("lote_actual", 91, 92),
-        ("qna", 92, 98),
-        ("ptje", 98, 100),
-        ("observacio", 100, 147),
-        ("lote_anterior", 147, 153),
-        ("qna_ini", 153, 157),
-    ]
-    REQUIRED_LINE_LEN = 100
-    REQUIRED_MIN_LEN = 94
+    return build_preview(request, ((f.name, f) for f in files))
 
-    for f in files:
-        try:
-            content = f.read()
-            try:
-                text = content.decode('utf-8')
-            except UnicodeDecodeError:
-                text = content.decode('latin-1')
 
-            lines = [ln.rstrip('\r\n') for ln in text.splitlines() if ln.strip()]
-            if not lines:
-                continue
+@login_required
+@permission_required('fovisste.add_record', raise_exception=True)
+def clear_preview_view(request: HttpRequest) -> JsonResponse:
+    """Elimina el preview (filas y keys de sesión) para que la página de carga no muestre nada."""
+    if request.method != 'POST':
+        return JsonResponse({'ok': False, 'error': 'Método no permitido'}, status=405)
 
-            for idx, line in enumerate(lines, start=1):
-                if len(line) < REQUIRED_MIN_LEN:
-                    errors.append({'file': f.name, 'line': idx, 'error': f'Longitud {len(line)} < {REQUIRED_MIN_LEN}'})
-                    continue
-                if len(line) < REQUIRED_LINE_LEN:
-                    line = normalize_short_line(line, REQUIRED_MIN_LEN, REQUIRED_LINE_LEN)
-                data = {field: line[start:end].rstrip() for field, start, end in FIELDS}
-                # Validar campos clave y loguear si están vacíos
-                # Fallback especial para PTJE cuando se usó la regla de 94
-                if REQUIRED_MIN_LEN == 94 and not data.get('ptje'):
-                    data['ptje'] = line[155:157].strip()
-                if not data.get('rfc'):
-                    print(f"DEBUG: RFC vacío en línea {idx} - Línea: '{line[:50]}...'")
-                print(f"DEBUG: Línea procesada - RFC: '{data.get('rfc')}', Nombre: '{data.get('nombre')}', Tipo: '{data.get('tipo')}'")  # Depuración
-                # Sobrescribir con sesión
-                data['lote_anterior'] = request.session.get('lote_anterior') or data['lote_anterior']
-                data['qna_ini'] = request.session.get('qna_ini') or data['qna_ini']
-                preview_records.append(data)
-        except Exception as e:
-            errors.append({'file': f.name, 'error': str(e)})
+    clear_preview_session(request)
+    return JsonResponse({'ok': True})
 
-    # Si no se obtuvieron registros, no guardar clave en sesión y devolver mensaje
-    if not preview_records:
-        # Eliminar posibles keys previas para evitar mostrar previews antiguos
-        request.session.pop('preview_records', None)
-        request.session['preview_errors'] = errors
-        return JsonResponse({'ok': True, 'preview_count': 0, 'errors': errors})
 
-    # Guardar en sesión para mostrar en carga.html
-    request.session['preview_records'] = preview_records
-    request.session['preview_errors'] = errors
+@login_required
+def error_report_view(request: HttpRequest, report_id: str) -> HttpResponse:
+    """Descarga la lista completa de errores de una carga/preview (``?formato=ndjson|csv``)."""
+    path = error_reports.report_path(request.user.pk, report_id)
+    if path is None or not path.exists():
+        return JsonResponse({'ok': False, 'error': 'Reporte de errores no encontrado o expirado'}, status=404)
+    fmt = request.GET.get('formato', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return JsonResponse({'ok': False, 'error': 'formato debe ser ndjson o csv'}, status=400)
+    content_type = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv; charset=utf-8'
+    response = StreamingHttpResponse(error_reports.iter_report(path, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="errores_{report_id}.{fmt}"'
+    return response
+
+
+def _preview_row_response(request, row, before, others=()) -> JsonResponse:
+    preview.adjust_summaries(request.session, before, preview.state(row), row, others)
+    return JsonResponse({
+        'ok': True,
+        'row': preview.as_dict(row),
+        'validation': request.session.get('preview_validation'),
+        'duplicates': request.session.get('preview_duplicates'),
+    })
 
-    return JsonResponse({'ok': True, 'preview_count': len(preview_records), 'errors': errors})
+
+@login_required
+@permission_required('fovisste.add_record', raise_exception=True)
+def preview_row_view(request: HttpRequest, index: int) -> JsonResponse:
+    """Una fila del preview: GET la devuelve, PATCH corrige campos (JSON
+    ``{"campo": "valor"}``) y DELETE la marca como borrada (no se confirma)."""
+    try:
+        row = preview.rows_for(request.user).get(indice=index)
+    except PreviewRow.DoesNotExist:
+        return JsonResponse({'ok': False, 'error': 'Fila no encontrada en el preview'}, status=404)
+
+    if request.method == 'GET':
+        return JsonResponse({'ok': True, 'row': preview.as_dict(row)})
+
+    before = preview.state(row)
+    if request.method == 'PATCH':
+        try:
+            fields = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'ok': False, 'error': 'JSON inválido'}, status=400)
+        if not isinstance(fields, dict):
+            return JsonResponse({'ok': False, 'error': 'Se esperaba un objeto {campo: valor}'}, status=400)
+        try:
+            others = preview.update_row(row, fields, request.session.get('qna_ini'))
+        except preview.PreviewEditError as e:
+            return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+    elif request.method == 'DELETE':
+        others = preview.delete_row(row)
+    else:
+        return JsonResponse({'ok': False, 'error': 'Método no permitido'}, status=405)
+    return _preview_row_response(request, row, before, others)
 
 
 @login_required
 @permission_required('fovisste.add_record', raise_exception=True)
-def clear_preview_view(request: HttpRequest) -> JsonResponse:
-    """Elimina keys de preview de la sesión para que la página de carga no muestre nada."""
+def preview_row_restore_view(request: HttpRequest, index: int) -> JsonResponse:
+    """Deshace el borrado y las ediciones de una fila del preview."""
     if request.method != 'POST':
         return JsonResponse({'ok': False, 'error': 'Método no permitido'}, status=405)
+    try:
+        row = preview.rows_for(request.user).get(indice=index)
+    except PreviewRow.DoesNotExist:
+        return JsonResponse({'ok': False, 'error': 'Fila no encontrada en el preview'}, status=404)
+    before = preview.state(row)
+    others = preview.restore_row(row, request.session.get('qna_ini'))
+    return _preview_row_response(request, row, before, others)
+
+
+@read_replica
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Métricas en formato de texto de Prometheus. Sólo staff, o un scraper que envíe
+    ``Authorization: Bearer <FOVISSTE_METRICS_TOKEN>`` si el token está configurado."""
+    token = settings.FOVISSTE_METRICS_TOKEN
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized and token:
+        authorized = request.headers.get('Authorization', '') == f'Bearer {token}'
+    if not authorized:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+async def progress_stream_view(request: HttpRequest, upload_id: str) -> HttpResponse:
+    """Server-Sent Events con el avance de una carga (lineas, errores y etapa).
+
+    Vista asíncrona: debe servirse desde la app ASGI (``Prestaciones.asgi``) para que
+    los eventos lleguen en vivo; bajo WSGI Django acumula la respuesta completa.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'ok': False, 'error': 'No autenticado'}, status=401)
+    if not await sync_to_async(user.has_perm)('fovisste.add_record'):
+        return JsonResponse({'ok': False, 'error': 'Permiso denegado'}, status=403)
+    if not valid_upload_id(upload_id):
+        return JsonResponse({'ok': False, 'error': 'Id de carga inválido'}, status=400)
+
+    async def events():
+        started = time.monotonic()
+        last_sent = None
+        last_beat = started
+        yield 'retry: 2000\n\n'
+        while True:
+            state = await aget_progress(upload_id)
+            now = time.monotonic()
+            if state is not None and state.get('user_id') not in (None, user.pk):
+                state = None  # No exponer el progreso de otro usuario
+            if state is not None and state != last_sent:
+                last_sent = state
+                payload = {k: v for k, v in state.items() if k != 'user_id'}
+                yield f'event: progress\ndata: {json.dumps(payload)}\n\n'
+                if state.get('stage') in FINAL_STAGES:
+                    return
+            elif now - last_beat >= PROGRESS_HEARTBEAT:
+                # Comentario SSE para mantener viva la conexión a través de proxies
+                last_beat = now
+                yield ': ping\n\n'
+            if state is None and now - started > PROGRESS_WAIT_START:
+                yield 'event: timeout\ndata: {}\n\n'
+                return
+            if now - started > PROGRESS_MAX_STREAM:
+                return
+            await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: no almacenar en buffer el stream
+    return response
+
+
+def _chunked_state(upload: ChunkedUpload) -> dict:
+    return {
+        'ok': True,
+        'chunked_id': str(upload.pk),
+        'offset': upload.offset,
+        'next_chunk': upload.siguiente_parte,
+        'size': upload.tamano,
+        'chunk_size': chunked.CHUNK_SIZE,
+    }
 
-    request.session.pop('preview_records', None)
-    request.session.pop('preview_errors', None)
-    return JsonResponse({'ok': True})
+
+@login_required
+@permission_required('fovisste.add_record', raise_exception=True)
+def chunked_start_view(request: HttpRequest) -> JsonResponse:
+    """Inicia una subida por partes. POST: filename, size (bytes, opcional)."""
+    if request.method != 'POST':
+        return JsonResponse({'ok': False, 'error': 'Método no permitido'}, status=405)
+    if not (request.session.get('qna_ini') and request.session.get('lote_anterior')):
+        return JsonResponse({'ok': False, 'error': 'Sesión inválida. Reinicia el proceso.'}, status=400)
+    nombre = (request.POST.get('filename') or '').strip()
+    if not nombre:
+        return JsonResponse({'ok': False, 'error': 'Falta el nombre del archivo'}, status=400)
+    size = request.POST.get('size') or None
+    if size is not None:
+        if not str(size).isdigit():
+            return JsonResponse({'ok': False, 'error': 'Tamaño inválido'}, status=400)
+        size = int(size)
+    chunked.cleanup_stale_uploads()
+    upload = ChunkedUpload.objects.create(user=request.user, nombre=os.path.basename(nombre)[:255], tamano=size)
+    return JsonResponse(_chunked_state(upload))
+
+
+@login_required
+@permission_required('fovisste.add_record', raise_exception=True)
+def chunked_status_view(request: HttpRequest, chunked_id) -> JsonResponse:
+    """Estado de una subida (para reanudar desde el último offset confirmado)."""
+    upload = get_object_or_404(ChunkedUpload, pk=chunked_id, user=request.user)
+    return JsonResponse(_chunked_state(upload))
+
+
+@login_required
+@permission_required('fovisste.add_record', raise_exception=True)
+def chunked_put_view(request: HttpRequest, chunked_id, index: int) -> JsonResponse:
+    """Recibe la parte ``index`` como cuerpo crudo (PUT); el header ``X-Chunk-Offset`` debe
+    coincidir con el offset confirmado en el servidor, si no se responde 409 con el estado."""
+    if request.method != 'PUT':
+        return JsonResponse({'ok': False, 'error': 'Método no permitido'}, status=405)
+    try:
+        offset = int(request.headers.get('X-Chunk-Offset', ''))
+    except ValueError:
+        return JsonResponse({'ok': False, 'error': 'Falta el header X-Chunk-Offset'}, status=400)
+    try:
+        length = int(request.headers.get('Content-Length') or 0)
+    except ValueError:
+        length = 0
+    if length > chunked.MAX_CHUNK_BYTES:
+        return JsonResponse({'ok': False, 'error': f'La parte excede {chunked.MAX_CHUNK_BYTES} bytes'}, status=413)
+
+    upload = get_object_or_404(ChunkedUpload, pk=chunked_id, user=request.user)
+    rejected = _chunked_rejected(upload, index, offset)
+    if rejected is not None:
+        return rejected
+    # El cuerpo se lee y se escribe a disco sin candado; leerlo depende del cliente
+    try:
+        tmp, written = chunked.receive_part(upload, request)
+    except chunked.ChunkTooLarge as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=413)
+    try:
+        with transaction.atomic():
+            # Con la fila bloqueada sólo se revisa el orden y se avanza: dos partes no se confirman a la vez
+            upload = get_object_or_404(ChunkedUpload.objects.select_for_update(), pk=chunked_id, user=request.user)
+            rejected = _chunked_rejected(upload, index, offset)
+            if rejected is not None:
+                return rejected
+            if upload.tamano is not None and upload.offset + written > upload.tamano:
+                return JsonResponse({**_chunked_state(upload), 'ok': False, 'error': 'Se recibieron más bytes que el tamaño declarado'}, status=400)
+            chunked.commit_part(upload, index, tmp)
+            upload.offset += written
+            upload.siguiente_parte += 1
+            upload.save(update_fields=['offset', 'siguiente_parte', 'actualizado_en'])
+    finally:
+        if tmp.exists():  # rechazada o error: la parte no se confirmó
+            tmp.unlink()
+    return JsonResponse(_chunked_state(upload))
+
+
+def _chunked_rejected(upload, index, offset):
+    """Respuesta 409 si la subida ya terminó o la parte no es la siguiente, o None."""
+    if upload.completa:
+        return JsonResponse({**_chunked_state(upload), 'ok': False, 'error': 'La subida ya fue finalizada'}, status=409)
+    if index != upload.siguiente_parte or offset != upload.offset:
+        return JsonResponse({**_chunked_state(upload), 'ok': False, 'error': 'Offset fuera de orden'}, status=409)
+    return None
+
+
+def _chunked_sources(uploads):
+    for upload in uploads:
+        with open(chunked.assemble(upload), 'rb') as fh:
+            yield upload.nombre, fh
+
+
+@login_required
+@permission_required('fovisste.add_record', raise_exception=True)
+@limit_concurrency(TIPO_PREVIEW)
+def chunked_finish_view(request: HttpRequest) -> JsonResponse:
+    """Finaliza una o varias subidas (POST ``chunked_id`` repetido) y genera el preview
+    leyendo los archivos ensamblados en streaming, igual que api_preview."""
+    if request.method != 'POST':
+        return JsonResponse({'ok': False, 'error': 'Método no permitido'}, status=405)
+    if not (request.session.get('qna_ini') and request.session.get('lote_anterior')):
+        return JsonResponse({'ok': False, 'error': 'Sesión inválida. Reinicia el proceso.'}, status=400)
+    ids = request.POST.getlist('chunked_id')
+    if not ids:
+        return JsonResponse({'ok': False, 'error': 'No se recibieron archivos'}, status=400)
+    try:
+        uploads = list(ChunkedUpload.objects.filter(pk__in=ids, user=request.user, completa=False))
+    except ValidationError:
+        return JsonResponse({'ok': False, 'error': 'Id de subida inválido'}, status=400)
+    if len(uploads) != len(set(ids)):
+        return JsonResponse({'ok': False, 'error': 'Subida no encontrada o ya finalizada'}, status=404)
+    for upload in uploads:
+        if upload.tamano is not None and upload.offset != upload.tamano:
+            return JsonResponse({**_chunked_state(upload), 'ok': False, 'error': f'{upload.nombre}: subida incompleta'}, status=409)
+    blocked = preview_blocked(request)
+    if blocked is not None:
+        return blocked
+
+    ChunkedUpload.objects.filter(pk__in=[u.pk for u in uploads]).update(completa=True)
+    try:
+        return build_preview(request, _chunked_sources(uploads))
+    finally:
+        for upload in uploads:
+            chunked.discard(upload)